@@ -0,0 +1,164 @@
+# app/bot/acks.py
+"""
+Сводные подтверждения «Добавил в черновик» вместо ответа на каждое сообщение.
+
+Пачка пересланных сообщений или альбом — это десятки апдейтов подряд. Каждое
+сообщение по-прежнему сразу пишется в черновик, а ответ откладывается: пока
+сообщения приходят чаще, чем раз в ACK_DEBOUNCE_SECONDS (и не дольше
+ACK_MAX_DELAY_SECONDS с первого), они копятся в одну пачку, на которую уходит
+одно сообщение со счётчиками. Части одного альбома (media_group_id) всегда
+попадают в одну пачку. Если предыдущее подтверждение отправлено недавно
+(ACK_MERGE_SECONDS), оно редактируется вместо отправки нового.
+
+    acks.add(bot, chat_id, attachment=True, total=12, show_submit=True, media_group_id=m.media_group_id)
+    acks.forget(chat_id)  # черновик очищен или отправлен
+
+Пачки и таймеры — в памяти процесса: сводит подтверждения одна реплика. Если
+апдейты одного чата приходят на разные реплики, каждая пришлёт своё.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from loguru import logger
+
+from app.bot.keyboards.kbs import draft_actions_kb
+from app.bot.outbound import outbound
+from app.config import settings
+
+
+@dataclass(slots=True)
+class _Batch:
+    messages: int = 0
+    attachments: int = 0
+    total: int = 0            # сообщений в черновике после последнего добавления
+    show_submit: bool = True  # для типа «Другое» кнопку «Отправить проект» не показываем
+    media_group_id: Optional[str] = None
+    started: float = 0.0
+    deadline: float = 0.0
+
+
+@dataclass(slots=True)
+class _Ack:
+    message_id: int
+    sent_at: float
+    messages: int
+    attachments: int
+
+
+def ack_text(messages: int, attachments: int, total: int, show_submit: bool) -> str:
+    added = f"Добавил в черновик: сообщений — {messages}"
+    if attachments:
+        added += f", из них с вложениями — {attachments}"
+    hint = "Жми «Отправить проект», когда готово." if show_submit else "Продолжайте отправлять материалы."
+    return f"{added}.\nВсего в черновике: {total}. {hint}"
+
+
+class AckDebouncer:
+    def __init__(self, *, window: float, max_delay: float, merge_window: float):
+        self._window = window
+        self._max_delay = max_delay
+        self._merge_window = merge_window
+        self._batches: dict[int, _Batch] = {}
+        self._flushers: dict[int, asyncio.Task] = {}
+        self._last: dict[int, _Ack] = {}
+
+    def add(
+        self,
+        bot: Bot,
+        chat_id: int,
+        *,
+        attachment: bool,
+        total: int,
+        show_submit: bool,
+        media_group_id: Optional[str] = None,
+    ) -> None:
+        now = time.monotonic()
+        batch = self._batches.get(chat_id)
+        if batch is None:
+            batch = self._batches[chat_id] = _Batch(started=now)
+        batch.messages += 1
+        batch.attachments += int(attachment)
+        batch.total = max(batch.total, total)
+        batch.show_submit = show_submit
+
+        same_album = media_group_id is not None and media_group_id == batch.media_group_id
+        batch.media_group_id = media_group_id
+        # альбом не разрываем; остальное — не дольше max_delay с начала пачки
+        batch.deadline = now + self._window
+        if not same_album:
+            batch.deadline = min(batch.deadline, batch.started + self._max_delay)
+
+        if chat_id not in self._flushers:
+            task = asyncio.create_task(self._flush_later(bot, chat_id), name=f"ack:{chat_id}")
+            self._flushers[chat_id] = task
+
+    def forget(self, chat_id: int) -> None:
+        """Черновик очищен/отправлен: отложенный ответ больше не нужен, следующий — новым сообщением."""
+        task = self._flushers.pop(chat_id, None)
+        if task is not None:
+            task.cancel()
+        self._batches.pop(chat_id, None)
+        self._last.pop(chat_id, None)
+
+    async def _flush_later(self, bot: Bot, chat_id: int) -> None:
+        try:
+            while True:
+                batch = self._batches.get(chat_id)
+                if batch is None:
+                    return
+                delay = batch.deadline - time.monotonic()
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            # то, что придёт во время отправки, соберётся в следующую пачку
+            del self._batches[chat_id]
+            await self._send(bot, chat_id, batch)
+        except Exception as e:
+            logger.exception("Ack for chat {} failed: {}", chat_id, e)
+        finally:
+            if self._flushers.get(chat_id) is asyncio.current_task():
+                del self._flushers[chat_id]
+                if chat_id in self._batches:
+                    # пачка успела начаться, пока отправляли предыдущую
+                    self._flushers[chat_id] = asyncio.create_task(self._flush_later(bot, chat_id),
+                                                                  name=f"ack:{chat_id}")
+
+    async def _send(self, bot: Bot, chat_id: int, batch: _Batch) -> None:
+        reply_markup = draft_actions_kb() if batch.show_submit else None
+        last = self._last.get(chat_id)
+        if last is not None and time.monotonic() - last.sent_at < self._merge_window:
+            messages = last.messages + batch.messages
+            attachments = last.attachments + batch.attachments
+            text = ack_text(messages, attachments, batch.total, batch.show_submit)
+            try:
+                await outbound.submit(chat_id, partial(
+                    bot.edit_message_text, text=text, chat_id=chat_id, message_id=last.message_id,
+                    reply_markup=reply_markup,
+                ))
+                last.messages, last.attachments = messages, attachments
+                logger.debug("Ack edited in chat {}: +{} messages", chat_id, batch.messages)
+                return
+            except TelegramBadRequest as e:
+                # удалено пользователем и т.п. — просто пришлём новое
+                logger.debug("Ack edit in chat {} failed, sending new: {}", chat_id, e)
+
+        text = ack_text(batch.messages, batch.attachments, batch.total, batch.show_submit)
+        sent = await outbound.submit(chat_id, partial(
+            bot.send_message, chat_id=chat_id, text=text, reply_markup=reply_markup,
+        ))
+        self._last[chat_id] = _Ack(sent.message_id, time.monotonic(), batch.messages, batch.attachments)
+        logger.debug("Ack sent to chat {}: {} messages", chat_id, batch.messages)
+
+
+acks = AckDebouncer(
+    window=settings.ACK_DEBOUNCE_SECONDS,
+    max_delay=settings.ACK_MAX_DELAY_SECONDS,
+    merge_window=settings.ACK_MERGE_SECONDS,
+)
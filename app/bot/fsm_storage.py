@@ -0,0 +1,162 @@
+# app/bot/fsm_storage.py
+"""
+Хранилища FSM (state + data черновиков), общие для всех реплик бота.
+
+Выбирается настройкой FSM_STORAGE:
+- memory   — MemoryStorage aiogram: всё в памяти процесса, теряется при рестарте;
+- postgres — таблица fsm_state в основной БД (см. app.db.models.fsm);
+- redis    — REDIS_URL: state — строка, data — hash, по полю на ключ.
+
+В обоих внешних хранилищах update_data атомарен (jsonb || patch / HSET), а
+запись, которую не трогали FSM_TTL_SECONDS, считается брошенной и исчезает.
+Значения data должны сериализоваться в JSON — enum'ы кладём по .value.
+"""
+from __future__ import annotations
+
+import json
+import time
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from loguru import logger
+
+from app.config import settings
+from app.db.database import async_session_maker
+from app.db.models.fsm import FsmStateDAO
+from app.db.models.outbox import utc_now
+
+PURGE_INTERVAL_SECONDS = 3600
+
+
+def _state_name(state: StateType) -> Optional[str]:
+    return state.state if isinstance(state, State) else state
+
+
+class PostgresStorage(BaseStorage):
+    def __init__(self, *, ttl: int):
+        self._ttl = timedelta(seconds=ttl)
+        self._keys = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._last_purge = 0.0
+
+    def _expires_at(self):
+        return utc_now() + self._ttl
+
+    async def _maybe_purge(self) -> None:
+        # просроченные записи и так не читаются — чистим раз в час, попутно с записью
+        if time.monotonic() - self._last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = time.monotonic()
+        try:
+            async with async_session_maker() as session:
+                purged = await FsmStateDAO.purge_expired(session)
+            if purged:
+                logger.info("FSM: {} abandoned drafts purged", purged)
+        except Exception as e:
+            logger.exception("FSM: purge failed: {}", e)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        async with async_session_maker() as session:
+            await FsmStateDAO.set_state(session, self._keys.build(key), _state_name(state),
+                                        expires_at=self._expires_at())
+        await self._maybe_purge()
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        async with async_session_maker() as session:
+            return await FsmStateDAO.get_state(session, self._keys.build(key))
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        async with async_session_maker() as session:
+            await FsmStateDAO.set_data(session, self._keys.build(key), data, expires_at=self._expires_at())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        async with async_session_maker() as session:
+            return await FsmStateDAO.get_data(session, self._keys.build(key))
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        async with async_session_maker() as session:
+            return await FsmStateDAO.update_data(session, self._keys.build(key), data,
+                                                 expires_at=self._expires_at())
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisHashStorage(BaseStorage):
+    """
+    fsm:<bot>:<chat>:<user>:<destiny>:state — строка состояния,
+    fsm:<bot>:<chat>:<user>:<destiny>:data  — hash {ключ: JSON значения}.
+    Каждая запись — MULTI/EXEC с продлением TTL обоих ключей.
+    """
+
+    def __init__(self, redis, *, ttl: int):
+        self._redis = redis
+        self._ttl = ttl
+        self._keys = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+
+    @classmethod
+    def from_url(cls, url: str, *, ttl: int) -> RedisHashStorage:
+        from redis.asyncio import Redis
+
+        return cls(Redis.from_url(url), ttl=ttl)
+
+    def _touch(self, pipe, key: StorageKey) -> None:
+        pipe.expire(self._keys.build(key, "state"), self._ttl)
+        pipe.expire(self._keys.build(key, "data"), self._ttl)
+
+    @staticmethod
+    def _decode(raw: dict) -> Dict[str, Any]:
+        return {(k.decode() if isinstance(k, bytes) else k): json.loads(v) for k, v in raw.items()}
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        name = _state_name(state)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            if name is None:
+                pipe.delete(self._keys.build(key, "state"))
+            else:
+                pipe.set(self._keys.build(key, "state"), name)
+            self._touch(pipe, key)
+            await pipe.execute()
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        value = await self._redis.get(self._keys.build(key, "state"))
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        data_key = self._keys.build(key, "data")
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.delete(data_key)
+            if data:
+                pipe.hset(data_key, mapping={k: json.dumps(v, ensure_ascii=False) for k, v in data.items()})
+            self._touch(pipe, key)
+            await pipe.execute()
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return self._decode(await self._redis.hgetall(self._keys.build(key, "data")))
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        data_key = self._keys.build(key, "data")
+        async with self._redis.pipeline(transaction=True) as pipe:
+            if data:
+                pipe.hset(data_key, mapping={k: json.dumps(v, ensure_ascii=False) for k, v in data.items()})
+            self._touch(pipe, key)
+            pipe.hgetall(data_key)
+            *_, merged = await pipe.execute()
+        return self._decode(merged)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def build_storage() -> BaseStorage:
+    kind = settings.FSM_STORAGE
+    if kind == "redis":
+        logger.info("FSM storage: redis (ttl={}s)", settings.FSM_TTL_SECONDS)
+        return RedisHashStorage.from_url(settings.REDIS_URL, ttl=settings.FSM_TTL_SECONDS)
+    if kind == "postgres":
+        logger.info("FSM storage: postgres (ttl={}s)", settings.FSM_TTL_SECONDS)
+        return PostgresStorage(ttl=settings.FSM_TTL_SECONDS)
+    logger.warning("FSM storage: memory — drafts are lost on restart")
+    return MemoryStorage()
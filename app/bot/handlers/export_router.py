@@ -0,0 +1,115 @@
+# app/bot/handlers/export_router.py
+from __future__ import annotations
+
+import html
+import os
+from datetime import datetime, timedelta
+
+import pytz
+
+from aiogram import Router, Bot
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from loguru import logger
+
+from app.bot.middleware.ordering import DETACHED
+from app.bot.roles import roles
+from app.bot.telegram_api import document_limit, input_file, upload_tmp_dir
+from app.chat_gpt.kp_render import available_formats
+from app.chat_gpt.prompts import ProjectType
+from app.db.models.roles import Role
+from app.db.models.tasks import ProjectStatus, moscow_now
+from app.export.zip_export import ExportFilter, export_projects_zip
+
+router = Router(name="export")
+
+MOSCOW_TZ = pytz.timezone("Europe/Moscow")
+
+EXPORT_HELP = (
+    "Выгрузка КП и брифов архивом:\n"
+    "/export from=01.10.2025 to=31.10.2025 status=new type=bot fmt=pdf\n\n"
+    "Все параметры необязательные. to — включительно.\n"
+    f"status: {', '.join(ProjectStatus.__members__)}\n"
+    f"type: {', '.join(t.value for t in ProjectType)}"
+)
+
+
+def _parse_date(value: str) -> datetime:
+    for fmt in ("%d.%m.%Y", "%Y-%m-%d"):
+        try:
+            return MOSCOW_TZ.localize(datetime.strptime(value, fmt))
+        except ValueError:
+            continue
+    raise ValueError(f"Не понял дату: {value}")
+
+
+def parse_export_args(args: str | None) -> ExportFilter:
+    flt = ExportFilter()
+    for token in (args or "").split():
+        key, _, value = token.partition("=")
+        if not value:
+            raise ValueError(f"Ожидается ключ=значение: {token}")
+        if key == "from":
+            flt.date_from = _parse_date(value)
+        elif key == "to":
+            flt.date_to = _parse_date(value) + timedelta(days=1)
+        elif key == "status":
+            if value not in ProjectStatus.__members__:
+                raise ValueError(f"Неизвестный статус: {value}")
+            flt.status = ProjectStatus[value].value
+        elif key == "type":
+            flt.project_type = ProjectType(value).value
+        elif key == "fmt":
+            if value not in available_formats():
+                raise ValueError(f"Неизвестный формат: {value}")
+            flt.fmt = value
+        else:
+            raise ValueError(f"Неизвестный параметр: {key}")
+    return flt
+
+
+@router.message(Command("export"), flags={DETACHED: True})
+async def cmd_export(m: Message, command: CommandObject, bot: Bot):
+    if not roles.has(m.from_user.id, Role.admin):
+        await m.answer("⛔ Нет прав на выгрузку.")
+        return
+
+    try:
+        flt = parse_export_args(command.args)
+    except ValueError as e:
+        await m.answer(f"❌ {html.escape(str(e))}\n\n{EXPORT_HELP}")
+        return
+
+    logger.info("Export requested by {}: {}", m.from_user.id, flt)
+    status_msg = await m.answer("⏳ Собираю архив…")
+
+    stamp = moscow_now().strftime("%Y%m%d_%H%M")
+    try:
+        # с локальным Bot API архив сразу создаётся на общем томе и уходит по пути, без загрузки
+        result = await export_projects_zip(flt, directory=upload_tmp_dir(), prefix=f"kp_export_{stamp}_")
+    except Exception as e:
+        logger.exception("Export failed: {}", e)
+        await status_msg.edit_text("❌ Не удалось собрать архив.")
+        return
+
+    try:
+        if not result.projects:
+            await status_msg.edit_text("Под фильтр не попал ни один проект.")
+            return
+        limit = document_limit()
+        if result.size_bytes > limit:
+            await status_msg.edit_text(
+                f"❌ Архив {result.size_bytes // (1024 * 1024)} МБ больше лимита Telegram ({limit // (1024 * 1024)} МБ). "
+                "Сузьте период или фильтры."
+            )
+            return
+
+        await bot.send_document(
+            chat_id=m.chat.id,
+            document=input_file(result.path, filename=f"kp_export_{stamp}.zip"),
+            caption=f"📦 Проектов: {result.projects}, КП: {result.kp_files}",
+        )
+        await status_msg.delete()
+    finally:
+        if os.path.exists(result.path):
+            os.remove(result.path)
@@ -1,14 +1,16 @@
 from __future__ import annotations
-import re
 from typing import Optional
 
 from aiogram import Router, F, Bot
-from aiogram.enums import ParseMode
 from aiogram.types import Message, CallbackQuery
 from loguru import logger
 
+from app.bot import outbox
+from app.bot.rendering import Rendered, TextBuilder, plain
+from app.bot.roles import roles
 from app.config import settings
 from app.db.database import async_session_maker
+from app.db.models.roles import Role
 from app.db.models.tasks import TaskDAO, ProjectStatus
 from app.bot.keyboards.kbs import (
     projects_nav_kb,
@@ -19,35 +21,20 @@ from app.scheduler.reminders import schedule_new_task_reminder, cancel_task_remi
 
 router = Router(name="projects")
 
-# --- MarkdownV2 escaping ---
-MDV2_SPECIALS = r'[_*[\]()~`>#+\-=|{}.!]'
-def escape_md_v2(text: str) -> str:
-    if not text:
-        return ""
-    return re.sub(rf'({MDV2_SPECIALS})', r'\\\1', text)
-
-
 # --- Рендер карточки проекта ---
-def render_project_md(
+def render_project_card(
     title: str,
     status_label: str,
     created_str: str,
     index: int,
     total: int
-) -> str:
-    safe_title = escape_md_v2(title)
-    safe_status = escape_md_v2(status_label)
-    safe_created = escape_md_v2(created_str)
-    header = escape_md_v2("📁 Проект")
-    status_cap = escape_md_v2("Статус")
-    created_cap = escape_md_v2("Создан")
-    pos_cap = escape_md_v2("Позиция")
+) -> Rendered:
     return (
-        f"{header}\n\n"
-        f"*{safe_title}*\n"
-        f"{status_cap}: {safe_status}\n"
-        f"{created_cap}: {safe_created}\n"
-        f"{pos_cap}: {index+1}/{total}"
+        TextBuilder()
+        .text("📁 Проект\n\n")
+        .bold(title)
+        .text(f"\nСтатус: {status_label}\nСоздан: {created_str}\nПозиция: {index+1}/{total}")
+        .build()
     )
 
 
@@ -56,18 +43,14 @@ async def _send_project_by_index(message_or_cb, index: int):
     async with async_session_maker() as session:
         total = await TaskDAO.count_all(session)
         if total == 0:
-            text = escape_md_v2("Список проектов пуст.")
+            text = plain("Список проектов пуст.")
             if isinstance(message_or_cb, Message):
                 await message_or_cb.answer(
-                    text,
-                    parse_mode=ParseMode.MARKDOWN_V2,
+                    **text.as_kwargs(),
                     reply_markup=persistent_projects_keyboard(),
                 )
             else:
-                await message_or_cb.message.edit_text(
-                    text,
-                    parse_mode=ParseMode.MARKDOWN_V2
-                )
+                await message_or_cb.message.edit_text(**text.as_kwargs())
             return
 
         # нормализуем индекс в диапазон [0, total-1] (циклическая навигация)
@@ -77,22 +60,22 @@ async def _send_project_by_index(message_or_cb, index: int):
         # id:int, title:str, status:str (РУССКИЙ), created_at:str|'ДД.ММ.ГГГГ ЧЧ:ММ'
         task = await TaskDAO.get_by_offset_desc(session, index_norm)
         if not task:
-            text = escape_md_v2("Не удалось загрузить проект.")
+            text = plain("Не удалось загрузить проект.")
             if isinstance(message_or_cb, Message):
-                await message_or_cb.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+                await message_or_cb.answer(**text.as_kwargs())
             else:
-                await message_or_cb.message.edit_text(text, parse_mode=ParseMode.MARKDOWN_V2)
+                await message_or_cb.message.edit_text(**text.as_kwargs())
             return
 
         status_label = str(task.status)
         created_str = task.created_at or "-"
-        md = render_project_md(task.title, status_label, created_str, index_norm, total)
+        card = render_project_card(task.title, status_label, created_str, index_norm, total)
         kb = projects_nav_kb(task_id=task.id, index=index_norm, total=total)
 
         if isinstance(message_or_cb, Message):
-            await message_or_cb.answer(md, parse_mode=ParseMode.MARKDOWN_V2, reply_markup=kb)
+            await message_or_cb.answer(**card.as_kwargs(), reply_markup=kb)
         else:
-            await message_or_cb.message.edit_text(md, parse_mode=ParseMode.MARKDOWN_V2, reply_markup=kb)
+            await message_or_cb.message.edit_text(**card.as_kwargs(), reply_markup=kb)
 
 
 # --- Кнопка "📁 Проекты" (reply-клавиатура) ---
@@ -170,24 +153,27 @@ async def proj_set_status(cb: CallbackQuery, bot: Bot):
     elif actor == settings.TEAM_PARTNER_ID:
         recipients = [settings.BUSINESS_PARTNER_ID]
     else:
-        recipients = [uid for uid in (settings.ADMIN_IDS or []) if uid != actor]
+        recipients = [uid for uid in roles.members(Role.admin) if uid != actor]
 
     title = getattr(task, "title", "") or ""
     created_at = getattr(task, "created_at", None)
     created_str = created_at.strftime("%d.%m.%Y %H:%M") if created_at else "-"
 
-    def esc(x: str) -> str:
-        import re
-        return re.sub(r'([_*[\]()~`>#+\-=|{}.!])', r'\\\1', x or "")
-
-    header = esc("🔔 Изменён статус проекта")
-    msg = f"{header}\n\n*{esc(title)}*\nСтатус: {esc(new_status_ru)}\nСоздан: {esc(created_str)}"
+    msg = (
+        TextBuilder()
+        .text("🔔 Изменён статус проекта\n\n")
+        .bold(title)
+        .text(f"\nСтатус: {new_status_ru}\nСоздан: {created_str}")
+        .build()
+    )
 
-    for uid in recipients:
-        try:
-            await bot.send_message(chat_id=uid, text=msg, parse_mode=ParseMode.MARKDOWN_V2)
-        except Exception as e:
-            logger.exception("Notify partner {} failed: {}", uid, e)
+    try:
+        await outbox.enqueue(*(
+            outbox.message(uid, f"status:{task_id}:{cb.id}:{uid}", msg.text, entities=msg.entities)
+            for uid in recipients
+        ))
+    except Exception as e:
+        logger.exception("Notify partners {} failed: {}", recipients, e)
 
     # перерисуем карточку
     await _send_project_by_index(cb, index=index)
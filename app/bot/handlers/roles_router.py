@@ -0,0 +1,73 @@
+# app/bot/handlers/roles_router.py
+from __future__ import annotations
+
+import html
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from loguru import logger
+
+from app.bot.roles import roles
+from app.db.database import async_session_maker
+from app.db.models.roles import Role, RoleDAO
+
+router = Router(name="roles")
+
+ROLES_HELP = (
+    "Роли пользователей:\n"
+    "/role — список\n"
+    "/role add &lt;роль&gt; &lt;telegram id&gt;\n"
+    "/role del &lt;роль&gt; &lt;telegram id&gt;\n"
+    "/role reload — перечитать из БД\n\n"
+    f"Роли: {', '.join(role.value for role in Role)}"
+)
+
+
+def _format_roles() -> str:
+    lines = []
+    for role in Role:
+        ids = sorted(roles.members(role))
+        lines.append(f"<b>{role.value}</b>: {', '.join(map(str, ids)) or '—'}")
+    return "\n".join(lines)
+
+
+@router.message(Command("role"))
+async def cmd_role(m: Message, command: CommandObject):
+    if not roles.has(m.from_user.id, Role.admin):
+        await m.answer("⛔ Нет прав на управление ролями.")
+        return
+
+    args = (command.args or "").split()
+    if not args:
+        await m.answer(f"{_format_roles()}\n\n{ROLES_HELP}")
+        return
+
+    if args[0] == "reload":
+        await roles.load()
+        await m.answer(f"🔄 Роли перечитаны.\n\n{_format_roles()}")
+        return
+
+    if args[0] not in ("add", "del") or len(args) != 3:
+        await m.answer(ROLES_HELP)
+        return
+    try:
+        role = Role(args[1])
+        user_id = int(args[2])
+    except ValueError:
+        await m.answer(f"❌ Неверная роль или id: {html.escape(' '.join(args[1:]))}\n\n{ROLES_HELP}")
+        return
+
+    if args[0] == "del" and role == Role.admin and roles.members(Role.admin) == {user_id}:
+        await m.answer("❌ Нельзя снять последнего администратора.")
+        return
+
+    async with async_session_maker() as session:
+        if args[0] == "add":
+            changed = await RoleDAO.grant(session, user_id, role)
+        else:
+            changed = await RoleDAO.revoke(session, user_id, role)
+    # свой кэш — сразу, остальные реплики перечитают по NOTIFY
+    await roles.load()
+    logger.info("Role {} {} for {} by {} (changed={})", args[0], role.value, user_id, m.from_user.id, changed)
+    await m.answer(f"{'✅' if changed else 'ℹ️ Без изменений:'} {args[0]} {role.value} {user_id}\n\n{_format_roles()}")
@@ -1,27 +1,42 @@
 # app/bot/handlers/router.py
 from __future__ import annotations
-import re
-import os
+import asyncio
+import json
+import time
+from datetime import timedelta
 from typing import Any
 from pathlib import Path
 
 from aiogram import Router, F, Bot
-from aiogram.enums import ParseMode
 from aiogram.filters import Command, CommandStart
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message, CallbackQuery, FSInputFile
+from aiogram.types import Message, CallbackQuery
 from loguru import logger
 
+from app.bot import outbox
+from app.bot.acks import acks
+from app.bot.materials import send_kp_document, text_outgoing
+from app.bot.middleware.idempotency import IDEMPOTENT
+from app.bot.middleware.ordering import DETACHED
+from app.bot.middleware.throttling import THROTTLE
+from app.bot.roles import roles
 from app.bot.keyboards.kbs import draft_actions_kb, review_actions_kb, persistent_projects_keyboard, kp_actions_kb, \
-    project_type_kb
+    project_type_kb, resume_project_kb
 from app.db.database import async_session_maker
+from app.db.models.drafts import DraftDAO
+from app.db.models.outbox import utc_now
+from app.db.models.roles import Role
 from app.db.models.tasks import ProjectStatus, TaskDAO
 from app.config import settings
 
 # GPT: вынесенный модуль
 from app.chat_gpt.service import generate_tg_post
 from app.db.models.users import UserDAO
+from app.ingest.attachments import document_ref, ingestor
+from app.jobs.project import GENERATE_PROJECT, format_eta, queue_note
+from app.jobs import job_runner
+from app.jobs.runner import Job, JobAlreadyQueued, JobQueueFull
 from app.scheduler.reminders import schedule_new_task_reminder
 
 # Импортируем сервис генерации КП
@@ -39,150 +54,100 @@ WELCOME = (
     "Сначала выберите тип проекта, затем скиньте все материалы."
 )
 
-# ---- MarkdownV2 экранирование ----
-MDV2_SPECIALS = r'[_*[\]()~`>#+\-=|{}.!]'
-
-
-def escape_md_v2(text: str) -> str:
-    if not text:
-        return ""
-    return re.sub(rf'({MDV2_SPECIALS})', r'\\\1', text)
-
+# ---------------- FSM ----------------
+class Draft(StatesGroup):
+    selecting_type = State()  # Выбор типа проекта
+    collecting = State()  # Сбор материалов
+    reviewing = State()
 
-TELEGRAM_MAX = 4096
-SAFE_CHUNK = 3500  # запас под экранирование/служебные символы
 
+def _attachment_label(msg: Message) -> str | None:
+    if msg.photo:
+        return "Фото"
+    if msg.document:
+        return f"Документ: {msg.document.file_name or 'без имени'}"
+    if msg.audio:
+        return f"Аудио: {msg.audio.file_name or 'audio'}"
+    if msg.voice:
+        return "Голосовое"
+    if msg.video:
+        return "Видео"
+    if msg.video_note:
+        return "Видео-кружок"
+    return None
 
-def _split_text(text: str, max_len: int = SAFE_CHUNK) -> list[str]:
-    if not text:
-        return [""]
-    parts, cur = [], ""
-    for line in text.split("\n"):
-        # если строка длиннее max_len — рубим её кусками
-        while len(line) > max_len:
-            parts.append(line[:max_len])
-            line = line[max_len:]
-        if not cur:
-            cur = line
-        elif len(cur) + 1 + len(line) <= max_len:
-            cur = f"{cur}\n{line}"
-        else:
-            parts.append(cur)
-            cur = line
-    if cur:
-        parts.append(cur)
-    return [p for p in parts if p]
-
-
-async def send_md_v2_chunked(
-        bot: Bot,
-        chat_id: int,
-        text: str,
-        *,
-        header: str | None = None,
-        reply_markup=None
-):
-    """
-    Безопасно шлёт длинные сообщения:
-    - экранирует MarkdownV2 полностью (и header, и text);
-    - режет на части;
-    - reply_markup добавляет только к первой части (если задан).
-    ВАЖНО: сюда не передавать "сырые" Markdown-лексемы (*, _, () и т.д.) — всё будет экранировано.
-    """
-    safe_body = escape_md_v2(text or "")
-    chunks = _split_text(safe_body, SAFE_CHUNK)
-
-    first = True
-    if header:
-        safe_header = escape_md_v2(header)
-        # Добавим заголовок отдельным сообщением — без смешивания с телом
-        await bot.send_message(
-            chat_id=chat_id,
-            text=safe_header,
-            parse_mode=ParseMode.MARKDOWN_V2
-        )
 
-    for ch in chunks:
-        await bot.send_message(
-            chat_id=chat_id,
-            text=ch,
-            parse_mode=ParseMode.MARKDOWN_V2,
-            reply_markup=reply_markup if first and reply_markup is not None else None
-        )
-        first = False
+DRAFT_PURGE_INTERVAL_SECONDS = 3600
+_last_draft_purge = 0.0
 
 
-async def send_kp_document(bot: Bot, chat_id: int, kp_filepath: str, task_id: int):
-    """Отправляет файл КП и удаляет его после отправки"""
+async def _maybe_purge_drafts() -> None:
+    """Брошенные черновики (не дописывались FSM_TTL_SECONDS) — раз в час, попутно с записью."""
+    global _last_draft_purge
+    if time.monotonic() - _last_draft_purge < DRAFT_PURGE_INTERVAL_SECONDS:
+        return
+    _last_draft_purge = time.monotonic()
     try:
-        file = FSInputFile(kp_filepath)
-
-        # Определяем тип файла для caption
-        file_ext = os.path.splitext(kp_filepath)[1].lower()
-        if file_ext == '.pdf':
-            file_type = "📄 Коммерческое предложение (PDF)"
-        elif file_ext == '.docx':
-            file_type = "📝 Коммерческое предложение (Word)"
-        else:
-            file_type = "📋 Коммерческое предложение"
-
-        await bot.send_document(
-            chat_id=chat_id,
-            document=file,
-            caption=f"{file_type} для проекта #{task_id}"
-        )
-
-        # Удаляем файл после отправки
-        if os.path.exists(kp_filepath):
-            os.remove(kp_filepath)
-            logger.info("KP file deleted: {}", kp_filepath)
-
+        async with async_session_maker() as session:
+            purged = await DraftDAO.purge_abandoned(
+                session, older_than=utc_now() - timedelta(seconds=settings.FSM_TTL_SECONDS))
+        if purged:
+            logger.info("Drafts: {} items of abandoned drafts purged", purged)
     except Exception as e:
-        logger.exception("Failed to send KP document: {}", e)
-        if os.path.exists(kp_filepath):
-            try:
-                os.remove(kp_filepath)
-            except:
-                pass
+        logger.exception("Drafts: purge failed: {}", e)
 
 
-# ---------------- FSM ----------------
-class Draft(StatesGroup):
-    selecting_type = State()  # Выбор типа проекта
-    collecting = State()  # Сбор материалов
-    reviewing = State()
+async def _append_to_draft(msg: Message) -> dict[str, int] | None:
+    """
+    Дописывает сообщение в черновик (одна строка draft_items, без перезаписи всего черновика).
+    Текст/подпись и метка вложения идут в бриф для GPT, (chat_id, message_id) — для
+    копирования оригинала партнёрам, документ (PDF, DOCX, TXT) — для извлечения текста.
+    None — черновик упёрся в лимит.
+    """
+    ref = document_ref(msg)
+    await _maybe_purge_drafts()
+    async with async_session_maker() as session:
+        return await DraftDAO.append(
+            session,
+            user_id=msg.from_user.id,
+            chat_id=msg.chat.id,
+            message_id=msg.message_id,
+            text_value=msg.text or msg.caption,
+            attachment=_attachment_label(msg),
+            file_id=ref.file_id if ref else None,
+            file_unique_id=ref.file_unique_id if ref else None,
+            max_items=settings.DRAFT_MAX_ITEMS,
+            max_size=settings.DRAFT_MAX_CHARS,
+        )
 
 
-def _append_to_draft(data: dict[str, Any], msg: Message):
-    texts: list[str] = data.get("texts", [])
-    files: list[str] = data.get("files", [])
+async def _clear_draft(user_id: int) -> None:
+    async with async_session_maker() as session:
+        await DraftDAO.clear(session, user_id)
 
-    if msg.text:
-        texts.append(msg.text)
-    if msg.caption:
-        texts.append(msg.caption)
 
-    if msg.photo:
-        files.append("Фото")
-    if msg.document:
-        files.append(f"Документ: {msg.document.file_name or 'без имени'}")
-    if msg.audio:
-        files.append(f"Аудио: {msg.audio.file_name or 'audio'}")
-    if msg.voice:
-        files.append("Голосовое")
-    if msg.video:
-        files.append("Видео")
-    if msg.video_note:
-        files.append("Видео-кружок")
+def _draft_project_type(data: dict[str, Any]) -> ProjectType | None:
+    value = data.get("project_type")
+    try:
+        return ProjectType(value) if value else None
+    except ValueError:
+        return None
 
-    data["texts"] = texts
-    data["files"] = files
 
+def _draft_attachments(items: list) -> str | None:
+    """Документы черновика для этапа «документы» задачи: JSON [[file_id, file_unique_id, подпись]]."""
+    refs = [[item.file_id, item.file_unique_id, item.attachment] for item in items if item.file_unique_id]
+    return json.dumps(refs, ensure_ascii=False) if refs else None
 
-def _compose_brief_text(data: dict[str, Any]) -> str:
+
+def _compose_brief_text(items: list) -> str:
+    """
+    Бриф для GPT собирается из строк черновика один раз — при отправке проекта.
+    Текст документов дописывает задача generate_project (этап «документы»).
+    """
     parts: list[str] = []
-    texts = data.get("texts") or []
-    files = data.get("files") or []
+    texts = [item.text for item in items if item.text]
+    files = [item.attachment for item in items if item.attachment]
     if texts:
         parts.append("Текстовые сообщения:\n" + "\n\n".join(texts))
     if files:
@@ -197,7 +162,7 @@ async def cmd_start(m: Message, state: FSMContext):
     user_id = m.from_user.id
     logger.info("Command /start by user_id={} username='{}'", user_id, m.from_user.username)
 
-    if user_id not in (settings.ADMIN_IDS or []):
+    if not roles.has(user_id, Role.admin):
         logger.warning("Access denied for user_id={}", user_id)
         await m.answer("⛔ Ошибка доступа. Обратитесь к администратору.")
         return
@@ -232,7 +197,7 @@ async def select_project_type(cb: CallbackQuery, state: FSMContext):
 
     try:
         project_type = ProjectType(project_type_str)
-        await state.update_data(project_type=project_type)
+        await state.update_data(project_type=project_type.value)  # в FSM — только JSON
 
         type_names = {
             ProjectType.MINI_APP: "Mini App/Платформа",
@@ -260,7 +225,8 @@ async def select_project_type(cb: CallbackQuery, state: FSMContext):
             )
 
         await state.set_state(Draft.collecting)
-        await state.update_data(texts=[], files=[])
+        await _clear_draft(cb.from_user.id)
+        acks.forget(cb.message.chat.id)
 
     except ValueError:
         await cb.answer("Неизвестный тип проекта", show_alert=True)
@@ -284,40 +250,43 @@ async def on_any_content(m: Message, state: FSMContext):
         )
         return
 
-    data = await state.get_data()
-    _append_to_draft(data, m)
-    await state.update_data(**data)
-
-    project_type = data.get("project_type")
+    draft = await _append_to_draft(m)
+    if draft is None:
+        await m.answer(
+            "⚠️ Черновик переполнен — это сообщение не добавлено. "
+            "Отправьте проект или очистите черновик.",
+            reply_markup=draft_actions_kb()
+        )
+        return
 
-    # Для типа "Другое" не показываем кнопку "Отправить проект"
-    if project_type == ProjectType.OTHER:
-        reply_markup = None
-        message_text = "Добавил в черновик. Продолжайте отправлять материалы."
-    else:
-        reply_markup = draft_actions_kb()
-        message_text = "Добавил в черновик. Жми «Отправить проект», когда готово."
+    # текст документа извлекается заранее, пока клиент досылает материалы
+    ref = document_ref(m)
+    if ref:
+        ingestor.submit(m.bot, ref)
 
-    logger.debug(
-        "Draft updated by {}: texts={}, files={}",
-        m.from_user.id,
-        len(data.get("texts", [])),
-        len(data.get("files", [])),
-    )
+    data = await state.get_data()
+    logger.debug("Draft updated by {}: items={}, size={}", m.from_user.id, draft["items"], draft["size"])
 
-    await m.answer(
-        message_text,
-        reply_markup=reply_markup
+    # Подтверждение — одно на пачку сообщений/альбом (см. app.bot.acks).
+    # Для типа "Другое" не показываем кнопку "Отправить проект"
+    acks.add(
+        m.bot,
+        m.chat.id,
+        attachment=_attachment_label(m) is not None,
+        total=draft["items"],
+        show_submit=_draft_project_type(data) != ProjectType.OTHER,
+        media_group_id=m.media_group_id,
     )
 
 
 @router.callback_query(F.data == "clear_draft")
 async def clear_draft(cb: CallbackQuery, state: FSMContext):
-    await state.update_data(texts=[], files=[])
+    await _clear_draft(cb.from_user.id)
+    acks.forget(cb.message.chat.id)
     await cb.answer("Черновик очищен")
 
     data = await state.get_data()
-    project_type = data.get("project_type")
+    project_type = _draft_project_type(data)
 
     # Для типа "Другое" не показываем кнопку "Отправить проект"
     if project_type == ProjectType.OTHER:
@@ -335,12 +304,28 @@ async def clear_draft(cb: CallbackQuery, state: FSMContext):
 
 
 # ---------- Генерация поста и КП ----------
-@router.callback_query(F.data == "send_project")
-async def send_project(cb: CallbackQuery, state: FSMContext, bot: Bot):
+async def _queue_full_text() -> str:
+    retry = await job_runner.retry_after(GENERATE_PROJECT)
+    return f"Сейчас в работе слишком много проектов. Попробуйте {format_eta(retry)}."
+
+
+async def _send_project_key(cb: CallbackQuery, data: dict[str, Any]) -> str:
+    """
+    Повтор = тот же пользователь и то же сообщение с кнопкой. Состояние черновика
+    в ключ не входит: повтор выполняется после первого нажатия (апдейты чата идут
+    по очереди), когда черновик уже очищен, и получил бы другой ключ. После отправки
+    сообщение с кнопкой становится прогрессом, новый черновик — новое сообщение.
+    """
+    message_id = cb.message.message_id if cb.message else cb.id
+    return f"send_project:{cb.from_user.id}:{message_id}"
+
+
+@router.callback_query(F.data == "send_project", flags={IDEMPOTENT: _send_project_key, THROTTLE: "send_project"})
+async def send_project(cb: CallbackQuery, state: FSMContext, bot: Bot) -> str | None:
+    """Возвращает ответ для повторных нажатий (кэшируется IdempotencyMiddleware)."""
     user_id = cb.from_user.id
     data = await state.get_data()
-    brief = _compose_brief_text(data)
-    project_type = data.get("project_type")
+    project_type = _draft_project_type(data)
 
     if not project_type:
         await cb.answer("Сначала выберите тип проекта", show_alert=True)
@@ -351,6 +336,22 @@ async def send_project(cb: CallbackQuery, state: FSMContext, bot: Bot):
         )
         return
 
+    if await job_runner.is_full():
+        await cb.answer(await _queue_full_text(), show_alert=True)
+        return
+
+    async with async_session_maker() as session:
+        draft_items = await DraftDAO.items(session, user_id)
+    if not draft_items:
+        await cb.answer("Черновик пуст — сначала пришлите материалы", show_alert=True)
+        return
+
+    # дальше только записи в БД и постановка задачи — отвечаем сразу;
+    # разбор документов ждёт уже задача (этап «документы»)
+    await cb.answer()
+    # отложенное «Добавил в черновик» после «Принял» только запутает
+    acks.forget(cb.message.chat.id)
+    brief = _compose_brief_text(draft_items)
     logger.info("Generation requested by {} type={} brief_len={}", user_id, project_type.value, len(brief))
 
     # 1) Черновик — сразу в БД с типом проекта
@@ -362,7 +363,10 @@ async def send_project(cb: CallbackQuery, state: FSMContext, bot: Bot):
             status=ProjectStatus.new.value,
             created_by=user_id,
             brief_text=brief,
-            project_type=project_type.value  # Сохраняем тип проекта в БД
+            project_type=project_type.value,  # Сохраняем тип проекта в БД
+            # исходные сообщения — для копий «сырых материалов», в том числе при «Продолжить»
+            source_messages=json.dumps([[item.chat_id, item.message_id] for item in draft_items]),
+            attachments=_draft_attachments(draft_items),
         )
         task_id = task.id
     logger.info("Draft project saved id={} by={} type={} status='{}'",
@@ -371,148 +375,33 @@ async def send_project(cb: CallbackQuery, state: FSMContext, bot: Bot):
     # 1.1) Ставим напоминание для ОБОИХ партнеров
     schedule_new_task_reminder(task_id)
 
-    # 2) Мгновенные уведомления пользователю
-    try:
-        await cb.message.edit_text("Принял. Готовлю пост и КП…")
-    except Exception as e:
-        logger.exception("Edit message failed: {}", e)
-
-    # 3) GPT - генерация поста
-    try:
-        gpt_resp = await generate_tg_post(brief)
-        title = (gpt_resp.get("title") or "").strip()[:255] or "Без названия"
-        tg_post = (gpt_resp.get("tg_post") or "").strip()
-        logger.info("GPT ok for task {}: title='{}' post_len={}", task_id, title, len(tg_post))
-    except Exception as e:
-        logger.exception("GPT generation failed: {}", e)
-        await cb.message.edit_text("❌ Не удалось сгенерировать пост. Попробуйте ещё раз /new.")
-        return
-
-    # 4) Обновим title у задачи
-    async with async_session_maker() as session:
-        await TaskDAO.update(session, {"id": task_id}, title=title)
-
-    # 5) Генерация КП с учетом типа проекта
-    kp_filepath = None
+    # 2) Пост, КП и рассылка — фоновой задачей; это сообщение станет прогрессом
+    # черновик уже сохранён в задачу: если очередь успели занять, проект запустится «Продолжить»
     try:
-        logger.info("Generating KP for task {} type={}...", task_id, project_type.value)
-        kp_service = KPService()
-        kp_filepath = await kp_service.create_kp_document(brief, title, project_type)
-        logger.info("KP generated successfully: {}", kp_filepath)
-    except Exception as e:
-        logger.exception("KP generation failed for task {}: {}", task_id, e)
-        # Продолжаем работу даже если КП не сгенерировалось
-
-    # 6) Рассылка материалов по четкой логике
+        admission = await job_runner.submit(Job(GENERATE_PROJECT, {
+            "task_id": task_id,
+            "user_id": user_id,
+            "chat_id": cb.message.chat.id,
+            "message_id": cb.message.message_id,
+        }, key=f"project:{task_id}"))
+        text, reply_markup = f"Принял. Готовлю пост и КП для проекта #{task_id}…{queue_note(admission)}", None
+        repeat_answer = f"Проект #{task_id} уже в работе"
+    except JobQueueFull:
+        logger.warning("Project {} saved but not queued: job queue is full", task_id)
+        retry = await job_runner.retry_after(GENERATE_PROJECT)
+        text = (f"Проект #{task_id} сохранён, но сейчас в работе слишком много проектов. "
+                f"Нажмите «Продолжить» {format_eta(retry)}.")
+        reply_markup = resume_project_kb(task_id)
+        repeat_answer = f"Проект #{task_id} сохранён — нажмите «Продолжить»"
     try:
-        # ВСЕГДА отправляем полные материалы ОТПРАВИТЕЛЮ
-        await send_md_v2_chunked(
-            bot, user_id,
-            text=f"{title}\n\n{brief}",
-            header=f"📎 Сырые материалы клиента (ID: {task_id})",
-        )
-
-        # Отправляем пост с кнопками перегенерации ОТПРАВИТЕЛЮ
-        await send_md_v2_chunked(
-            bot, user_id,
-            text=tg_post,
-            header="📝 Сгенерированный пост",
-            reply_markup=review_actions_kb(task_id)
-        )
-
-        # Определяем кому какие материалы отправлять
-        if user_id == settings.TEAM_PARTNER_ID:
-            # Если отправил TEAM_PARTNER - BUSINESS_PARTNER получает только уведомление
-            partner_message = f"🆕 Новый проект: {title}. Задача взята в работу."
-            await bot.send_message(settings.BUSINESS_PARTNER_ID, partner_message)
-
-        elif user_id == settings.BUSINESS_PARTNER_ID:
-            # Если отправил BUSINESS_PARTNER - TEAM_PARTNER получает ВСЕ материалы
-            await send_md_v2_chunked(
-                bot, settings.TEAM_PARTNER_ID,
-                text=f"{title}\n\n{brief}",
-                header=f"📎 Сырые материалы клиента (ID: {task_id})",
-            )
-            await send_md_v2_chunked(
-                bot, settings.TEAM_PARTNER_ID,
-                text=tg_post,
-                header="📝 Сгенерированный пост",
-                reply_markup=review_actions_kb(task_id)
-            )
-
-        else:
-            # Если отправил кто-то другой
-            # TEAM_PARTNER получает ВСЕ материалы
-            await send_md_v2_chunked(
-                bot, settings.TEAM_PARTNER_ID,
-                text=f"{title}\n\n{brief}",
-                header=f"📎 Сырые материалы клиента (ID: {task_id})",
-            )
-            await send_md_v2_chunked(
-                bot, settings.TEAM_PARTNER_ID,
-                text=tg_post,
-                header="📝 Сгенерированный пост",
-                reply_markup=review_actions_kb(task_id)
-            )
-            # BUSINESS_PARTNER получает только уведомление
-            partner_message = f"🆕 Новый проект: {title}. Задача взята в работу."
-            await bot.send_message(settings.BUSINESS_PARTNER_ID, partner_message)
-
-        # ВСЕМ отправляем КП файл если он сгенерировался
-        if kp_filepath and os.path.exists(kp_filepath):
-            # Определяем список получателей КП
-            kp_recipients = [user_id, settings.TEAM_PARTNER_ID, settings.BUSINESS_PARTNER_ID]
-
-            for recipient_id in set(kp_recipients):  # убираем дубликаты
-                try:
-                    # Создаем уникальную копию файла для каждого получателя
-                    file_ext = os.path.splitext(kp_filepath)[1]
-                    kp_copy_path = kp_filepath.replace(file_ext, f'_{recipient_id}{file_ext}')
-                    import shutil
-                    shutil.copy2(kp_filepath, kp_copy_path)
-
-                    await send_kp_document(bot, recipient_id, kp_copy_path, task_id)
-
-                    # Отправляем клавиатуру действий с КП
-                    await bot.send_message(
-                        recipient_id,
-                        f"📄 КП для проекта #{task_id} готово. Что делаем дальше?",
-                        reply_markup=kp_actions_kb(task_id)
-                    )
-
-                    logger.info("KP sent to recipient {}", recipient_id)
-
-                except Exception as e:
-                    logger.exception("Failed to send KP to recipient {}: {}", recipient_id, e)
-
-        # Финальное уведомление для отправителя
-        await bot.send_message(
-            user_id,
-            f"✅ Проект #{task_id} обработан. Материалы отправлены участникам"
-        )
-
+        await cb.message.edit_text(text, reply_markup=reply_markup)
     except Exception as e:
-        logger.exception("Dispatch failed: {}", e)
+        logger.exception("Edit message failed: {}", e)
 
-    # 8) Финальная очистка
-    finally:
-        # Очищаем состояние и начинаем заново с выбора типа
-        await state.set_state(Draft.selecting_type)
-        await state.update_data(texts=[], files=[])
-
-        # Удаляем временные файлы если остались
-        if kp_filepath and os.path.exists(kp_filepath):
-            try:
-                os.remove(kp_filepath)
-                # Удаляем все возможные копии файлов
-                all_recipients = [user_id, settings.BUSINESS_PARTNER_ID, settings.TEAM_PARTNER_ID]
-                for recipient_id in all_recipients:
-                    file_ext = os.path.splitext(kp_filepath)[1]
-                    copy_path = kp_filepath.replace(file_ext, f'_{recipient_id}{file_ext}')
-                    if os.path.exists(copy_path):
-                        os.remove(copy_path)
-            except Exception as e:
-                logger.exception("Failed to clean up KP files: {}", e)
+    # 3) Очищаем состояние и начинаем заново с выбора типа
+    await state.set_state(Draft.selecting_type)
+    await _clear_draft(user_id)
+    return repeat_answer
 
 
 # ---------- Одобрение / Перегенерация / Отмена ----------
@@ -523,9 +412,52 @@ def _parse_task_id(data: str) -> int | None:
         return None
 
 
+@router.callback_query(F.data.startswith("project:resume:"), flags={THROTTLE: "send_project"})
+async def cb_project_resume(cb: CallbackQuery):
+    """Продолжить генерацию с первого незавершённого этапа (готовые берутся из задачи)"""
+    task_id = _parse_task_id(cb.data)
+    if not task_id:
+        await cb.answer("task_id не найден", show_alert=True)
+        return
+
+    async with async_session_maker() as session:
+        task = await TaskDAO.find_one_or_none_by_id(session, task_id)
+    if not task:
+        await cb.answer("Проект не найден", show_alert=True)
+        return
+    if cb.from_user.id != task.created_by and not roles.has(cb.from_user.id, Role.admin):
+        await cb.answer("Нет прав на действие", show_alert=True)
+        return
+    if task.dispatched_at is not None:
+        await cb.answer("Проект уже обработан")
+        return
+    try:
+        if await job_runner.is_full():
+            raise JobQueueFull
+        # key — второй запуск, пока первый ждёт или идёт, не встанет в очередь
+        admission = await job_runner.submit(Job(GENERATE_PROJECT, {
+            "task_id": task_id,
+            "user_id": task.created_by,
+            "chat_id": cb.message.chat.id,
+            "message_id": cb.message.message_id,
+        }, key=f"project:{task_id}"))
+    except JobQueueFull:
+        await cb.answer(await _queue_full_text(), show_alert=True)
+        return
+    except JobAlreadyQueued:
+        await cb.answer(f"Проект #{task_id} уже в работе", show_alert=True)
+        return
+    await cb.answer("Продолжаю…")
+    try:
+        await cb.message.edit_text(f"Продолжаю проект #{task_id}…{queue_note(admission)}", parse_mode=None)
+    except Exception as e:
+        logger.exception("Edit message failed: {}", e)
+    logger.info("Project {} resume requested by {}", task_id, cb.from_user.id)
+
+
 @router.callback_query(F.data.startswith("post:approve:"))
 async def cb_post_approve(cb: CallbackQuery, state: FSMContext):
-    if cb.from_user.id != settings.BUSINESS_PARTNER_ID:
+    if not roles.has(cb.from_user.id, Role.business_partner):
         await cb.answer("Нет прав на действие", show_alert=True)
         return
 
@@ -548,7 +480,7 @@ async def cb_post_approve(cb: CallbackQuery, state: FSMContext):
 
 @router.callback_query(F.data.startswith("post:cancel:"))
 async def cb_post_cancel(cb: CallbackQuery, state: FSMContext):
-    if cb.from_user.id != settings.BUSINESS_PARTNER_ID:
+    if not roles.has(cb.from_user.id, Role.business_partner):
         await cb.answer("Нет прав на действие", show_alert=True)
         return
 
@@ -565,9 +497,9 @@ async def cb_post_cancel(cb: CallbackQuery, state: FSMContext):
     logger.info("Post cancel by {} for task {}", cb.from_user.id, task_id)
 
 
-@router.callback_query(F.data.startswith("post:regen:"))
+@router.callback_query(F.data.startswith("post:regen:"), flags={DETACHED: True, THROTTLE: "regen"})
 async def cb_post_regen(cb: CallbackQuery, state: FSMContext, bot: Bot):
-    if cb.from_user.id != settings.BUSINESS_PARTNER_ID:
+    if not roles.has(cb.from_user.id, Role.business_partner):
         await cb.answer("Нет прав на действие", show_alert=True)
         return
 
@@ -592,27 +524,27 @@ async def cb_post_regen(cb: CallbackQuery, state: FSMContext, bot: Bot):
         new_post = (gpt_resp.get("tg_post") or "").strip()
 
         async with async_session_maker() as session:
-            await TaskDAO.update(session, {"id": task_id}, title=new_title)
+            await TaskDAO.update(session, {"id": task_id}, title=new_title, tg_post=new_post)
     except Exception as e:
         logger.exception("Regen failed for task {}: {}", task_id, e)
         await cb.message.answer("❌ Ошибка генерации. Попробуйте ещё раз позже.")
         return
 
     try:
-        await send_md_v2_chunked(
-            bot, cb.from_user.id,
+        await outbox.enqueue(*text_outgoing(
+            cb.from_user.id, f"post:{task_id}:regen:{cb.id}",
             text=new_post,
             header=f"🔁 Новая версия поста (ID: {task_id}) — {new_title}",
             reply_markup=review_actions_kb(task_id),
-        )
+        ))
     except Exception as e:
         logger.exception("Send new version failed: {}", e)
 
 
-@router.callback_query(F.data.startswith("kp:regen:"))
+@router.callback_query(F.data.startswith("kp:regen:"), flags={DETACHED: True, THROTTLE: "regen"})
 async def cb_kp_regen(cb: CallbackQuery, bot: Bot):
     """Перегенерация КП"""
-    if cb.from_user.id not in (settings.ADMIN_IDS or []):
+    if not roles.has(cb.from_user.id, Role.admin):
         await cb.answer("Нет прав на действие", show_alert=True)
         return
 
@@ -641,27 +573,62 @@ async def cb_kp_regen(cb: CallbackQuery, bot: Bot):
     try:
         # Генерируем новое КП с учетом сохраненного типа проекта
         kp_service = KPService()
-        kp_filepath = await kp_service.create_kp_document(brief, title, project_type)
-
-        # Отправляем новое КП
-        await send_kp_document(bot, cb.from_user.id, kp_filepath, task_id)
+        kp_doc = await kp_service.create_kp(brief, title, project_type)
+        async with async_session_maker() as session:
+            await TaskDAO.save_kp_document(session, task_id, kp_doc)
+        # рендер — CPU на секунды, не держим event loop
+        kp_filepath = await asyncio.to_thread(kp_service.export_kp, kp_doc, title)
+        async with async_session_maker() as session:
+            await TaskDAO.save_kp_file(session, task_id, kp_filepath)
 
-        # Отправляем клавиатуру действий
-        await bot.send_message(
-            cb.from_user.id,
+        # Отправляем новое КП и клавиатуру действий
+        await send_kp_document(cb.from_user.id, kp_filepath, task_id, key=f"kp:{task_id}:regen:{cb.id}")
+        await outbox.enqueue(outbox.message(
+            cb.from_user.id, f"kp:{task_id}:regen_actions:{cb.id}",
             "📄 Новое КП сгенерировано. Что делаем дальше?",
             reply_markup=kp_actions_kb(task_id)
-        )
+        ))
 
     except Exception as e:
         logger.exception("KP regen failed for task {}: {}", task_id, e)
         await cb.message.answer("❌ Ошибка генерации КП. Попробуйте ещё раз позже.")
 
 
+@router.callback_query(F.data.startswith("kp:export:"), flags={DETACHED: True})
+async def cb_kp_export(cb: CallbackQuery, bot: Bot):
+    """Повторная выгрузка сохранённого КП в нужный формат — без обращения к GPT"""
+    if not roles.has(cb.from_user.id, Role.admin):
+        await cb.answer("Нет прав на действие", show_alert=True)
+        return
+
+    task_id = _parse_task_id(cb.data)
+    if not task_id:
+        await cb.answer("task_id не найден", show_alert=True)
+        return
+    parts = cb.data.split(":")
+    fmt = parts[3] if len(parts) > 3 else "docx"
+
+    async with async_session_maker() as session:
+        task = await TaskDAO.find_one_or_none_by_id(session, task_id)
+        kp_doc = await TaskDAO.get_kp_document(session, task_id)
+    if not task or kp_doc is None:
+        await cb.answer("Сохранённое КП не найдено — перегенерируйте его", show_alert=True)
+        return
+
+    await cb.answer("Выгружаю КП…")
+    try:
+        # рендер — CPU на секунды, не держим event loop
+        kp_filepath = await asyncio.to_thread(KPService().export_kp, kp_doc, task.title or "Проект", fmt)
+        await send_kp_document(cb.from_user.id, kp_filepath, task_id, key=f"kp:{task_id}:export:{cb.id}")
+    except Exception as e:
+        logger.exception("KP export failed for task {} fmt={}: {}", task_id, fmt, e)
+        await cb.message.answer("❌ Не удалось выгрузить КП.")
+
+
 @router.callback_query(F.data.startswith("kp:approve:"))
 async def cb_kp_approve(cb: CallbackQuery):
     """Подтверждение КП"""
-    if cb.from_user.id not in (settings.ADMIN_IDS or []):
+    if not roles.has(cb.from_user.id, Role.admin):
         await cb.answer("Нет прав на действие", show_alert=True)
         return
 
@@ -0,0 +1,155 @@
+# app/bot/http_session.py
+"""
+HTTP-сессия бота к Bot API с настраиваемым пулом соединений.
+
+Стандартная AiohttpSession aiogram не даёт настроить keep-alive, лимит на хост
+и таймаут соединения, а всплески рассылки (документы трём получателям,
+напоминания) упираются в пул незаметно. TunedAiohttpSession:
+- TCPConnector с TELEGRAM_HTTP_LIMIT / _LIMIT_PER_HOST, keep-alive и кэшем DNS;
+- таймаут установки соединения отдельно от общего таймаута запроса;
+- прокси (TELEGRAM_PROXY, нужен aiohttp-socks);
+- статистика пула через aiohttp TraceConfig: запросы, новые/переиспользованные
+  соединения, ожидание свободного соединения — snapshot() и лог раз в минуту.
+"""
+from __future__ import annotations
+
+import time
+from typing import Any, Optional
+
+from aiogram import Bot
+from aiogram.__meta__ import __version__ as aiogram_version
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import TelegramMethod
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, TraceConfig
+from aiohttp.hdrs import USER_AGENT
+from aiohttp.http import SERVER_SOFTWARE
+from loguru import logger
+
+REPORT_INTERVAL_SECONDS = 60
+
+
+class ConnectorStats:
+    """Счётчики пула за интервал отчёта плюс текущее состояние коннектора."""
+
+    def __init__(self):
+        self.requests = 0
+        self.created = 0
+        self.reused = 0
+        self.queued = 0          # запросов ждали свободного соединения (упёрлись в limit)
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.waiting = 0         # ждут прямо сейчас
+
+    def reset(self) -> None:
+        self.requests = self.created = self.reused = self.queued = 0
+        self.wait_total = self.wait_max = 0.0
+
+
+class TunedAiohttpSession(AiohttpSession):
+    def __init__(
+        self,
+        *,
+        limit: int,
+        limit_per_host: int,
+        dns_ttl: int,
+        keepalive_seconds: float,
+        connect_timeout: float,
+        timeout: float,
+        proxy: Optional[str] = None,
+        **kwargs: Any,
+    ):
+        """timeout — общий таймаут запроса (long polling добавляет к нему свой), connect_timeout — на соединение."""
+        super().__init__(proxy=proxy, limit=limit, timeout=timeout, **kwargs)
+        self._connector_init.update(
+            limit=limit,
+            limit_per_host=limit_per_host,
+            ttl_dns_cache=dns_ttl,
+            keepalive_timeout=keepalive_seconds,
+        )
+        self._connect_timeout = connect_timeout
+        self._connector: Optional[TCPConnector] = None
+        self.stats = ConnectorStats()
+        self._last_report = time.monotonic()
+
+    async def create_session(self) -> ClientSession:
+        # как в AiohttpSession.create_session, плюс trace_configs для статистики пула
+        if self._should_reset_connector:
+            await self.close()
+        if self._session is None or self._session.closed:
+            self._connector = self._connector_type(**self._connector_init)
+            self._session = ClientSession(
+                connector=self._connector,
+                headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{aiogram_version}"},
+                trace_configs=[self._trace_config()],
+            )
+            self._should_reset_connector = False
+        return self._session
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: Optional[int] = None) -> Any:
+        # aiogram передаёт в aiohttp число — это только total; таймаут соединения добавляем сами
+        total = self.timeout if timeout is None else timeout
+        client_timeout = ClientTimeout(total=total, sock_connect=min(self._connect_timeout, total))
+        return await super().make_request(bot, method, timeout=client_timeout)  # type: ignore[arg-type]
+
+    def snapshot(self) -> dict[str, Any]:
+        connector = self._connector
+        acquired = len(getattr(connector, "_acquired", ())) if connector else 0
+        idle = sum(len(conns) for conns in getattr(connector, "_conns", {}).values()) if connector else 0
+        return {
+            "limit": connector.limit if connector else self._connector_init.get("limit"),
+            "limit_per_host": connector.limit_per_host if connector else self._connector_init.get("limit_per_host"),
+            "acquired": acquired,
+            "idle": idle,
+            "waiting": self.stats.waiting,
+            "requests": self.stats.requests,
+            "created": self.stats.created,
+            "reused": self.stats.reused,
+            "queued": self.stats.queued,
+            "wait_avg_ms": round(1000 * self.stats.wait_total / self.stats.queued) if self.stats.queued else 0,
+            "wait_max_ms": round(1000 * self.stats.wait_max),
+        }
+
+    def _trace_config(self) -> TraceConfig:
+        stats = self.stats
+        trace = TraceConfig()
+
+        async def on_request_start(session, ctx, params) -> None:
+            stats.requests += 1
+            self._maybe_report()
+
+        async def on_queued_start(session, ctx, params) -> None:
+            ctx.queued_at = time.monotonic()
+            stats.waiting += 1
+
+        async def on_queued_end(session, ctx, params) -> None:
+            waited = time.monotonic() - ctx.queued_at
+            stats.waiting -= 1
+            stats.queued += 1
+            stats.wait_total += waited
+            stats.wait_max = max(stats.wait_max, waited)
+
+        async def on_create_end(session, ctx, params) -> None:
+            stats.created += 1
+
+        async def on_reuse(session, ctx, params) -> None:
+            stats.reused += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_queued_start.append(on_queued_start)
+        trace.on_connection_queued_end.append(on_queued_end)
+        trace.on_connection_create_end.append(on_create_end)
+        trace.on_connection_reuseconn.append(on_reuse)
+        return trace
+
+    def _maybe_report(self) -> None:
+        now = time.monotonic()
+        if now - self._last_report < REPORT_INTERVAL_SECONDS:
+            return
+        self._last_report = now
+        s = self.snapshot()
+        log = logger.warning if s["queued"] else logger.info
+        log("Bot API HTTP: requests={} connections acquired={} idle={} limit={}/{} new={} reused={} "
+            "queued={} wait avg={}ms max={}ms",
+            s["requests"], s["acquired"], s["idle"], s["limit"], s["limit_per_host"] or "-", s["created"],
+            s["reused"], s["queued"], s["wait_avg_ms"], s["wait_max_ms"])
+        self.stats.reset()
@@ -20,11 +20,21 @@ def review_actions_kb(task_id: int) -> InlineKeyboardMarkup:
     kb.adjust(1)
     return kb.as_markup()
 
+
+def resume_project_kb(task_id: int) -> InlineKeyboardMarkup:
+    kb = InlineKeyboardBuilder()
+    kb.button(text="▶️ Продолжить", callback_data=f"project:resume:{task_id}")
+    return kb.as_markup()
+
+
 def kp_actions_kb(task_id: int) -> InlineKeyboardMarkup:
     """Клавиатура для действий с КП"""
     kb = InlineKeyboardBuilder()
     kb.button(text="📄 Перегенерировать КП", callback_data=f"kp:regen:{task_id}")
+    kb.button(text="📝 Выгрузить Word", callback_data=f"kp:export:{task_id}:docx")
+    kb.button(text="📄 Выгрузить PDF", callback_data=f"kp:export:{task_id}:pdf")
     kb.button(text="✅ Готово", callback_data=f"kp:approve:{task_id}")
+    kb.adjust(1)
     return kb.as_markup()
 
 
@@ -0,0 +1,90 @@
+# app/bot/materials.py
+"""
+Сообщения с материалами проекта для очереди outbox: длинные тексты (бриф, пост),
+копии исходных сообщений клиента и файл КП.
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Iterator
+
+from loguru import logger
+
+from app.bot import outbox
+from app.bot.rendering import TextBuilder, iter_chunks, plain
+
+
+def text_messages(
+        text: str,
+        *,
+        header: str | None = None,
+        reply_markup=None
+) -> Iterator[dict[str, Any]]:
+    """
+    Лениво готовит аргументы bot.send_message для длинного текста:
+    - текст уходит как есть, без parse_mode — экранировать ничего не нужно;
+    - режет на части по лимиту Telegram (4096 UTF-16 единиц), по абзацам/предложениям/словам;
+    - header (жирный) идёт отдельным первым сообщением;
+    - reply_markup добавляет только к первой части текста (если задан).
+    Части отдаются по мере нарезки — первую можно отправлять, не дожидаясь остальных.
+    """
+    if header:
+        # Добавим заголовок отдельным сообщением — без смешивания с телом
+        yield TextBuilder().bold(header).build().as_kwargs()
+
+    for i, chunk in enumerate(iter_chunks(plain(text))):
+        yield {**chunk.as_kwargs(), "reply_markup": reply_markup if i == 0 else None}
+
+
+def text_outgoing(
+        chat_id: int,
+        key: str,
+        text: str,
+        *,
+        header: str | None = None,
+        reply_markup=None
+) -> Iterator[outbox.Outgoing]:
+    """Длинный текст -> сообщения для очереди outbox (лениво); key — префикс ключей идемпотентности."""
+    for i, kwargs in enumerate(text_messages(text, header=header, reply_markup=reply_markup)):
+        yield outbox.message(chat_id, f"{key}:{i}", **kwargs)
+
+
+def raw_outgoing(
+        chat_id: int,
+        key: str,
+        *,
+        header: str,
+        sources: list[tuple[int, int]],
+        fallback_text: str
+) -> Iterator[outbox.Outgoing]:
+    """
+    Сырые материалы: заголовок + копии исходных сообщений клиента (файлы, фото, голосовые —
+    без перезагрузки, по 100 за запрос). Пустой черновик — текстом.
+    """
+    if not sources:
+        yield from text_outgoing(chat_id, key, fallback_text, header=header)
+        return
+    yield outbox.message(chat_id, f"{key}:header", **TextBuilder().bold(header).build().as_kwargs())
+    yield from outbox.copies(chat_id, f"{key}:copy", sources)
+
+
+def kp_caption(kp_filepath: str, task_id: int) -> str:
+    # Определяем тип файла для caption
+    file_ext = os.path.splitext(kp_filepath)[1].lower()
+    if file_ext == '.pdf':
+        file_type = "📄 Коммерческое предложение (PDF)"
+    elif file_ext == '.docx':
+        file_type = "📝 Коммерческое предложение (Word)"
+    else:
+        file_type = "📋 Коммерческое предложение"
+    return f"{file_type} для проекта #{task_id}"
+
+
+async def send_kp_document(chat_id: int, kp_filepath: str, task_id: int, *, key: str):
+    """Ставит файл КП в очередь outbox (содержимое копируется в БД) и удаляет файл"""
+    try:
+        await outbox.enqueue(outbox.document(chat_id, key, kp_filepath, caption=kp_caption(kp_filepath, task_id)))
+    finally:
+        if os.path.exists(kp_filepath):
+            os.remove(kp_filepath)
+            logger.info("KP file deleted: {}", kp_filepath)
@@ -2,13 +2,15 @@ from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, Message, CallbackQuery
 from typing import Callable, Dict, Any, Awaitable
 
-from app.config import settings
+from app.bot.roles import RoleRegistry, roles
+from app.db.models.roles import Role
 
 
 class AllowAdminsOnly(BaseMiddleware):
-    def __init__(self, admin_ids: list[int]):
+    def __init__(self, registry: RoleRegistry):
         super().__init__()
-        self.admin_ids = set(admin_ids)
+        # роли в памяти процесса: проверка без запроса к БД
+        self.registry = registry
 
     async def __call__(
         self,
@@ -22,7 +24,7 @@ class AllowAdminsOnly(BaseMiddleware):
         elif isinstance(event, CallbackQuery) and event.from_user:
             user_id = event.from_user.id
 
-        if user_id is None or user_id not in self.admin_ids:
+        if user_id is None or not self.registry.has(user_id, Role.admin):
             # молча игнорируем или отвечаем — выбери поведение
             if isinstance(event, Message):
                 await event.answer("⛔ Доступ запрещён.")
@@ -34,4 +36,4 @@ class AllowAdminsOnly(BaseMiddleware):
 
 
 def build_auth_middleware():
-    return AllowAdminsOnly(admin_ids=list(settings.ADMIN_IDS or []))
+    return AllowAdminsOnly(roles)
@@ -0,0 +1,95 @@
+# app/bot/middleware/idempotency.py
+"""
+Защита от повторов: двойное нажатие кнопки или повторная доставка callback'а
+Telegram не доходят до хендлера.
+
+Хендлер помечается флагом с функцией ключа:
+
+    @router.callback_query(F.data == "send_project", flags={IDEMPOTENT: send_project_key})
+
+Первый апдейт с ключом берёт блокировку (IDEMPOTENCY_LOCK_SECONDS) и выполняется.
+Если хендлер вернул строку, она кэшируется на IDEMPOTENCY_RESULT_SECONDS и
+показывается повторам; иначе (ранний выход, ошибка) ключ освобождается,
+чтобы можно было повторить. Повтор, пришедший во время выполнения, сразу
+получает «уже в работе».
+"""
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, TelegramObject
+from loguru import logger
+
+from app.db.database import async_session_maker
+from app.db.models.idempotency import IdempotencyDAO
+from app.db.models.outbox import utc_now
+
+IDEMPOTENT = "idempotent"
+
+# (event, data) -> ключ; None — не защищать этот апдейт
+IdempotencyKeyFn = Callable[[TelegramObject, Dict[str, Any]], Awaitable[Optional[str]]]
+
+IN_PROGRESS_TEXT = "⏳ Уже в работе"
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class IdempotencyMiddleware(BaseMiddleware):
+    def __init__(self, *, lock_seconds: int, result_seconds: int):
+        super().__init__()
+        self._lock = timedelta(seconds=lock_seconds)
+        self._result = timedelta(seconds=result_seconds)
+        self._last_purge = 0.0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        key_fn: Optional[IdempotencyKeyFn] = get_flag(data, IDEMPOTENT)
+        key = await key_fn(event, data) if key_fn else None
+        if key is None:
+            return await handler(event, data)
+
+        await self._maybe_purge()
+        async with async_session_maker() as session:
+            acquired = await IdempotencyDAO.acquire(session, key, expires_at=utc_now() + self._lock)
+        if not acquired:
+            async with async_session_maker() as session:
+                record = await IdempotencyDAO.get(session, key)
+            reply = record.result if record and record.status == "done" and record.result else IN_PROGRESS_TEXT
+            logger.info("Duplicate update suppressed: {} ({})", key, record.status if record else "expired")
+            if isinstance(event, CallbackQuery):
+                await event.answer(reply)
+            return None
+
+        result = None
+        try:
+            result = await handler(event, data)
+            return result
+        finally:
+            try:
+                async with async_session_maker() as session:
+                    if isinstance(result, str):
+                        await IdempotencyDAO.complete(session, key, result=result, expires_at=utc_now() + self._result)
+                    else:
+                        await IdempotencyDAO.release(session, key)
+            except Exception as e:
+                # блокировка всё равно истечёт через IDEMPOTENCY_LOCK_SECONDS
+                logger.exception("Idempotency key {} not finalized: {}", key, e)
+
+    async def _maybe_purge(self) -> None:
+        if time.monotonic() - self._last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = time.monotonic()
+        try:
+            async with async_session_maker() as session:
+                purged = await IdempotencyDAO.purge_expired(session)
+            if purged:
+                logger.info("Idempotency: {} expired keys purged", purged)
+        except Exception as e:
+            logger.exception("Idempotency: purge failed: {}", e)
@@ -0,0 +1,174 @@
+# app/bot/middleware/ordering.py
+"""
+Порядок обработки апдейтов: чаты — параллельно, внутри чата — строго по очереди.
+
+aiogram запускает каждый апдейт отдельной задачей (polling: handle_as_tasks,
+webhook: handle_in_background), так что два быстрых нажатия из одного чата
+могут гоняться за FSM-состояние. ChatOrderMiddleware (outer-middleware на
+dp.update) выстраивает апдейты чата в очередь, а число одновременно
+обрабатываемых апдейтов ограничивает UPDATES_MAX_PARALLEL.
+
+Тяжёлые хендлеры (GPT, рендер, выгрузка) помечаются флагом:
+
+    @router.callback_query(F.data.startswith("kp:regen:"), flags={DETACHED: True})
+
+DetachedMiddleware (inner, после фильтров — флаги уже известны) отпускает очередь
+чата и общий слот до запуска такого хендлера: следующие апдейты чата не ждут
+генерацию. Detached-хендлер не должен полагаться на неизменность FSM-состояния.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import TelegramObject
+from loguru import logger
+
+DETACHED = "detached"
+
+REPORT_INTERVAL_SECONDS = 60
+
+
+class _Lane:
+    """Очередь апдейтов одного чата: depth — ожидающие + выполняющийся (кроме detached)."""
+    __slots__ = ("lock", "depth")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.depth = 0
+
+
+class _Slot:
+    """Место апдейта в очереди чата и общий слот. release() идемпотентен."""
+    __slots__ = ("_executor", "_key", "_lane", "queued", "chat_held", "global_held")
+
+    def __init__(self, executor: ChatOrderMiddleware, key: Optional[int]):
+        self._executor = executor
+        self._key = key
+        self._lane: Optional[_Lane] = None
+        self.queued = False
+        self.chat_held = False
+        self.global_held = False
+        if key is not None:
+            self._lane = executor._enter_lane(key)
+            self.queued = True
+
+    async def acquire(self) -> None:
+        if self._lane is not None:
+            await self._lane.lock.acquire()
+            self.chat_held = True
+        await self._executor._semaphore.acquire()
+        self.global_held = True
+
+    def release(self) -> None:
+        if self.global_held:
+            self.global_held = False
+            self._executor._semaphore.release()
+        if self.chat_held:
+            self.chat_held = False
+            self._lane.lock.release()
+        if self.queued:
+            self.queued = False
+            self._lane.depth -= 1
+            if self._lane.depth == 0:
+                self._executor._lanes.pop(self._key, None)
+
+
+class ChatOrderMiddleware(BaseMiddleware):
+    def __init__(self, *, max_parallel: int, depth_warning: int):
+        super().__init__()
+        self._semaphore = asyncio.Semaphore(max_parallel)
+        self._max_parallel = max_parallel
+        self._depth_warning = depth_warning
+        self._lanes: dict[int, _Lane] = {}
+        self._in_flight = 0
+        self._detached = 0
+        self._processed = 0
+        self._peak_depth = 0
+        self._last_report = time.monotonic()
+
+    def _enter_lane(self, key: int) -> _Lane:
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = _Lane()
+        lane.depth += 1
+        self._peak_depth = max(self._peak_depth, lane.depth)
+        if lane.depth == self._depth_warning:
+            logger.warning("Updates: chat {} has {} updates queued", key, lane.depth)
+        return lane
+
+    def snapshot(self) -> dict[str, Any]:
+        """Метрика очередей: глубина по чатам, ожидающие и выполняющиеся апдейты."""
+        depths = sorted(((lane.depth, chat_id) for chat_id, lane in self._lanes.items()), reverse=True)
+        return {
+            "in_flight": self._in_flight,
+            "detached": self._detached,
+            "chats": len(depths),
+            "waiting": sum(lane.depth - lane.lock.locked() for lane in self._lanes.values()),
+            "max_depth": depths[0][0] if depths else 0,
+            "top": [(chat_id, depth) for depth, chat_id in depths[:5] if depth > 1],
+        }
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        # event_chat/event_from_user кладёт UserContextMiddleware диспетчера — он стоит раньше
+        chat = data.get("event_chat")
+        user = data.get("event_from_user")
+        slot = _Slot(self, chat.id if chat else (user.id if user else None))
+        try:
+            await slot.acquire()
+            self._in_flight += 1
+            data["update_slot"] = slot
+            try:
+                return await handler(event, data)
+            finally:
+                self._in_flight -= 1
+                self._processed += 1
+        finally:
+            slot.release()
+            self._maybe_report()
+
+    def _maybe_report(self) -> None:
+        now = time.monotonic()
+        if now - self._last_report < REPORT_INTERVAL_SECONDS:
+            return
+        self._last_report = now
+        if not self._processed and not self._lanes:
+            return
+        stats = self.snapshot()
+        logger.info("Updates: processed={} in_flight={}/{} detached={} chats={} waiting={} peak_chat_depth={} top={}",
+                    self._processed, stats["in_flight"], self._max_parallel, stats["detached"], stats["chats"],
+                    stats["waiting"], self._peak_depth, stats["top"])
+        self._processed = 0
+        self._peak_depth = stats["max_depth"]
+
+
+class DetachedMiddleware(BaseMiddleware):
+    """Для хендлеров с флагом DETACHED отпускает очередь чата до их запуска."""
+
+    def __init__(self, executor: ChatOrderMiddleware):
+        super().__init__()
+        self._executor = executor
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        slot: Optional[_Slot] = data.get("update_slot")
+        if slot is None or not get_flag(data, DETACHED):
+            return await handler(event, data)
+        slot.release()
+        self._executor._detached += 1
+        try:
+            return await handler(event, data)
+        finally:
+            self._executor._detached -= 1
@@ -0,0 +1,251 @@
+# app/bot/middleware/throttling.py
+"""
+Ограничение частоты действий одного пользователя — бережём бюджет GPT и лимиты
+Telegram от потока нажатий одного человека.
+
+У каждого пользователя своё ведро токенов на каждое действие (THROTTLE_LIMITS:
+действие -> [сколько, за сколько секунд]). Действие хендлера задаётся флагом,
+все сообщения без флага — действие "messages", callback'и без флага не ограничены:
+
+    @router.callback_query(F.data.startswith("post:regen:"), flags={THROTTLE: "regen"})
+
+Отказ сообщается один раз за серию: следующие отказы подряд — молча
+(callback'у всё равно отвечаем, иначе у кнопки крутится часик).
+
+Вёдра лежат там же, где FSM (FSM_STORAGE), — общие для всех реплик бота:
+- memory   — в памяти процесса (одна реплика);
+- postgres — таблица throttle_buckets, пополнение и списание одним UPDATE по часам БД;
+- redis    — hash на ведро, то же самое в Lua-скрипте.
+Недоступное хранилище не блокирует пользователей: действие пропускается.
+Счётчики отказов в snapshot() и логе — по своей реплике.
+"""
+from __future__ import annotations
+
+import time
+from collections import Counter
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Protocol
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from loguru import logger
+
+from app.bot.outbound import TokenBucket
+from app.config import settings
+from app.db.database import async_session_maker
+from app.db.models.outbox import utc_now
+from app.db.models.throttle import ThrottleBucketDAO
+
+THROTTLE = "throttle"
+MESSAGES = "messages"
+
+REPORT_INTERVAL_SECONDS = 60
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class Verdict(NamedTuple):
+    wait: float   # 0 — токен взят, иначе секунд до следующего
+    first: bool   # первый отказ в серии — его сообщаем пользователю
+
+
+class Buckets(Protocol):
+    async def take(self, user_id: int, action: str, *, capacity: int, period: float) -> Verdict: ...
+
+    def size(self) -> Optional[int]: ...
+
+    async def close(self) -> None: ...
+
+
+class MemoryBuckets:
+    """Вёдра в памяти процесса: с несколькими репликами у каждой свой лимит."""
+
+    def __init__(self):
+        self._buckets: dict[tuple[int, str], TokenBucket] = {}
+        self._notified: set[tuple[int, str]] = set()
+        self._last_cleanup = time.monotonic()
+
+    async def take(self, user_id: int, action: str, *, capacity: int, period: float) -> Verdict:
+        key = (user_id, action)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(capacity / period, capacity)
+        wait = bucket.try_acquire()
+        self._maybe_cleanup()
+        if not wait:
+            self._notified.discard(key)
+            return Verdict(0.0, False)
+        first = key not in self._notified
+        self._notified.add(key)
+        return Verdict(wait, first)
+
+    def _maybe_cleanup(self) -> None:
+        if time.monotonic() - self._last_cleanup < REPORT_INTERVAL_SECONDS:
+            return
+        self._last_cleanup = time.monotonic()
+        # полные вёдра ничем не отличаются от новых — не держим их в памяти
+        for key in [key for key, bucket in self._buckets.items() if bucket.full]:
+            del self._buckets[key]
+            self._notified.discard(key)
+
+    def size(self) -> Optional[int]:
+        return len(self._buckets)
+
+    async def close(self) -> None:
+        pass
+
+
+class PostgresBuckets:
+    def __init__(self, *, max_period: float):
+        """max_period — самый длинный период лимитов: вёдра старше него полны и удаляются."""
+        self._max_period = timedelta(seconds=max_period)
+        self._last_purge = 0.0
+
+    async def take(self, user_id: int, action: str, *, capacity: int, period: float) -> Verdict:
+        await self._maybe_purge()
+        async with async_session_maker() as session:
+            taken = await ThrottleBucketDAO.take(session, user_id=user_id, action=action, capacity=capacity,
+                                                 rate=capacity / period)
+        if not taken.rejected:
+            return Verdict(0.0, False)
+        return Verdict((1 - taken.tokens) * period / capacity, taken.rejected == 1)
+
+    async def _maybe_purge(self) -> None:
+        if time.monotonic() - self._last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = time.monotonic()
+        try:
+            async with async_session_maker() as session:
+                purged = await ThrottleBucketDAO.purge_full(session, older_than=utc_now() - self._max_period)
+            if purged:
+                logger.info("Throttling: {} idle buckets purged", purged)
+        except Exception as e:
+            logger.exception("Throttling: purge failed: {}", e)
+
+    def size(self) -> Optional[int]:
+        return None
+
+    async def close(self) -> None:
+        pass
+
+
+# KEYS[1] — hash ведра; ARGV: capacity, rate. Часы — TIME сервера Redis, общие для реплик.
+_TAKE_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'rejected')
+local tokens = tonumber(b[1]) or capacity
+local ts = tonumber(b[2]) or now
+local rejected = tonumber(b[3]) or 0
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+if tokens >= 1 then
+    tokens = tokens - 1
+    rejected = 0
+else
+    rejected = rejected + 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now), 'rejected', rejected)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate))
+return {tostring(tokens), rejected}
+"""
+
+
+class RedisBuckets:
+    """throttle:<user>:<action> — hash {tokens, ts, rejected}, живёт не дольше периода лимита."""
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._take = redis.register_script(_TAKE_LUA)
+
+    @classmethod
+    def from_url(cls, url: str) -> RedisBuckets:
+        from redis.asyncio import Redis
+
+        return cls(Redis.from_url(url))
+
+    async def take(self, user_id: int, action: str, *, capacity: int, period: float) -> Verdict:
+        tokens, rejected = await self._take(keys=[f"throttle:{user_id}:{action}"], args=[capacity, capacity / period])
+        if not int(rejected):
+            return Verdict(0.0, False)
+        return Verdict((1 - float(tokens)) * period / capacity, int(rejected) == 1)
+
+    def size(self) -> Optional[int]:
+        return None
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def build_buckets(limits: dict[str, tuple[int, float]]) -> Buckets:
+    """Хранилище вёдер по FSM_STORAGE — рядом с FSM, общее для реплик."""
+    kind = settings.FSM_STORAGE
+    if kind == "redis":
+        return RedisBuckets.from_url(settings.REDIS_URL)
+    if kind == "postgres":
+        return PostgresBuckets(max_period=max((float(period) for _, period in limits.values()), default=0))
+    return MemoryBuckets()
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    def __init__(self, limits: dict[str, tuple[int, float]], *, buckets: Optional[Buckets] = None):
+        """limits: действие -> (capacity, period): не больше capacity действий за period секунд."""
+        super().__init__()
+        self._limits = {action: (int(capacity), float(period)) for action, (capacity, period) in limits.items()}
+        self.buckets = buckets or MemoryBuckets()
+        self._rejected: Counter[str] = Counter()
+        self._rejected_total: Counter[str] = Counter()
+        self._last_report = time.monotonic()
+
+    def snapshot(self) -> dict[str, Any]:
+        """Метрика: отказы по действиям с запуска (этой реплики) и число вёдер в памяти (memory)."""
+        return {"rejected": dict(self._rejected_total), "buckets": self.buckets.size()}
+
+    def _action(self, event: TelegramObject, data: Dict[str, Any]) -> Optional[str]:
+        action = get_flag(data, THROTTLE)
+        if action is None and isinstance(event, Message):
+            action = MESSAGES
+        return action if action in self._limits else None
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        action = self._action(event, data)
+        if user is None or action is None:
+            return await handler(event, data)
+
+        capacity, period = self._limits[action]
+        try:
+            wait, first = await self.buckets.take(user.id, action, capacity=capacity, period=period)
+        except Exception as e:
+            logger.warning("Throttling store unavailable, {} for user {} allowed: {}", action, user.id, e)
+            return await handler(event, data)
+        self._maybe_report()
+        if not wait:
+            return await handler(event, data)
+
+        self._rejected[action] += 1
+        self._rejected_total[action] += 1
+        if first:
+            logger.warning("Throttled {} for user {}: next in {:.0f}s", action, user.id, wait)
+        text = f"⏳ Слишком часто. Попробуйте через {max(1, round(wait))} с."
+        if isinstance(event, CallbackQuery):
+            await event.answer(text if first else None, show_alert=first)
+        elif isinstance(event, Message) and first:
+            await event.answer(text)
+        return None
+
+    def _maybe_report(self) -> None:
+        now = time.monotonic()
+        if now - self._last_report < REPORT_INTERVAL_SECONDS:
+            return
+        self._last_report = now
+        if self._rejected:
+            logger.info("Throttling: rejected {} in last {}s (total {})", dict(self._rejected),
+                        REPORT_INTERVAL_SECONDS, dict(self._rejected_total))
+            self._rejected.clear()
@@ -0,0 +1,145 @@
+# app/bot/outbound.py
+"""
+Исходящая рассылка с учётом лимитов Telegram.
+
+Каждому чату — своя «полоса» (lane): отправки в один чат идут строго по порядку,
+разные чаты обслуживаются параллельно. Перед каждым запросом берётся токен из
+глобального ведра (~30 msg/s на бота) и из ведра конкретного чата.
+
+    futures = [
+        outbound.submit(chat_id, partial(bot.send_message, chat_id=chat_id, text="..."))
+        for chat_id in recipients
+    ]
+    await asyncio.gather(*futures, return_exceptions=True)
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram.exceptions import TelegramRetryAfter
+from loguru import logger
+
+from app.config import settings
+
+SendFactory = Callable[[], Awaitable[Any]]
+
+
+class TokenBucket:
+    """Классическое ведро токенов: rate токенов в секунду, не больше capacity в запасе."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        if self._updated is not None:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def full(self) -> bool:
+        loop = asyncio.get_running_loop()
+        self._refill(loop.time())
+        return self._tokens >= self.capacity
+
+    def try_acquire(self) -> float:
+        """Без ожидания: 0 — токен взят, иначе сколько секунд до следующего токена."""
+        self._refill(asyncio.get_running_loop().time())
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self) -> None:
+        # под локом — ожидающие обслуживаются в порядке очереди
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                self._refill(loop.time())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class OutboundDispatcher:
+    def __init__(
+        self,
+        *,
+        global_rate: float,
+        chat_rate: float,
+        chat_burst: int,
+        max_retries: int = 3,
+    ):
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._max_retries = max_retries
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        self._lanes: dict[int, asyncio.Queue] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def submit(self, chat_id: int, send: SendFactory) -> asyncio.Future:
+        """
+        Ставит отправку в полосу чата и возвращает future с результатом (или исключением).
+        send — фабрика корутины без аргументов, вызывается ровно в момент отправки.
+        """
+        future = asyncio.get_running_loop().create_future()
+        lane = self._lanes.get(chat_id)
+        if lane is None:
+            lane = self._lanes[chat_id] = asyncio.Queue()
+            task = asyncio.create_task(self._run_lane(chat_id, lane), name=f"outbound:{chat_id}")
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        lane.put_nowait((send, future))
+        return future
+
+    async def _run_lane(self, chat_id: int, lane: asyncio.Queue) -> None:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+        try:
+            while not lane.empty():
+                send, future = lane.get_nowait()
+                if future.cancelled():
+                    continue
+                try:
+                    result = await self._send(chat_id, bucket, send)
+                except Exception as e:
+                    if not future.cancelled():
+                        future.set_exception(e)
+                else:
+                    if not future.cancelled():
+                        future.set_result(result)
+        finally:
+            del self._lanes[chat_id]
+            # полные вёдра ничего не помнят — не копим их для каждого чата
+            if bucket.full:
+                self._chat_buckets.pop(chat_id, None)
+
+    async def _send(self, chat_id: int, bucket: TokenBucket, send: SendFactory) -> Any:
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            await self._global.acquire()
+            try:
+                return await send()
+            except TelegramRetryAfter as e:
+                attempt += 1
+                if attempt > self._max_retries:
+                    raise
+                logger.warning("Outbound: flood control for chat {}, retry in {}s ({}/{})",
+                               chat_id, e.retry_after, attempt, self._max_retries)
+                # полоса чата стоит, остальные чаты продолжают отправку
+                await asyncio.sleep(e.retry_after)
+
+
+outbound = OutboundDispatcher(
+    global_rate=settings.OUTBOUND_GLOBAL_RATE,
+    chat_rate=settings.OUTBOUND_CHAT_RATE,
+    chat_burst=settings.OUTBOUND_CHAT_BURST,
+)
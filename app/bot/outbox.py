@@ -0,0 +1,389 @@
+# app/bot/outbox.py
+"""
+Надёжная очередь исходящих сообщений (таблица outbox).
+
+Хендлеры не шлют сообщения партнёрам напрямую, а кладут их в очередь:
+
+    await outbox.enqueue(
+        outbox.message(chat_id, f"project:{task_id}:notify:{chat_id}", "🆕 Новый проект"),
+        outbox.document(chat_id, f"project:{task_id}:kp:{chat_id}", kp_path, caption="КП"),
+        *outbox.copies(chat_id, f"project:{task_id}:raw:{chat_id}", sources),
+    )
+
+Воркер забирает сообщения из БД и отправляет через outbound (лимиты и порядок
+внутри чата). TelegramRetryAfter — повтор через retry_after, сетевые/серверные
+ошибки — экспоненциальный backoff, постоянные ошибки (бот заблокирован, битый
+запрос) — статус dead без повторов. Повтор ключа идемпотентности игнорируется.
+
+Несколько реплик бота делят одну очередь: сообщение берётся воркером
+(locked_by) на OUTBOX_LEASE_SECONDS, lease продлевается, пока реплика жива.
+При остановке взятое возвращается в очередь, сообщения упавшей реплики —
+по истечении lease.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import timedelta
+from functools import partial
+from typing import Any, Iterable, Iterator, Optional
+from uuid import uuid4
+
+from aiogram import Bot
+from aiogram.enums import ParseMode
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramEntityTooLarge,
+    TelegramForbiddenError,
+    TelegramMigrateToChat,
+    TelegramNotFound,
+    TelegramRetryAfter,
+    TelegramUnauthorizedError,
+)
+from aiogram.types import (
+    BufferedInputFile,
+    InlineKeyboardMarkup,
+    MessageEntity,
+    ReplyKeyboardMarkup,
+    ReplyKeyboardRemove,
+)
+from loguru import logger
+
+from app.bot.outbound import outbound
+from app.config import settings
+from app.db.database import async_session_maker
+from app.db.models.outbox import OutboxDAO, utc_now
+
+# ошибки, которые повтором не лечатся
+PERMANENT_ERRORS = (
+    TelegramBadRequest,
+    TelegramEntityTooLarge,
+    TelegramForbiddenError,
+    TelegramMigrateToChat,
+    TelegramNotFound,
+    TelegramUnauthorizedError,
+)
+
+BACKOFF_BASE_SECONDS = 2
+BACKOFF_MAX_SECONDS = 600
+POLL_INTERVAL_SECONDS = 2
+REPORT_INTERVAL_SECONDS = 60
+SENT_RETENTION = timedelta(days=7)
+STREAM_BATCH = 20  # сообщений на транзакцию в enqueue_stream
+COPY_BATCH = 100  # лимит message_ids в copyMessages
+
+_MARKUP_TYPES = {cls.__name__: cls for cls in (InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove)}
+
+
+@dataclass(slots=True)
+class Outgoing:
+    chat_id: int
+    key: str
+    method: str
+    payload: dict[str, Any] = field(default_factory=dict)
+    document: Optional[bytes] = None
+
+    def as_row(self) -> dict[str, Any]:
+        return {
+            "idempotency_key": self.key,
+            "chat_id": self.chat_id,
+            "method": self.method,
+            "payload": json.dumps(self.payload, ensure_ascii=False),
+            "document": self.document,
+        }
+
+
+def _dump_markup(reply_markup) -> Optional[dict[str, Any]]:
+    if reply_markup is None:
+        return None
+    return {"type": type(reply_markup).__name__, "data": reply_markup.model_dump(mode="json", exclude_none=True)}
+
+
+def _load_markup(raw: Optional[dict[str, Any]]):
+    if not raw:
+        return None
+    return _MARKUP_TYPES[raw["type"]].model_validate(raw["data"])
+
+
+def message(
+    chat_id: int,
+    key: str,
+    text: str,
+    *,
+    entities: Optional[list[MessageEntity]] = None,
+    parse_mode: Optional[str | ParseMode] = None,
+    reply_markup=None,
+) -> Outgoing:
+    """Текст уходит как есть (parse_mode=None явно перекрывает HTML по умолчанию) + entities, см. app.bot.rendering."""
+    # в JSON — значение для Bot API («MarkdownV2»), а не str(ParseMode.MARKDOWN_V2)
+    payload: dict[str, Any] = {"text": text, "parse_mode": ParseMode(parse_mode).value if parse_mode else None}
+    if entities:
+        payload["entities"] = [e.model_dump(mode="json", exclude_none=True) for e in entities]
+    if reply_markup is not None:
+        payload["reply_markup"] = _dump_markup(reply_markup)
+    return Outgoing(chat_id=chat_id, key=key, method="message", payload=payload)
+
+
+def document(
+    chat_id: int,
+    key: str,
+    path: str,
+    *,
+    caption: Optional[str] = None,
+    filename: Optional[str] = None,
+    content: Optional[bytes] = None,
+) -> Outgoing:
+    """Файл читается сразу и хранится в очереди — временный файл можно удалять после enqueue."""
+    if content is None:
+        with open(path, "rb") as f:
+            content = f.read()
+    payload: dict[str, Any] = {"filename": filename or os.path.basename(path)}
+    if caption is not None:
+        payload["caption"] = caption
+    return Outgoing(chat_id=chat_id, key=key, method="document", payload=payload, document=content)
+
+
+def copies(chat_id: int, key: str, sources: Iterable[tuple[int, int]]) -> Iterator[Outgoing]:
+    """
+    Копии исходных сообщений (from_chat_id, message_id) без перезагрузки файлов —
+    один copyMessages на каждые COPY_BATCH сообщений подряд из одного чата.
+    Альбомы сохраняются, порядок — как в sources. Ключи: {key}:{i}.
+    """
+    run_chat: Optional[int] = None
+    run: list[int] = []
+    batches: list[tuple[int, list[int]]] = []
+    for from_chat_id, message_id in sources:
+        if from_chat_id != run_chat and run:
+            batches.append((run_chat, run))
+            run = []
+        run_chat = from_chat_id
+        run.append(int(message_id))
+    if run:
+        batches.append((run_chat, run))
+
+    i = 0
+    for from_chat_id, message_ids in batches:
+        # copyMessages требует возрастающих id
+        message_ids = sorted(set(message_ids))
+        for start in range(0, len(message_ids), COPY_BATCH):
+            payload = {"from_chat_id": from_chat_id, "message_ids": message_ids[start:start + COPY_BATCH]}
+            yield Outgoing(chat_id=chat_id, key=f"{key}:{i}", method="copy", payload=payload)
+            i += 1
+
+
+async def enqueue(*items: Outgoing) -> int:
+    """Кладёт сообщения в очередь (одна транзакция) и будит воркер. Возвращает число новых."""
+    if not items:
+        return 0
+    async with async_session_maker() as session:
+        added = await OutboxDAO.enqueue_many(session, [item.as_row() for item in items])
+    if added < len(items):
+        logger.info("Outbox: {} of {} messages already queued (duplicate keys)", len(items) - added, len(items))
+    outbox_worker.wake()
+    return added
+
+
+async def enqueue_stream(items: Iterable[Outgoing], *, batch: int = STREAM_BATCH) -> int:
+    """
+    Как enqueue, но для ленивого потока сообщений (длинные брифы): пишет пачками по batch
+    и будит воркер после каждой, так что первые части уходят, пока остальные ещё готовятся.
+    Порядок внутри чата сохраняется — id в таблице растут в порядке записи.
+    """
+    added = 0
+    buffer: list[Outgoing] = []
+    for item in items:
+        buffer.append(item)
+        if len(buffer) >= batch:
+            added += await enqueue(*buffer)
+            buffer.clear()
+    added += await enqueue(*buffer)
+    return added
+
+
+class OutboxWorker:
+    def __init__(self, *, workers: int, max_attempts: int, lease_seconds: int):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+        self._workers = asyncio.Semaphore(workers)
+        self._batch = workers * 8
+        self._max_attempts = max_attempts
+        self._lease = timedelta(seconds=lease_seconds)
+        self._bot: Optional[Bot] = None
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._chats: set[asyncio.Task] = set()
+        self._latencies: deque[float] = deque(maxlen=1000)
+        self._sent = self._failed = 0
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def start(self, bot: Bot) -> None:
+        if self._runner is not None:
+            return
+        self._bot = bot
+        self._runner = asyncio.create_task(self._run(), name="outbox")
+        logger.info("Outbox worker {} started", self.worker_id)
+
+    async def stop(self) -> None:
+        if self._runner is None:
+            return
+        self._runner.cancel()
+        try:
+            await self._runner
+        except asyncio.CancelledError:
+            pass
+        self._runner = None
+        for task in list(self._chats):
+            task.cancel()
+        await asyncio.gather(*self._chats, return_exceptions=True)
+        # взятое, но не отправленное — другим репликам (или этой после рестарта), не ждём lease
+        try:
+            async with async_session_maker() as session:
+                released = await OutboxDAO.release_worker(session, worker_id=self.worker_id)
+            if released:
+                logger.info("Outbox: {} in-flight messages returned to queue", released)
+        except Exception as e:
+            logger.exception("Outbox: release on stop failed, messages return after lease expiry: {}", e)
+        logger.info("Outbox worker stopped")
+
+    async def _run(self) -> None:
+        last_report = time.monotonic()
+        last_lease = 0.0
+        while True:
+            self._wakeup.clear()
+            if time.monotonic() - last_lease >= self._lease.total_seconds() / 3:
+                last_lease = time.monotonic()
+                await self._keep_leases()
+            try:
+                async with async_session_maker() as session:
+                    rows = await OutboxDAO.claim_due(session, worker_id=self.worker_id, limit=self._batch,
+                                                     lease_until=utc_now() + self._lease)
+            except Exception as e:
+                logger.exception("Outbox: claim failed: {}", e)
+                rows = []
+
+            by_chat: dict[int, list] = {}
+            for row in rows:
+                by_chat.setdefault(row.chat_id, []).append(row)
+            for chat_id, chat_rows in by_chat.items():
+                task = asyncio.create_task(self._deliver_chat(chat_rows), name=f"outbox:{chat_id}")
+                self._chats.add(task)
+                task.add_done_callback(self._chats.discard)
+
+            if time.monotonic() - last_report >= REPORT_INTERVAL_SECONDS:
+                last_report = time.monotonic()
+                await self._report()
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _keep_leases(self) -> None:
+        """Продлевает lease своих сообщений и возвращает в очередь сообщения упавших реплик."""
+        try:
+            async with async_session_maker() as session:
+                await OutboxDAO.heartbeat(session, worker_id=self.worker_id, lease_until=utc_now() + self._lease)
+                requeued = await OutboxDAO.requeue_expired(session)
+            if requeued:
+                logger.warning("Outbox: {} messages of a stopped worker requeued (lease expired)", requeued)
+        except Exception as e:
+            logger.exception("Outbox: lease maintenance failed: {}", e)
+
+    async def _deliver_chat(self, rows: list) -> None:
+        """Сообщения одного чата — строго по порядку; на первой ошибке остальные возвращаются в очередь."""
+        async with self._workers:
+            for i, row in enumerate(rows):
+                try:
+                    delivered = await self._deliver(row)
+                except Exception as e:
+                    # сбой БД и т.п.: текущее сообщение тоже вернём — лучше дубль, чем потеря
+                    logger.exception("Outbox: delivery of {} crashed: {}", row.id, e)
+                    i, delivered = i - 1, False
+                if not delivered:
+                    try:
+                        async with async_session_maker() as session:
+                            await OutboxDAO.release(session, [r.id for r in rows[i + 1:]], worker_id=self.worker_id)
+                    except Exception as e:
+                        logger.exception("Outbox: release failed, rows return after lease expiry: {}", e)
+                    break
+        self.wake()
+
+    async def _deliver(self, row) -> bool:
+        payload = json.loads(row.payload)
+        if "reply_markup" in payload:
+            payload["reply_markup"] = _load_markup(payload["reply_markup"])
+        if "entities" in payload:
+            payload["entities"] = [MessageEntity.model_validate(e) for e in payload["entities"]]
+        if row.method == "document":
+            file = BufferedInputFile(row.document, filename=payload.pop("filename"))
+            send = partial(self._bot.send_document, chat_id=row.chat_id, document=file, **payload)
+        elif row.method == "copy":
+            send = partial(self._bot.copy_messages, chat_id=row.chat_id, **payload)
+        else:
+            send = partial(self._bot.send_message, chat_id=row.chat_id, **payload)
+
+        try:
+            await outbound.submit(row.chat_id, send)
+        except PERMANENT_ERRORS as e:
+            self._failed += 1
+            logger.error("Outbox: message {} to {} dropped: {}", row.id, row.chat_id, e)
+            async with async_session_maker() as session:
+                await OutboxDAO.mark_dead(session, row.id, worker_id=self.worker_id, error=repr(e))
+            # следующие сообщения чата от этой ошибки не зависят
+            return True
+        except Exception as e:
+            attempts = row.attempts + 1
+            async with async_session_maker() as session:
+                if attempts >= self._max_attempts:
+                    self._failed += 1
+                    logger.error("Outbox: message {} to {} dead after {} attempts: {}", row.id, row.chat_id, attempts, e)
+                    await OutboxDAO.mark_dead(session, row.id, worker_id=self.worker_id, error=repr(e))
+                    return True
+                if isinstance(e, TelegramRetryAfter):
+                    delay = float(e.retry_after)
+                else:
+                    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+                    delay *= 1 + random.random() * 0.2
+                logger.warning("Outbox: message {} to {} failed (attempt {}), retry in {:.0f}s: {}",
+                               row.id, row.chat_id, attempts, delay, e)
+                await OutboxDAO.reschedule(session, row.id, worker_id=self.worker_id,
+                                           next_attempt_at=utc_now() + timedelta(seconds=delay), error=repr(e))
+            return False
+
+        async with async_session_maker() as session:
+            await OutboxDAO.mark_sent(session, row.id, worker_id=self.worker_id)
+        self._sent += 1
+        self._latencies.append((utc_now() - row.created_at).total_seconds())
+        return True
+
+    async def _report(self) -> None:
+        try:
+            async with async_session_maker() as session:
+                stats = await OutboxDAO.stats(session)
+                await OutboxDAO.purge_sent(session, older_than=utc_now() - SENT_RETENTION)
+        except Exception as e:
+            logger.exception("Outbox: stats failed: {}", e)
+            return
+        latency = "n/a"
+        if self._latencies:
+            ordered = sorted(self._latencies)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            latency = f"p50={statistics.median(ordered):.2f}s p95={p95:.2f}s max={ordered[-1]:.2f}s"
+        oldest = stats["oldest"]
+        age = f"{(utc_now() - oldest).total_seconds():.0f}s" if oldest else "-"
+        logger.info("Outbox: pending={} sending={} dead={} oldest={} | sent={} failed={} | latency {}",
+                    stats["pending"], stats["sending"], stats["dead"], age, self._sent, self._failed, latency)
+        self._latencies.clear()
+        self._sent = self._failed = 0
+
+
+outbox_worker = OutboxWorker(workers=settings.OUTBOX_WORKERS, max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+                             lease_seconds=settings.OUTBOX_LEASE_SECONDS)
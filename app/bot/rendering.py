@@ -0,0 +1,176 @@
+# app/bot/rendering.py
+"""
+Тексты сообщений без MarkdownV2: обычная строка + список MessageEntity.
+
+Экранировать ничего не нужно — пользовательский текст уходит как есть, а
+форматирование задаётся сущностями с offset/length в UTF-16 code units
+(так считает Telegram). Отправлять с parse_mode=None, см. Rendered.as_kwargs().
+
+    card = (
+        TextBuilder()
+        .text("📁 Проект\\n\\n").bold(title)
+        .text(f"\\nСтатус: {status}")
+        .build()
+    )
+    await message.answer(**card.as_kwargs())
+
+Длинные тексты режутся iter_chunks (лениво) / split_rendered на куски до 4096
+UTF-16 единиц — по абзацам, затем строкам, предложениям, словам; сущности на
+границе куска обрезаются и переносятся в следующий кусок.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+from aiogram.enums import MessageEntityType
+from aiogram.types import MessageEntity
+
+TELEGRAM_MAX_UTF16 = 4096  # лимит длины текста сообщения, в UTF-16 code units
+
+
+def utf16_len(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+@dataclass(slots=True)
+class Rendered:
+    text: str
+    entities: list[MessageEntity] = field(default_factory=list)
+
+    def as_kwargs(self) -> dict[str, Any]:
+        """Аргументы для send_message / answer / edit_text."""
+        return {"text": self.text, "entities": self.entities or None, "parse_mode": None}
+
+
+class TextBuilder:
+    """Собирает текст кусками, параллельно считая UTF-16 смещения сущностей."""
+
+    def __init__(self) -> None:
+        self._parts: list[str] = []
+        self._entities: list[MessageEntity] = []
+        self._offset = 0
+
+    def text(self, value: str) -> TextBuilder:
+        return self._add(value, None)
+
+    def bold(self, value: str) -> TextBuilder:
+        return self._add(value, MessageEntityType.BOLD)
+
+    def italic(self, value: str) -> TextBuilder:
+        return self._add(value, MessageEntityType.ITALIC)
+
+    def code(self, value: str) -> TextBuilder:
+        return self._add(value, MessageEntityType.CODE)
+
+    def _add(self, value: Optional[str], entity_type: Optional[MessageEntityType]) -> TextBuilder:
+        if not value:
+            return self
+        length = utf16_len(value)
+        if entity_type is not None:
+            self._entities.append(MessageEntity(type=entity_type, offset=self._offset, length=length))
+        self._parts.append(value)
+        self._offset += length
+        return self
+
+    def build(self) -> Rendered:
+        return Rendered("".join(self._parts), list(self._entities))
+
+
+def plain(text: str) -> Rendered:
+    return Rendered(text or "")
+
+
+def _fit(text: str, start: int, limit: int) -> tuple[int, int]:
+    """
+    Самый длинный срез text[start:end], который укладывается в limit UTF-16 единиц.
+    Возвращает (end, его длину в UTF-16). Стоимость — O(limit) на кусок.
+    """
+    end = min(len(text), start + limit)
+    units = utf16_len(text[start:end])
+    # символы вне BMP занимают две единицы — отрезаем хвост, пока не влезет
+    while units > limit:
+        end -= (units - limit + 1) // 2
+        units = utf16_len(text[start:end])
+    return end, units
+
+
+# Где резать, в порядке предпочтения: абзац, строка, конец предложения, пробел.
+# (разделитель, сколько его символов оставить в конце куска)
+_BOUNDARIES: tuple[tuple[tuple[str, int], ...], ...] = (
+    (("\n\n", 0),),
+    (("\n", 0),),
+    ((". ", 1), ("! ", 1), ("? ", 1), ("… ", 1)),
+    ((" ", 0),),
+)
+
+
+def _cut_point(text: str, start: int, end: int) -> tuple[int, int]:
+    """
+    Где резать окно text[start:end]: по самой предпочтительной границе из _BOUNDARIES,
+    иначе жёстко по end. Возвращает (конец куска, начало следующего) — пробельный
+    разделитель не попадает ни в один кусок.
+    """
+    if end >= len(text):
+        return end, end
+    min_cut = start + (end - start) // 2  # не делаем кусков короче половины лимита
+    for group in _BOUNDARIES:
+        best = None
+        for sep, keep in group:
+            # разделитель может начинаться в окне и заканчиваться сразу за ним
+            pos = text.rfind(sep, min_cut, end + len(sep) - keep)
+            if pos > start and (best is None or pos > best[0]):
+                best = (pos, pos + keep, pos + len(sep))
+        if best is not None:
+            return best[1], best[2]
+    return end, end
+
+
+def _clip_entities(entities: list[MessageEntity], first: int, lo: int, hi: int) -> tuple[list[MessageEntity], int]:
+    """
+    Сущности, пересекающие [lo, hi) (в UTF-16), со смещением относительно lo.
+    entities отсортированы по offset; first — индекс, с которого имеет смысл искать.
+    Возвращает (сущности куска, новый first).
+    """
+    clipped = []
+    while first < len(entities) and entities[first].offset + entities[first].length <= lo:
+        first += 1
+    i = first
+    while i < len(entities) and entities[i].offset < hi:
+        entity = entities[i]
+        begin = max(entity.offset, lo)
+        finish = min(entity.offset + entity.length, hi)
+        if finish > begin:
+            clipped.append(entity.model_copy(update={"offset": begin - lo, "length": finish - begin}))
+        i += 1
+    return clipped, first
+
+
+def iter_chunks(rendered: Rendered, limit: int = TELEGRAM_MAX_UTF16) -> Iterator[Rendered]:
+    """
+    Лениво режет текст на сообщения не длиннее limit UTF-16 единиц.
+    Каждый кусок стоит O(limit), весь текст — O(n); первый кусок готов сразу,
+    не дожидаясь разбора остального текста.
+    """
+    text = rendered.text
+    if not text:
+        return
+    entities = sorted(rendered.entities, key=lambda e: e.offset)
+
+    start = 0
+    start_units = 0  # UTF-16 смещение start от начала текста
+    first_entity = 0
+    while start < len(text):
+        end, _ = _fit(text, start, limit)
+        cut, next_start = _cut_point(text, start, end)
+        piece = text[start:cut]
+        piece_units = utf16_len(piece)
+        piece_entities, first_entity = _clip_entities(entities, first_entity, start_units, start_units + piece_units)
+        if piece.strip():
+            yield Rendered(piece, piece_entities)
+        start_units += piece_units + (next_start - cut)  # разделители — символы BMP, по 1 единице
+        start = next_start
+
+
+def split_rendered(rendered: Rendered, limit: int = TELEGRAM_MAX_UTF16) -> list[Rendered]:
+    return list(iter_chunks(rendered, limit))
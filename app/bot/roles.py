@@ -0,0 +1,126 @@
+# app/bot/roles.py
+"""
+Роли пользователей (таблица user_roles) в памяти процесса.
+
+Проверка прав на каждом апдейте — поиск в frozenset, без запроса к БД:
+
+    if not roles.has(user_id, Role.admin): ...
+
+Кэш перечитывается целиком:
+- сразу после /role add|del в этом процессе;
+- по Postgres NOTIFY (RoleDAO пишет в канал при изменении) — в остальных репликах;
+- раз в ROLES_RELOAD_SECONDS — на случай потерянного соединения-подписчика.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.db.database import async_session_maker, engine
+from app.db.models.roles import ROLES_CHANNEL, Role, RoleDAO
+
+LISTEN_RETRY_SECONDS = 10
+
+
+def _bootstrap_pairs() -> list[tuple[int, Role]]:
+    pairs = [(user_id, Role.admin) for user_id in settings.ADMIN_IDS or []]
+    pairs.append((settings.BUSINESS_PARTNER_ID, Role.business_partner))
+    pairs.append((settings.TEAM_PARTNER_ID, Role.team_partner))
+    return pairs
+
+
+class RoleRegistry:
+    def __init__(self, *, reload_seconds: float):
+        self._reload_seconds = reload_seconds
+        self._members: dict[Role, frozenset[int]] = {role: frozenset() for role in Role}
+        self._tasks: list[asyncio.Task] = []
+
+    def has(self, user_id: int, role: Role) -> bool:
+        return user_id in self._members[role]
+
+    def members(self, role: Role) -> frozenset[int]:
+        return self._members[role]
+
+    def _replace(self, pairs) -> None:
+        members: dict[Role, set[int]] = {role: set() for role in Role}
+        for user_id, role in pairs:
+            try:
+                members[Role(role)].add(int(user_id))
+            except ValueError:
+                logger.warning("Roles: unknown role '{}' for user {}", role, user_id)
+        # одно присваивание — читатели видят либо старый, либо новый набор целиком
+        self._members = {role: frozenset(ids) for role, ids in members.items()}
+
+    async def load(self) -> None:
+        async with async_session_maker() as session:
+            rows = await RoleDAO.all(session)
+        self._replace((row.user_id, row.role) for row in rows)
+        logger.info("Roles loaded: {}", {role.value: len(ids) for role, ids in self._members.items()})
+
+    async def start(self) -> None:
+        try:
+            async with async_session_maker() as session:
+                seeded = await RoleDAO.seed_if_empty(session, _bootstrap_pairs())
+            if seeded:
+                logger.info("Roles: user_roles seeded from settings ({} entries)", seeded)
+            await self.load()
+        except Exception as e:
+            # без БД бот всё равно должен пускать тех, кто указан в настройках
+            logger.exception("Roles: load failed, using settings: {}", e)
+            self._replace((user_id, role.value) for user_id, role in _bootstrap_pairs())
+        self._tasks.append(asyncio.create_task(self._reload_periodically(), name="roles:reload"))
+        if engine.dialect.name == "postgresql":
+            self._tasks.append(asyncio.create_task(self._listen(), name="roles:listen"))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _reload_quietly(self) -> None:
+        try:
+            await self.load()
+        except Exception as e:
+            logger.exception("Roles: reload failed, keeping cached roles: {}", e)
+
+    async def _reload_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._reload_seconds)
+            await self._reload_quietly()
+
+    async def _listen(self) -> None:
+        """LISTEN на отдельном соединении; при обрыве — переподключение и полная перезагрузка."""
+        pending: Optional[asyncio.Task] = None
+
+        def on_notify(*_args) -> None:
+            nonlocal pending
+            if pending is None or pending.done():
+                pending = asyncio.create_task(self._reload_quietly())
+
+        while True:
+            try:
+                async with engine.connect() as conn:
+                    raw = (await conn.get_raw_connection()).driver_connection
+                    await raw.add_listener(ROLES_CHANNEL, on_notify)
+                    logger.info("Roles: listening for '{}' notifications", ROLES_CHANNEL)
+                    # изменения, пропущенные пока подписки не было
+                    await self._reload_quietly()
+                    try:
+                        while not raw.is_closed():
+                            await asyncio.sleep(LISTEN_RETRY_SECONDS)
+                    finally:
+                        if not raw.is_closed():
+                            await raw.remove_listener(ROLES_CHANNEL, on_notify)
+                logger.warning("Roles: listener connection closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Roles: listener failed: {}", e)
+            await asyncio.sleep(LISTEN_RETRY_SECONDS)
+
+
+roles = RoleRegistry(reload_seconds=settings.ROLES_RELOAD_SECONDS)
@@ -0,0 +1,108 @@
+# app/bot/telegram_api.py
+"""
+Свой сервер Bot API (telegram-bot-api --local) вместо api.telegram.org.
+
+В local-режиме сервер и бот делят каталог с файлами (docker volume):
+- загрузка: файл кладётся в общий каталог и передаётся серверу как file://путь —
+  без multipart-пересылки содержимого, лимит 2000 МБ вместо 50 МБ;
+- скачивание: getFile отдаёт абсолютный путь на сервере, файл читается прямо
+  с тома (Bot.download / local_file_path), лимит 20 МБ снимается.
+
+Один и тот же том может быть смонтирован в контейнерах по разным путям:
+TELEGRAM_API_FILES_DIR — путь на сервере, TELEGRAM_API_FILES_LOCAL_DIR — у бота.
+"""
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+from typing import Optional, Union
+
+from aiogram.client.telegram import PRODUCTION, SimpleFilesPathWrapper, TelegramAPIServer
+from aiogram.types import FSInputFile
+from loguru import logger
+
+from app.bot.http_session import TunedAiohttpSession
+from app.config import settings
+
+CLOUD_DOCUMENT_LIMIT = 50 * 1024 * 1024     # отправка файла через api.telegram.org
+LOCAL_DOCUMENT_LIMIT = 2000 * 1024 * 1024   # telegram-bot-api --local
+
+UPLOADS_SUBDIR = "uploads"
+
+
+def is_local() -> bool:
+    return bool(settings.TELEGRAM_API_URL and settings.TELEGRAM_API_LOCAL)
+
+
+def _server_dir() -> Path:
+    return Path(settings.TELEGRAM_API_FILES_DIR)
+
+
+def _local_dir() -> Path:
+    return Path(settings.TELEGRAM_API_FILES_LOCAL_DIR or settings.TELEGRAM_API_FILES_DIR)
+
+
+def _api_server() -> TelegramAPIServer:
+    if not settings.TELEGRAM_API_URL:
+        return PRODUCTION
+    api = TelegramAPIServer.from_base(settings.TELEGRAM_API_URL, is_local=settings.TELEGRAM_API_LOCAL)
+    if settings.TELEGRAM_API_LOCAL and _server_dir() != _local_dir():
+        api = TelegramAPIServer(
+            base=api.base, file=api.file, is_local=True,
+            wrap_local_file=SimpleFilesPathWrapper(_server_dir(), _local_dir()),
+        )
+    logger.info("Bot API server: {} (local={})", settings.TELEGRAM_API_URL, settings.TELEGRAM_API_LOCAL)
+    return api
+
+
+def build_session() -> TunedAiohttpSession:
+    """Сессия для Bot(session=...): сервер Bot API (TELEGRAM_API_URL) и пул соединений (TELEGRAM_HTTP_*)."""
+    return TunedAiohttpSession(
+        api=_api_server(),
+        limit=settings.TELEGRAM_HTTP_LIMIT,
+        limit_per_host=settings.TELEGRAM_HTTP_LIMIT_PER_HOST,
+        dns_ttl=settings.TELEGRAM_HTTP_DNS_TTL,
+        keepalive_seconds=settings.TELEGRAM_HTTP_KEEPALIVE_SECONDS,
+        connect_timeout=settings.TELEGRAM_HTTP_CONNECT_TIMEOUT,
+        timeout=settings.TELEGRAM_HTTP_TIMEOUT,
+        proxy=settings.TELEGRAM_PROXY,
+    )
+
+
+def document_limit() -> int:
+    return LOCAL_DOCUMENT_LIMIT if is_local() else CLOUD_DOCUMENT_LIMIT
+
+
+def local_file_path(file_path: str) -> Optional[Path]:
+    """Путь к скачанному файлу (File.file_path) на общем томе — читать без копирования. None — не local."""
+    if not is_local():
+        return None
+    path = Path(file_path)
+    try:
+        return _local_dir() / path.relative_to(_server_dir())
+    except ValueError:
+        return path
+
+
+def upload_tmp_dir() -> str:
+    """Каталог для временных файлов на отправку: в local-режиме — на общем томе."""
+    if not is_local():
+        return tempfile.gettempdir()
+    path = _local_dir() / UPLOADS_SUBDIR
+    path.mkdir(parents=True, exist_ok=True)
+    return str(path)
+
+
+def input_file(path: str, filename: Optional[str] = None) -> Union[FSInputFile, str]:
+    """
+    Файл для send_document и т.п. В local-режиме файл с общего тома передаётся как
+    file:// путь на сервере — сервер читает его сам (имя в Telegram — имя файла на диске,
+    поэтому такие файлы сразу создаются с нужным именем в upload_tmp_dir()).
+    Остальное — обычная загрузка.
+    """
+    if is_local():
+        local = Path(path).resolve()
+        root = _local_dir().resolve()
+        if root in local.parents:
+            return f"file://{_server_dir() / local.relative_to(root)}"
+    return FSInputFile(path, filename=filename)
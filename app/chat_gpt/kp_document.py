@@ -0,0 +1,332 @@
+# app/chat_gpt/kp_document.py
+"""
+Промежуточная модель КП.
+
+Ответ модели (Markdown) парсится ОДИН раз в KPDocument, документ хранится у задачи
+в компактном виде (dumps/loads), а дальше рендерится любым бэкендом из app.chat_gpt.kp_render
+без повторного запроса к GPT и без повторного разбора Markdown.
+"""
+from __future__ import annotations
+
+import json
+import re
+import zlib
+from dataclasses import dataclass, field
+from typing import NamedTuple, Optional, Union
+
+FORMAT_VERSION = 1
+
+DEFAULT_TITLE = "Коммерческое предложение"
+
+_INLINE_RE = re.compile(r'(\*\*\*.*?\*\*\*|\*\*.*?\*\*|\*.*?\*|___.*?___|__.*?__|_.*?_)')
+_TABLE_SEPARATOR_RE = re.compile(r'^\|[\s\-:|]+\|$')
+_BOLD_WRAP_RE = re.compile(r'^\*\*(.*?)\*\*$')
+# число с разделителями разрядов (пробелы, точки, запятые) и, возможно, дробной частью
+_NUMBER_RE = re.compile(r'\d(?:[\d \u00a0\u202f]|[.,](?=\d))*')
+# «тыс/млн/млрд» сразу после числа или после диапазона («1,5–2 млн»)
+_MAGNITUDE_RE = re.compile(r'\s*(?:(?:[-–—]|до)\s*\d[\d \u00a0\u202f.,]*)?(тыс|млн|млрд)', re.IGNORECASE)
+_MAGNITUDES = {"тыс": 1_000, "млн": 1_000_000, "млрд": 1_000_000_000}
+
+_BOLD = 1
+_ITALIC = 2
+
+
+class Run(NamedTuple):
+    """Кусок текста с одинаковым начертанием."""
+    text: str
+    bold: bool = False
+    italic: bool = False
+
+
+Inline = list[Run]
+
+
+@dataclass(slots=True)
+class Paragraph:
+    runs: Inline
+
+
+@dataclass(slots=True)
+class Rule:
+    """Горизонтальная линия (--- / *** / ___) — в документе это пустой абзац."""
+
+
+@dataclass(slots=True)
+class Table:
+    """Таблица этапа: первая строка — заголовок."""
+    header: list[Inline]
+    rows: list[list[Inline]] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class PriceTable(Table):
+    """Таблица «Цена/Сроки/Этапы» с распознанными суммами (в рублях)."""
+    prices: list[Optional[int]] = field(default_factory=list)
+    total_row: Optional[int] = None  # индекс строки «Итог», если есть
+
+    @property
+    def total(self) -> Optional[int]:
+        """Итог из строки «Итог», иначе сумма по этапам."""
+        if self.total_row is not None and self.prices[self.total_row] is not None:
+            return self.prices[self.total_row]
+        values = [p for i, p in enumerate(self.prices) if i != self.total_row and p is not None]
+        return sum(values) if values else None
+
+
+Block = Union[Paragraph, Rule, Table, PriceTable]
+
+
+@dataclass(slots=True)
+class Section:
+    """Раздел КП. level=1 для «##», level=2 для «###», level=0 — текст до первого заголовка."""
+    title: str
+    level: int
+    blocks: list[Block] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class KPDocument:
+    title: str
+    sections: list[Section] = field(default_factory=list)
+
+    @property
+    def price_table(self) -> Optional[PriceTable]:
+        for section in self.sections:
+            for block in section.blocks:
+                if isinstance(block, PriceTable):
+                    return block
+        return None
+
+    @property
+    def total_price(self) -> Optional[int]:
+        table = self.price_table
+        return table.total if table else None
+
+
+# ---------- Парсинг Markdown ----------
+def plain_text(runs: Inline) -> str:
+    return "".join(r.text for r in runs)
+
+
+def parse_inline(text: str) -> Inline:
+    """Разбирает встроенное форматирование (жирный, курсив) — те же правила, что были в конвертере."""
+    runs: Inline = []
+    last_end = 0
+    for match in _INLINE_RE.finditer(text):
+        if match.start() > last_end:
+            runs.append(Run(text[last_end:match.start()]))
+
+        token = match.group()
+        if token.startswith('***') or token.startswith('___'):
+            runs.append(Run(token[3:-3], True, True))
+        elif token.startswith('**') or token.startswith('__'):
+            runs.append(Run(token[2:-2], True, False))
+        else:
+            runs.append(Run(token[1:-1], False, True))
+        last_end = match.end()
+
+    if last_end < len(text):
+        runs.append(Run(text[last_end:]))
+    return runs or [Run(text)]
+
+
+def _parse_number(raw: str, *, scaled: bool) -> Optional[float]:
+    """
+    '1 800 000' -> 1800000, '1,5' -> 1.5, '1.800.000' -> 1800000, '1,800,000.50' -> 1800000.5.
+    Одиночный разделитель перед тремя цифрами — разряды ('1,500'), если за числом
+    нет «тыс/млн» (scaled): '1,500 млн' — полтора миллиона.
+    """
+    raw = re.sub(r'[ \u00a0\u202f]', '', raw)
+    separators = [c for c in raw if c in ".,"]
+    if not separators:
+        return float(raw)
+    decimal = None
+    if len(set(separators)) == 2:
+        decimal = separators[-1]
+    elif len(separators) == 1 and (scaled or len(raw) - raw.index(separators[0]) - 1 != 3):
+        decimal = separators[0]
+    if decimal is None:
+        return float(re.sub(r'[.,]', '', raw))
+    whole, _, fraction = raw.rpartition(decimal)
+    whole = re.sub(r'[.,]', '', whole)
+    return float(f"{whole}.{fraction}") if whole else None
+
+
+def parse_price(text: str) -> Optional[int]:
+    """
+    '1 800 000 ₽' -> 1800000, '1,5 млн' -> 1500000, '300 тыс.' -> 300000;
+    для диапазонов берётся нижняя граница ('1,5–2 млн ₽' -> 1500000).
+    """
+    text = text or ""
+    m = _NUMBER_RE.search(text)
+    if not m:
+        return None
+    magnitude = _MAGNITUDE_RE.match(text, m.end())
+    value = _parse_number(m.group(), scaled=magnitude is not None)
+    if value is None:
+        return None
+    if magnitude:
+        value *= _MAGNITUDES[magnitude.group(1).lower()]
+    return round(value)
+
+
+def _is_price_header(header: list[Inline]) -> bool:
+    return any("цена" in plain_text(cell).lower() for cell in header)
+
+
+def _parse_table(lines: list[str], start_idx: int) -> tuple[Optional[Table], int]:
+    idx = start_idx
+    table_lines = []
+    while idx < len(lines) and '|' in lines[idx]:
+        table_lines.append(lines[idx])
+        idx += 1
+
+    if len(table_lines) < 2:
+        return None, idx
+
+    rows: list[list[Inline]] = []
+    for line in table_lines:
+        if _TABLE_SEPARATOR_RE.match(line.strip()):
+            continue
+        cells = [c.strip() for c in line.split('|')[1:-1] if c.strip()]
+        if cells:
+            rows.append([parse_inline(c) for c in cells])
+
+    if not rows:
+        return None, idx
+
+    header, body = rows[0], rows[1:]
+    if not _is_price_header(header):
+        return Table(header=header, rows=body), idx
+
+    price_col = next(i for i, cell in enumerate(header) if "цена" in plain_text(cell).lower())
+    prices: list[Optional[int]] = []
+    total_row = None
+    for i, row in enumerate(body):
+        prices.append(parse_price(plain_text(row[price_col])) if price_col < len(row) else None)
+        if row and plain_text(row[0]).strip().lower().startswith("итог"):
+            total_row = i
+    return PriceTable(header=header, rows=body, prices=prices, total_row=total_row), idx
+
+
+def _extract_title(content: str) -> Optional[str]:
+    for line in content.split('\n'):
+        stripped = line.strip()
+        if stripped.startswith('# **Проект:'):
+            title = stripped.replace('# ', '').replace('**', '').replace('Проект:', '').strip()
+            if title:
+                return title
+    return None
+
+
+def parse_kp_markdown(content: str, project_name: Optional[str] = None) -> KPDocument:
+    """Разбирает Markdown КП (ответ GPT) в KPDocument."""
+    doc = KPDocument(title=project_name or _extract_title(content) or DEFAULT_TITLE)
+    section = Section(title="", level=0)
+    doc.sections.append(section)
+
+    lines = content.split('\n')
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        if not stripped:
+            i += 1
+            continue
+
+        # Основной заголовок с названием проекта уже в doc.title
+        if stripped.startswith('# ') and 'Проект:' in stripped:
+            i += 1
+            continue
+
+        if stripped.startswith('## ') or stripped.startswith('### '):
+            level = 1 if stripped.startswith('## ') else 2
+            title = _BOLD_WRAP_RE.sub(r'\1', stripped[level + 2:].strip())
+            section = Section(title=title, level=level)
+            doc.sections.append(section)
+            i += 1
+            continue
+
+        if stripped in ('---', '***', '___'):
+            section.blocks.append(Rule())
+            i += 1
+            continue
+
+        if '|' in line:
+            table, i = _parse_table(lines, i)
+            if table is not None:
+                section.blocks.append(table)
+            continue
+
+        section.blocks.append(Paragraph(parse_inline(stripped)))
+        i += 1
+
+    if not doc.sections[0].blocks:
+        doc.sections.pop(0)
+    return doc
+
+
+# ---------- Компактная сериализация ----------
+def _pack_runs(runs: Inline) -> list:
+    return [r.text if not (r.bold or r.italic) else [r.text, (_BOLD if r.bold else 0) | (_ITALIC if r.italic else 0)]
+            for r in runs]
+
+
+def _unpack_runs(packed: list) -> Inline:
+    runs = []
+    for item in packed:
+        if isinstance(item, str):
+            runs.append(Run(item))
+        else:
+            text, flags = item
+            runs.append(Run(text, bool(flags & _BOLD), bool(flags & _ITALIC)))
+    return runs
+
+
+def _pack_block(block: Block) -> list:
+    if isinstance(block, Paragraph):
+        return ["p", _pack_runs(block.runs)]
+    if isinstance(block, Rule):
+        return ["-"]
+    header = [_pack_runs(c) for c in block.header]
+    rows = [[_pack_runs(c) for c in row] for row in block.rows]
+    if isinstance(block, PriceTable):
+        return ["$", header, rows, block.prices, block.total_row]
+    return ["t", header, rows]
+
+
+def _unpack_block(packed: list) -> Block:
+    kind = packed[0]
+    if kind == "p":
+        return Paragraph(_unpack_runs(packed[1]))
+    if kind == "-":
+        return Rule()
+    header = [_unpack_runs(c) for c in packed[1]]
+    rows = [[_unpack_runs(c) for c in row] for row in packed[2]]
+    if kind == "$":
+        return PriceTable(header=header, rows=rows, prices=list(packed[3]), total_row=packed[4])
+    if kind == "t":
+        return Table(header=header, rows=rows)
+    raise ValueError(f"Неизвестный тип блока КП: {kind!r}")
+
+
+def dumps(doc: KPDocument) -> bytes:
+    """KPDocument -> сжатый JSON (для колонки tasks.kp_doc)."""
+    payload = [
+        FORMAT_VERSION,
+        doc.title,
+        [[s.title, s.level, [_pack_block(b) for b in s.blocks]] for s in doc.sections],
+    ]
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(raw.encode("utf-8"), 9)
+
+
+def loads(data: bytes) -> KPDocument:
+    version, title, sections = json.loads(zlib.decompress(data).decode("utf-8"))
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия KPDocument: {version}")
+    return KPDocument(
+        title=title,
+        sections=[Section(t, lvl, [_unpack_block(b) for b in blocks]) for t, lvl, blocks in sections],
+    )
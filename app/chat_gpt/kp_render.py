@@ -0,0 +1,146 @@
+# app/chat_gpt/kp_render.py
+"""
+Реестр бэкендов рендеринга KPDocument.
+
+Бэкенд — функция (kp_doc, output_path) -> None, регистрируется декоратором
+@register_renderer("fmt"). Встроенные бэкенды подгружаются лениво при первом обращении.
+"""
+from __future__ import annotations
+
+import html
+import importlib
+from typing import Callable
+
+from loguru import logger
+
+from app.chat_gpt.kp_document import KPDocument, Inline, Paragraph, Rule, Table
+
+Renderer = Callable[[KPDocument, str], None]
+
+_RENDERERS: dict[str, Renderer] = {}
+
+# модули, которые регистрируют свои бэкенды при импорте
+_BUILTIN_BACKENDS = (
+    "app.chat_gpt.utils.konvert_md_docx",
+    "app.chat_gpt.utils.pdf_renderer",
+)
+_builtins_loaded = False
+
+
+def register_renderer(fmt: str) -> Callable[[Renderer], Renderer]:
+    def decorator(func: Renderer) -> Renderer:
+        _RENDERERS[fmt] = func
+        return func
+    return decorator
+
+
+def _load_builtins() -> None:
+    global _builtins_loaded
+    if _builtins_loaded:
+        return
+    for module in _BUILTIN_BACKENDS:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.warning("KP renderer backend {} unavailable: {}", module, e)
+    _builtins_loaded = True
+
+
+def available_formats() -> list[str]:
+    _load_builtins()
+    return sorted(_RENDERERS)
+
+
+def render_kp(kp_doc: KPDocument, fmt: str, output_path: str) -> str:
+    """Рендерит документ в нужный формат и возвращает путь к файлу."""
+    _load_builtins()
+    try:
+        renderer = _RENDERERS[fmt]
+    except KeyError:
+        raise ValueError(f"Нет бэкенда для формата {fmt!r}. Доступны: {', '.join(sorted(_RENDERERS))}")
+    renderer(kp_doc, output_path)
+    return output_path
+
+
+# ---------- Простые текстовые бэкенды ----------
+def _md_inline(runs: Inline) -> str:
+    out = []
+    for r in runs:
+        if r.bold and r.italic:
+            out.append(f"***{r.text}***")
+        elif r.bold:
+            out.append(f"**{r.text}**")
+        elif r.italic:
+            out.append(f"*{r.text}*")
+        else:
+            out.append(r.text)
+    return "".join(out)
+
+
+def to_markdown(kp_doc: KPDocument) -> str:
+    lines = [f"# **Проект: {kp_doc.title}**", ""]
+    for section in kp_doc.sections:
+        if section.level:
+            lines += ["#" * (section.level + 1) + f" **{section.title}**", ""]
+        for block in section.blocks:
+            if isinstance(block, Paragraph):
+                lines += [_md_inline(block.runs), ""]
+            elif isinstance(block, Rule):
+                lines += ["---", ""]
+            elif isinstance(block, Table):
+                lines.append("| " + " | ".join(_md_inline(c) for c in block.header) + " |")
+                lines.append("|" + "|".join("---" for _ in block.header) + "|")
+                for row in block.rows:
+                    lines.append("| " + " | ".join(_md_inline(c) for c in row) + " |")
+                lines.append("")
+    return "\n".join(lines)
+
+
+def _html_inline(runs: Inline) -> str:
+    out = []
+    for r in runs:
+        text = html.escape(r.text)
+        if r.italic:
+            text = f"<i>{text}</i>"
+        if r.bold:
+            text = f"<b>{text}</b>"
+        out.append(text)
+    return "".join(out)
+
+
+def to_html(kp_doc: KPDocument) -> str:
+    parts = [
+        "<!DOCTYPE html><html lang=\"ru\"><head><meta charset=\"utf-8\">",
+        f"<title>{html.escape(kp_doc.title)}</title>",
+        "<style>body{font-family:Onest,sans-serif;font-size:13pt}"
+        "table{border-collapse:collapse}td,th{border:1px solid #000;padding:4px;text-align:left}</style>",
+        f"</head><body><h1>{html.escape(kp_doc.title)}</h1>",
+    ]
+    for section in kp_doc.sections:
+        if section.level:
+            tag = "h2" if section.level == 1 else "h3"
+            parts.append(f"<{tag}>{html.escape(section.title)}</{tag}>")
+        for block in section.blocks:
+            if isinstance(block, Paragraph):
+                parts.append(f"<p>{_html_inline(block.runs)}</p>")
+            elif isinstance(block, Rule):
+                parts.append("<hr>")
+            elif isinstance(block, Table):
+                parts.append("<table><tr>" + "".join(f"<th>{_html_inline(c)}</th>" for c in block.header) + "</tr>")
+                for row in block.rows:
+                    parts.append("<tr>" + "".join(f"<td>{_html_inline(c)}</td>" for c in row) + "</tr>")
+                parts.append("</table>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+@register_renderer("md")
+def render_markdown(kp_doc: KPDocument, output_path: str) -> None:
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(to_markdown(kp_doc))
+
+
+@register_renderer("html")
+def render_html(kp_doc: KPDocument, output_path: str) -> None:
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(to_html(kp_doc))
@@ -1,10 +1,11 @@
 # app/kp/kp_service.py
-import asyncio
 from openai import AsyncOpenAI
 from datetime import datetime
+from uuid import uuid4
 import os
 from app.config import settings
-from app.chat_gpt.utils.konvert_md_docx import convert_kp_markdown_to_word
+from app.chat_gpt.kp_document import KPDocument, parse_kp_markdown
+from app.chat_gpt.kp_render import render_kp
 
 from app.chat_gpt.prompts import get_prompt_by_type, ProjectType
 from loguru import logger
@@ -25,55 +26,28 @@ class KPService:
 
         return response.output_text
 
-    def create_kp_markdown(self, kp_content: str, project_name: str) -> str:
-        """Создает .md файл с коммерческим предложением"""
-        # Используем контент как есть, без дополнительных заголовков
-        full_content = kp_content
-
-        filename = f"КП_{project_name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M')}.md"
-        filepath = os.path.join("generated_kp", filename)
-
+    async def create_kp(self, project_description: str, project_name: str, project_type: ProjectType) -> KPDocument:
+        """Генерирует КП и один раз разбирает ответ модели в KPDocument"""
+        kp_content = await self.generate_kp_content(project_description, project_type)
+        return parse_kp_markdown(kp_content, project_name)
+
+    def export_kp(self, kp_doc: KPDocument, project_name: str, fmt: str = "docx") -> str:
+        """
+        Рендерит готовый KPDocument в файл нужного формата (без обращения к GPT).
+        Синхронно и долго (секунды на большом КП) — из async-кода через asyncio.to_thread.
+        """
+        # суффикс — две выгрузки одного КП в одну минуту не пишут в один файл
+        stamp = datetime.now().strftime('%Y%m%d_%H%M')
+        filename = f"КП_{project_name.replace(' ', '_')}_{stamp}_{uuid4().hex[:6]}.{fmt}"
         os.makedirs("generated_kp", exist_ok=True)
-
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(full_content)
-
-        return filepath
-
-    def convert_markdown_to_docx(self, md_filepath: str, project_name: str) -> str:
-        """Конвертирует .md файл в .docx с логотипом"""
-        docx_filepath = md_filepath.replace('.md', '.docx')
-
-        # Используем новую функцию с поддержкой логотипа
-        success, message = convert_kp_markdown_to_word(
-            md_filepath,
-            docx_filepath,
-            project_name,
-            None  # Дата создания не нужна
-        )
-
-        if success:
-            # Удаляем временный .md файл
-            if os.path.exists(md_filepath):
-                os.remove(md_filepath)
-            return docx_filepath
-        else:
-            raise Exception(f"Ошибка конвертации: {message}")
+        return render_kp(kp_doc, fmt, os.path.join("generated_kp", filename))
 
     async def create_kp_document(self, project_description: str, project_name: str, project_type: ProjectType) -> str:
         """Основная функция: создает КП и возвращает путь к файлу"""
+        kp_doc = await self.create_kp(project_description, project_name, project_type)
 
-        # Генерируем содержимое КП с учетом типа
-        kp_content = await self.generate_kp_content(project_description, project_type)
-
-        # Создаем Markdown файл
-        md_filepath = self.create_kp_markdown(kp_content, project_name)
-
-        # Конвертируем в DOCX с логотипом
-        docx_filepath = self.convert_markdown_to_docx(md_filepath, project_name)
-
-        # Пытаемся конвертировать DOCX в PDF (оставляем логику на будущее)
-        # final_filepath = convert_docx_to_pdf_with_fallback(docx_filepath)
+        # DOCX с логотипом; PDF и другие форматы — через export_kp(kp_doc, ..., fmt)
+        docx_filepath = self.export_kp(kp_doc, project_name)
 
         logger.info(f"KP document created: {docx_filepath}")
         return docx_filepath  # Возвращаем DOCX
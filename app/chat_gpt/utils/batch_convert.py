@@ -0,0 +1,195 @@
+# app/chat_gpt/utils/batch_convert.py
+"""
+Офлайн-перерендер папок с КП (Markdown -> DOCX/PDF) после правок шаблонов.
+
+    python -m app.chat_gpt.utils.batch_convert app/chat_gpt/generated_kp -f docx,pdf
+    python -m app.chat_gpt.utils.batch_convert "archive/**/*.md" -o out/ --check hash -j 4
+
+Каждый .md разбирается один раз в KPDocument и рендерится во все форматы в воркере
+пула процессов (по умолчанию — по воркеру на ядро). Уже актуальные файлы пропускаются:
+по mtime (результат новее исходника) или по хэшу содержимого исходника (--check hash).
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from app.chat_gpt.kp_document import parse_kp_markdown
+from app.chat_gpt.kp_render import available_formats, render_kp
+
+HASH_MANIFEST = ".kp_convert_hashes.json"
+
+
+def collect_inputs(patterns: list[str]) -> list[Path]:
+    """Файлы, каталоги (рекурсивно *.md) и glob-шаблоны -> отсортированный список без дублей."""
+    found: dict[Path, None] = {}
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            matches = path.rglob("*.md")
+        elif path.is_file():
+            matches = [path]
+        else:
+            matches = (Path(p) for p in glob.glob(pattern, recursive=True))
+        for match in matches:
+            if match.is_file() and match.suffix.lower() == ".md":
+                found[match.resolve()] = None
+    return sorted(found)
+
+
+def _source_hash(md_path: Path) -> str:
+    return hashlib.sha256(md_path.read_bytes()).hexdigest()
+
+
+def _output_path(md_path: Path, fmt: str, out_dir: Optional[Path], root: Path) -> Path:
+    """Рядом с исходником или в out_dir с сохранением структуры подкаталогов относительно root."""
+    if out_dir is None:
+        return md_path.with_suffix(f".{fmt}")
+    return (out_dir / md_path.relative_to(root)).with_suffix(f".{fmt}")
+
+
+def _init_worker() -> None:
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+
+def _is_up_to_date(md_path: Path, out_path: Path, check: str, hashes: dict[str, str], digest: Optional[str]) -> bool:
+    if not out_path.exists():
+        return False
+    if check == "hash":
+        return hashes.get(str(out_path)) == digest
+    return out_path.stat().st_mtime >= md_path.stat().st_mtime
+
+
+def convert_one(md_path: str, outputs: list[tuple[str, str]]) -> tuple[str, float, Optional[str]]:
+    """Воркер: один разбор Markdown, рендер во все запрошенные форматы."""
+    start = time.perf_counter()
+    try:
+        with open(md_path, "r", encoding="utf-8") as f:
+            kp_doc = parse_kp_markdown(f.read())
+        for fmt, out_path in outputs:
+            os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+            render_kp(kp_doc, fmt, out_path)
+        return md_path, time.perf_counter() - start, None
+    except Exception as e:
+        return md_path, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+
+def _load_hashes(path: Path) -> dict[str, str]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def run(
+    patterns: list[str],
+    formats: list[str],
+    *,
+    out_dir: Optional[Path] = None,
+    check: str = "mtime",
+    force: bool = False,
+    jobs: Optional[int] = None,
+) -> int:
+    inputs = collect_inputs(patterns)
+    if not inputs:
+        print("Не найдено ни одного .md", file=sys.stderr)
+        return 1
+
+    root = Path(os.path.commonpath(inputs)) if len(inputs) > 1 else inputs[0].parent
+    manifest_path = (out_dir or Path.cwd()) / HASH_MANIFEST
+    hashes = _load_hashes(manifest_path) if check == "hash" else {}
+
+    # план: что реально нужно перерендерить
+    plan: list[tuple[Path, list[tuple[str, str]], Optional[str]]] = []
+    skipped = 0
+    for md_path in inputs:
+        digest = _source_hash(md_path) if check == "hash" else None
+        outputs = []
+        for fmt in formats:
+            out_path = _output_path(md_path, fmt, out_dir, root)
+            if out_path.resolve() == md_path:
+                # -f md без -o (или -o в каталог исходников): результат затёр бы исходник
+                logger.warning("{}: {} is the source itself, skipped", md_path, fmt)
+                continue
+            if force or not _is_up_to_date(md_path, out_path, check, hashes, digest):
+                outputs.append((fmt, str(out_path)))
+        if outputs:
+            plan.append((md_path, outputs, digest))
+        else:
+            skipped += 1
+
+    total = len(plan)
+    print(f"Найдено {len(inputs)} КП: к рендеру {total}, актуальных {skipped}", flush=True)
+    if not total:
+        return 0
+
+    workers = max(1, min(jobs or os.cpu_count() or 1, total))
+    digests = {str(md): (outputs, digest) for md, outputs, digest in plan}
+    failed = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(convert_one, str(md), outputs) for md, outputs, _ in plan]
+        for done, future in enumerate(as_completed(futures), 1):
+            md_path, elapsed, error = future.result()
+            outputs, digest = digests[md_path]
+            if error:
+                failed += 1
+                print(f"[{done}/{total}] ❌ {md_path}: {error}", flush=True)
+                continue
+            if digest:
+                for _, out_path in outputs:
+                    hashes[out_path] = digest
+            fmts = ",".join(fmt for fmt, _ in outputs)
+            print(f"[{done}/{total}] ✅ {md_path} -> {fmts} ({elapsed * 1000:.0f} мс)", flush=True)
+
+    wall = time.perf_counter() - start
+    if check == "hash":
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        manifest_path.write_text(json.dumps(hashes, ensure_ascii=False, indent=1, sort_keys=True), encoding="utf-8")
+
+    converted = total - failed
+    print(
+        f"Готово: {converted} ок, {failed} ошибок, {skipped} пропущено за {wall:.2f} с "
+        f"({converted / wall if wall else 0:.1f} док/с, воркеров: {workers})",
+        flush=True,
+    )
+    return 1 if failed else 0
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Пакетная конвертация КП Markdown -> DOCX/PDF")
+    parser.add_argument("inputs", nargs="+", help="файлы .md, каталоги или glob-шаблоны (\"**/*.md\")")
+    parser.add_argument("-f", "--formats", default="docx",
+                        help=f"форматы через запятую (доступны: {', '.join(available_formats())})")
+    parser.add_argument("-o", "--out-dir", type=Path, default=None, help="каталог результатов (по умолчанию рядом с .md)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="число процессов (по умолчанию — ядра CPU)")
+    parser.add_argument("--check", choices=("mtime", "hash"), default="mtime",
+                        help="как определять, что результат актуален")
+    parser.add_argument("--force", action="store_true", help="перерендерить всё")
+    args = parser.parse_args(argv)
+    _init_worker()
+
+    formats = [f.strip().lower() for f in args.formats.split(",") if f.strip()]
+    unknown = set(formats) - set(available_formats())
+    if unknown:
+        parser.error(f"неизвестные форматы: {', '.join(sorted(unknown))}")
+    if "md" in formats and args.out_dir is None:
+        parser.error("формат md пишется поверх исходников — укажите каталог результатов (-o)")
+
+    return run(args.inputs, formats, out_dir=args.out_dir, check=args.check, force=args.force, jobs=args.jobs)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,9 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 
+from app.chat_gpt.kp_document import KPDocument, Paragraph, Rule, Table, parse_kp_markdown
+from app.chat_gpt.kp_render import register_renderer
+
 
 class MarkdownToWordConverter:
     """Класс для конвертации Markdown в Word с точным форматированием"""
@@ -140,157 +143,81 @@ class MarkdownToWordConverter:
             if formatting.get('italic'):
                 run.italic = True
 
-    def process_table(self, lines, start_idx):
-        """Обрабатывает таблицу из markdown"""
-        table_lines = []
-        idx = start_idx
-
-        # Собираем все строки таблицы
-        while idx < len(lines) and '|' in lines[idx]:
-            table_lines.append(lines[idx])
-            idx += 1
-
-        if len(table_lines) < 2:
-            return idx
-
-        # Парсим таблицу
-        rows = []
-        for line in table_lines:
-            # Пропускаем разделительную строку (---|---|---)
-            if re.match(r'^\|[\s\-:|]+\|$', line.strip()):
-                continue
-
-            # Разбиваем строку на ячейки
-            cells = line.split('|')
-            # Убираем пустые ячейки в начале и конце, а также делаем strip
-            cells = [c.strip() for c in cells[1:-1] if c.strip()]
-            if cells:
-                rows.append(cells)
-
-        if not rows:
-            return idx
-
-        # Создаем таблицу в документе
+    def add_runs(self, paragraph, runs, font_size=13, bold=False):
+        """Добавляет в параграф уже разобранные куски текста (KPDocument)"""
+        for part in runs:
+            run = paragraph.add_run(part.text)
+            run.font.name = 'Onest'
+            run.font.size = Pt(font_size)
+            run.font.color.rgb = RGBColor(0, 0, 0)
+
+            if bold or part.bold:
+                run.bold = True
+            if part.italic:
+                run.italic = True
+
+    def add_table(self, table_block):
+        """Добавляет таблицу KPDocument в документ"""
+        rows = [table_block.header] + list(table_block.rows)
+
         table = self.doc.add_table(rows=len(rows), cols=len(rows[0]))
         table.style = 'Table Grid'
         self.add_table_borders(table)
 
-        # Заполняем таблицу
         for i, row_data in enumerate(rows):
-            for j, cell_text in enumerate(row_data):
-                if j < len(table.rows[i].cells):
-                    cell = table.rows[i].cells[j]
-                    # Очищаем ячейку и добавляем форматированный текст
+            cells = table.rows[i].cells
+            for j, cell_runs in enumerate(row_data):
+                if j < len(cells):
+                    cell = cells[j]
                     cell.text = ''
                     paragraph = cell.paragraphs[0]
-                    self.add_formatted_text(paragraph, cell_text)
-                    # Устанавливаем выравнивание по левому краю для текста в ячейках
+                    # Первая строка таблицы — заголовок, всегда жирная
+                    self.add_runs(paragraph, cell_runs, bold=(i == 0))
                     paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
 
-                    # Форматирование для заголовка таблицы (первая строка)
-                    if i == 0:
-                        for run in paragraph.runs:
-                            run.bold = True
-
         # Добавляем пустую строку после таблицы
         self.doc.add_paragraph()
 
-        return idx
+    def render_document(self, kp_doc: KPDocument, output_path, creation_date=None):
+        """Рендерит KPDocument в .docx (без разбора Markdown)"""
+        self.create_document()
+        self.add_project_info(kp_doc.title, creation_date)
+
+        for section in kp_doc.sections:
+            if section.level:
+                self.add_section_title(section.title, level=section.level)
+
+            for block in section.blocks:
+                if isinstance(block, Paragraph):
+                    paragraph = self.doc.add_paragraph()
+                    self.add_runs(paragraph, block.runs)
+                    paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
+                    paragraph.paragraph_format.space_after = Pt(6)
+                elif isinstance(block, Rule):
+                    self.doc.add_paragraph()
+                elif isinstance(block, Table):
+                    self.add_table(block)
+
+        self.doc.save(output_path)
 
     def convert_file(self, input_path, output_path, project_name=None, creation_date=None):
         """Конвертирует markdown файл в Word с точным форматированием"""
         try:
-            # Читаем файл
             with open(input_path, 'r', encoding='utf-8') as f:
                 content = f.read()
 
-            # Создаем документ с логотипом
-            self.create_document()
-
-            # Извлекаем название проекта из markdown, если не было передано
-            if not project_name:
-                # Ищем первый заголовок с форматом # **Проект: название**
-                for line in content.split('\n'):
-                    stripped = line.strip()
-                    if stripped.startswith('# **Проект:'):
-                        # Извлекаем название из формата # **Проект: Название**
-                        # Убираем начало и конец
-                        text = stripped.replace('# ', '').replace('**', '').replace('Проект:', '')
-                        project_name = text.strip()
-                        if project_name:
-                            break
-            
-            # Если все еще нет названия, используем заглушку
-            if not project_name:
-                project_name = "Коммерческое предложение"
-
-            # Добавляем информацию о проекте
-            self.add_project_info(project_name, creation_date)
-
-            # Разбиваем на строки
-            lines = content.split('\n')
-
-            i = 0
-            while i < len(lines):
-                line = lines[i]
-                stripped = line.strip()
-
-                # Пропускаем пустые строки
-                if not stripped:
-                    i += 1
-                    continue
-
-                # Пропускаем основной заголовок с названием проекта (уже добавили в шапке)
-                if stripped.startswith('# ') and 'Проект:' in stripped:
-                    i += 1
-                    continue
-
-                # Заголовки разделов (## заголовок)
-                if stripped.startswith('## '):
-                    title_text = stripped[3:].strip()
-                    # Убираем ** вокруг текста
-                    title_text = re.sub(r'^\*\*(.*?)\*\*$', r'\1', title_text)
-                    self.add_section_title(title_text, level=1)
-                    i += 1
-                    continue
-
-                # Подзаголовки (### заголовок)
-                elif stripped.startswith('### '):
-                    title_text = stripped[4:].strip()
-                    # Убираем ** вокруг текста
-                    title_text = re.sub(r'^\*\*(.*?)\*\*$', r'\1', title_text)
-                    self.add_section_title(title_text, level=2)
-                    i += 1
-                    continue
-
-                # Горизонтальная линия
-                elif stripped == '---' or stripped == '***' or stripped == '___':
-                    self.doc.add_paragraph()
-                    i += 1
-                    continue
-
-                # Таблицы
-                elif '|' in line:
-                    i = self.process_table(lines, i)
-                    continue
-
-                # Обычный текст - сохраняем форматирование
-                else:
-                    if stripped:
-                        paragraph = self.doc.add_paragraph()
-                        self.add_formatted_text(paragraph, stripped)
-                        paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
-                        paragraph.paragraph_format.space_after = Pt(6)
-                    i += 1
-
-            # Сохраняем документ
-            self.doc.save(output_path)
+            self.render_document(parse_kp_markdown(content, project_name), output_path, creation_date)
             return True, "Успешно конвертировано"
 
         except Exception as e:
             return False, f"Ошибка при конвертации: {str(e)}"
 
 
+@register_renderer("docx")
+def render_docx(kp_doc: KPDocument, output_path: str) -> None:
+    MarkdownToWordConverter().render_document(kp_doc, output_path)
+
+
 def convert_markdown_to_word(input_path, output_path=None, project_name=None, creation_date=None):
     """
     Основная функция для конвертации Markdown в Word с точным форматированием
@@ -312,31 +239,12 @@ def convert_kp_markdown_to_word(input_path, output_path, project_name, creation_
     return convert_markdown_to_word(input_path, output_path, project_name, creation_date)
 
 def main():
-    input_file = r"F:\my_projects\my_bot_tz_kp\app\chat_gpt\generated_kp\gg.md"
-    # Проверяем существование входного файла
-    if not os.path.exists(input_file):
-        print(f"Ошибка: Файл '{input_file}' не найден")
-        sys.exit(1)
-
-    # Определяем выходной файл
-    if len(sys.argv) >= 3:
-        output_file = sys.argv[2]
-    else:
-        # Создаем имя выходного файла на основе входного
-        input_path = Path(input_file)
-        output_file = input_path.with_suffix('.docx')
-
-    print(f"Конвертация: {input_file} -> {output_file}")
-
-    # Выполняем конвертацию
-    success, message = convert_markdown_to_word(input_file, output_file)
-
-    if success:
-        print(f"✅ Успешно: {message}")
-        print(f"📄 Файл сохранен: {output_file}")
-    else:
-        print(f"❌ Ошибка: {message}")
-        sys.exit(1)
+    """
+    Пакетная конвертация из командной строки, см. app/chat_gpt/utils/batch_convert.py:
+    python -m app.chat_gpt.utils.konvert_md_docx app/chat_gpt/generated_kp -f docx,pdf
+    """
+    from app.chat_gpt.utils.batch_convert import main as batch_main
+    sys.exit(batch_main())
 
 
 if __name__ == "__main__":
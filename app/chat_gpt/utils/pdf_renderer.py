@@ -0,0 +1,222 @@
+# app/chat_gpt/utils/pdf_renderer.py
+"""
+Нативный PDF-бэкенд для KPDocument (reportlab) — без DOCX, LibreOffice и Word.
+
+Шрифт Onest встраивается подмножеством глифов (так reportlab работает с TTF по умолчанию).
+Ищем его в KP_FONT_DIR, app/assets/fonts (см. README там) и системных шрифтах; если Onest
+нет — берём DejaVu Sans (есть в Docker-образе), чтобы кириллица всё равно отображалась.
+"""
+from __future__ import annotations
+
+import io
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+from xml.sax.saxutils import escape
+
+from loguru import logger
+from PIL import Image as PILImage
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_LEFT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from app.chat_gpt.kp_document import Inline, KPDocument, Paragraph as KPParagraph, Rule, Table as KPTable
+from app.chat_gpt.kp_render import register_renderer
+from app.config import settings
+
+ROOT_DIR = Path(__file__).resolve().parents[3]
+LOGO_PATH = ROOT_DIR / "hacktaika.png"
+LOGO_SIZE = 18 * mm
+
+# (regular, bold) в порядке предпочтения
+_FONT_CANDIDATES = (
+    ("Onest-Regular.ttf", "Onest-Bold.ttf"),
+    ("DejaVuSans.ttf", "DejaVuSans-Bold.ttf"),
+)
+_SYSTEM_FONT_DIRS = (
+    "/usr/share/fonts/truetype/onest",
+    "/usr/share/fonts/truetype/dejavu",
+    "/usr/share/fonts/TTF",
+    "/usr/local/share/fonts",
+)
+
+# rl_config — глобальные настройки reportlab; меняем только на время своей сборки
+_build_lock = threading.Lock()
+# шрифты и стили регистрируются лениво, а рендеры идут в пуле потоков
+_init_lock = threading.Lock()
+
+_font_family: Optional[str] = None
+_logo_jpeg: Optional[bytes] = None
+_styles: Optional[dict[str, ParagraphStyle]] = None
+
+
+def _font_dirs() -> list[Path]:
+    dirs = []
+    if settings.KP_FONT_DIR:
+        dirs.append(Path(settings.KP_FONT_DIR))
+    dirs.append(ROOT_DIR / "app" / "assets" / "fonts")
+    dirs.extend(Path(d) for d in _SYSTEM_FONT_DIRS)
+    return dirs
+
+
+def _register_fonts() -> str:
+    """Регистрирует семейство шрифтов один раз на процесс, возвращает его имя."""
+    global _font_family
+    if _font_family:
+        return _font_family
+
+    for regular, bold in _FONT_CANDIDATES:
+        for font_dir in _font_dirs():
+            regular_path, bold_path = font_dir / regular, font_dir / bold
+            if not regular_path.exists():
+                continue
+            family = regular.split("-")[0].split(".")[0]
+            pdfmetrics.registerFont(TTFont(family, str(regular_path)))
+            bold_name = family
+            if bold_path.exists():
+                bold_name = f"{family}-Bold"
+                pdfmetrics.registerFont(TTFont(bold_name, str(bold_path)))
+            # курсива у Onest нет — используем прямое начертание
+            pdfmetrics.registerFontFamily(family, normal=family, bold=bold_name, italic=family, boldItalic=bold_name)
+            if family != "Onest":
+                logger.warning("Onest font not found, PDF falls back to {}", regular_path)
+            _font_family = family
+            return family
+
+    raise RuntimeError("Не найден TTF-шрифт с кириллицей (Onest или DejaVu Sans) для PDF")
+
+
+def _logo() -> Optional[Image]:
+    """Логотип, заранее уменьшенный до размера в документе (исходник ~2 МБ)."""
+    global _logo_jpeg
+    if _logo_jpeg is None:
+        if not LOGO_PATH.exists():
+            return None
+        with PILImage.open(LOGO_PATH) as im:
+            im = im.convert("RGB")
+            im.thumbnail((200, 200))
+            buf = io.BytesIO()
+            im.save(buf, format="JPEG", quality=90)
+        _logo_jpeg = buf.getvalue()
+    return Image(io.BytesIO(_logo_jpeg), width=LOGO_SIZE, height=LOGO_SIZE, hAlign="LEFT")
+
+
+def _get_styles() -> dict[str, ParagraphStyle]:
+    global _styles
+    if _styles is not None:
+        return _styles
+    with _init_lock:
+        if _styles is not None:
+            return _styles
+        font = _register_fonts()
+        base = ParagraphStyle("kp_body", fontName=font, fontSize=11, leading=14, alignment=TA_LEFT,
+                              textColor=colors.black, spaceAfter=6)
+        _styles = {
+            "body": base,
+            "cell": ParagraphStyle("kp_cell", parent=base, fontSize=10, leading=12.5, spaceAfter=0),
+            "title": ParagraphStyle("kp_title", parent=base, fontSize=20, leading=24, spaceAfter=6),
+            "h1": ParagraphStyle("kp_h1", parent=base, fontSize=14, leading=17, spaceBefore=12),
+            "h2": ParagraphStyle("kp_h2", parent=base, fontSize=12, leading=15, spaceBefore=10),
+        }
+    return _styles
+
+
+def _markup(runs: Inline, bold: bool = False) -> str:
+    out = []
+    for r in runs:
+        text = escape(r.text)
+        if r.italic:
+            text = f"<i>{text}</i>"
+        if r.bold or bold:
+            text = f"<b>{text}</b>"
+        out.append(text)
+    return "".join(out)
+
+
+def _col_widths(cols: int, width: float) -> list[float]:
+    if cols == 2:
+        return [width * 0.35, width * 0.65]
+    if cols == 3:
+        return [width * 0.5, width * 0.25, width * 0.25]
+    return [width / cols] * cols
+
+
+def _table(block: KPTable, width: float, styles: dict[str, ParagraphStyle]) -> Table:
+    cols = len(block.header)
+    data = [[Paragraph(_markup(c, bold=True), styles["cell"]) for c in block.header]]
+    for row in block.rows:
+        cells = [Paragraph(_markup(c), styles["cell"]) for c in row[:cols]]
+        cells += [""] * (cols - len(cells))
+        data.append(cells)
+
+    table = Table(data, colWidths=_col_widths(cols, width), repeatRows=1, hAlign="LEFT")
+    table.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("LEFTPADDING", (0, 0), (-1, -1), 4),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 4),
+    ]))
+    return table
+
+
+def build_story(kp_doc: KPDocument, width: float) -> list:
+    styles = _get_styles()
+    story = []
+
+    logo = _logo()
+    if logo is not None:
+        story += [logo, Spacer(1, 4 * mm)]
+    story.append(Paragraph(f"<b>{escape(kp_doc.title)}</b>", styles["title"]))
+
+    for section in kp_doc.sections:
+        if section.level:
+            style = styles["h1"] if section.level == 1 else styles["h2"]
+            story.append(Paragraph(f"<b>{escape(section.title)}</b>", style))
+        for block in section.blocks:
+            if isinstance(block, KPParagraph):
+                story.append(Paragraph(_markup(block.runs), styles["body"]))
+            elif isinstance(block, Rule):
+                story.append(Spacer(1, 4 * mm))
+            elif isinstance(block, KPTable):
+                story += [_table(block, width, styles), Spacer(1, 4 * mm)]
+    return story
+
+
+@contextmanager
+def _binary_streams() -> Iterator[None]:
+    """
+    Бинарные потоки и так сжаты zlib; ASCII85 поверх них без C-ускорителя занимает
+    основную часть времени рендера (картинка логотипа) и раздувает файл на четверть.
+    Опции на документ у reportlab нет — флаг выключается только на время сборки,
+    сборки в разных потоках (asyncio.to_thread) идут по очереди.
+    """
+    with _build_lock:
+        previous = rl_config.useA85
+        rl_config.useA85 = 0
+        try:
+            yield
+        finally:
+            rl_config.useA85 = previous
+
+
+@register_renderer("pdf")
+def render_pdf(kp_doc: KPDocument, output_path: str) -> None:
+    doc = SimpleDocTemplate(
+        output_path,
+        pagesize=A4,
+        leftMargin=20 * mm, rightMargin=15 * mm, topMargin=15 * mm, bottomMargin=15 * mm,
+        title=kp_doc.title,
+        author="hacktaika",
+    )
+    story = build_story(kp_doc, doc.width)
+    with _binary_streams():
+        doc.build(story)
+    logger.debug("PDF rendered: {} ({} bytes)", output_path, os.path.getsize(output_path))
@@ -1,5 +1,6 @@
 import os
-from typing import List
+from typing import List, Literal
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -15,15 +16,131 @@ class Settings(BaseSettings):
     BUSINESS_PARTNER_ID: int
     TEAM_PARTNER_ID: int
 
+    # ADMIN_IDS и *_PARTNER_ID заполняют таблицу user_roles при первом запуске, дальше роли
+    # меняются командой /role без передеплоя. Кэш ролей перечитывается по Postgres NOTIFY
+    # и страховочно раз в ROLES_RELOAD_SECONDS
+    ROLES_RELOAD_SECONDS: int = 300
+
     REMINDER_DELAY_SECONDS_NEW: int = 7200
 
+    # Каталог с Onest-Regular.ttf / Onest-Bold.ttf для PDF-бэкенда КП
+    KP_FONT_DIR: str | None = None
+
+    # Лимиты исходящих сообщений: глобально на бота и на один чат (токены/с, запас на всплеск)
+    OUTBOUND_GLOBAL_RATE: float = 30
+    OUTBOUND_CHAT_RATE: float = 1
+    OUTBOUND_CHAT_BURST: int = 10
+
+    # Очередь исходящих (outbox): параллельно обслуживаемых чатов и попыток до статуса dead
+    OUTBOX_WORKERS: int = 8
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_LEASE_SECONDS: int = 60  # сообщения упавшей реплики вернутся в очередь через столько секунд
+
+    # Хранилище FSM (черновики): memory | postgres | redis; брошенные черновики живут FSM_TTL_SECONDS
+    FSM_STORAGE: Literal["memory", "postgres", "redis"] = "postgres"
+    REDIS_URL: str | None = None
+    FSM_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # Лимиты черновика проекта: сообщений и символов текста (сверх — не принимаем)
+    DRAFT_MAX_ITEMS: int = 500
+    DRAFT_MAX_CHARS: int = 200_000
+
+    # Текст документов клиента (PDF, DOCX, TXT) для брифа: файлы больше INGEST_MAX_FILE_MB не скачиваются
+    # (api.telegram.org отдаёт ботам до 20 МБ), читается до INGEST_MAX_PAGES страниц и INGEST_MAX_CHARS
+    # символов с файла, в бриф — до INGEST_BRIEF_MAX_CHARS со всех; задача генерации проекта
+    # (этап «документы») ждёт недоразобранные файлы не дольше INGEST_WAIT_SECONDS
+    INGEST_WORKERS: int = 2
+    INGEST_MAX_FILE_MB: int = 20
+    INGEST_MAX_PAGES: int = 50
+    INGEST_MAX_CHARS: int = 30_000
+    INGEST_BRIEF_MAX_CHARS: int = 100_000
+    INGEST_WAIT_SECONDS: float = 20.0
+
+    # Подтверждения «Добавил в черновик»: одно на пачку сообщений, пришедших с паузой
+    # меньше ACK_DEBOUNCE_SECONDS (не дольше ACK_MAX_DELAY_SECONDS); недавнее — редактируется
+    ACK_DEBOUNCE_SECONDS: float = 1.0
+    ACK_MAX_DELAY_SECONDS: float = 5.0
+    ACK_MERGE_SECONDS: float = 20.0
+
+    # Апдейты разных чатов обрабатываются параллельно (не больше UPDATES_MAX_PARALLEL),
+    # одного чата — строго по очереди; при такой глубине очереди чата — предупреждение в лог
+    UPDATES_MAX_PARALLEL: int = 32
+    UPDATES_CHAT_DEPTH_WARNING: int = 20
+
+    # Частота действий одного пользователя: действие -> [сколько, за сколько секунд]
+    THROTTLE_LIMITS: dict[str, tuple[int, float]] = {
+        "messages": (200, 60),     # материалы в черновик приходят пачками
+        "regen": (6, 600),         # перегенерация поста/КП — вызовы GPT
+        "send_project": (5, 600),  # отправка проекта и «Продолжить» — полный прогон GPT
+    }
+
+    # Повторные нажатия «Отправить проект»: блокировка на время обработки и кэш результата
+    IDEMPOTENCY_LOCK_SECONDS: int = 60
+    IDEMPOTENCY_RESULT_SECONDS: int = 86400
+
+    # Фоновые задачи (генерация проекта): параллельных воркеров и максимум задач в очереди
+    JOBS_WORKERS: int = 2
+    JOBS_QUEUE_SIZE: int = 20
+    # memory — очередь в процессе бота; postgres — таблица jobs, выполняют `python -m app.worker`
+    JOBS_BACKEND: Literal["memory", "postgres"] = "memory"
+    JOBS_LEASE_SECONDS: int = 60  # задача упавшего воркера вернётся в очередь через столько секунд
+    JOBS_MAX_ATTEMPTS: int = 3
+    JOBS_POLL_SECONDS: float = 1.0
+    # Сколько задач каждого типа выполняется одновременно на всех воркерах (по умолчанию — JOBS_WORKERS)
+    JOBS_KIND_CONCURRENCY: dict[str, int] = {"generate_project": 4}
+    # Оценка длительности задачи для места в очереди и ETA, пока нет статистики выполненных
+    JOBS_DEFAULT_DURATION_SECONDS: float = 120.0
+
+    # Свой сервер Bot API (telegram-bot-api), например http://telegram-bot-api:8081; пусто — api.telegram.org.
+    # TELEGRAM_API_LOCAL — сервер запущен с --local: файлы передаются путями через общий том
+    TELEGRAM_API_URL: str | None = None
+    TELEGRAM_API_LOCAL: bool = True
+    TELEGRAM_API_FILES_DIR: str = "/var/lib/telegram-bot-api"  # рабочий каталог сервера (путь у сервера)
+    TELEGRAM_API_FILES_LOCAL_DIR: str | None = None  # тот же том у бота, если смонтирован по другому пути
+
+    # HTTP-пул бота к Bot API: соединений всего / на хост (0 — без отдельного лимита), кэш DNS,
+    # keep-alive простаивающих соединений, таймауты (сек). TELEGRAM_PROXY — socks5://… или http://…
+    TELEGRAM_HTTP_LIMIT: int = 100
+    TELEGRAM_HTTP_LIMIT_PER_HOST: int = 0
+    TELEGRAM_HTTP_DNS_TTL: int = 3600
+    TELEGRAM_HTTP_KEEPALIVE_SECONDS: float = 30.0
+    TELEGRAM_HTTP_CONNECT_TIMEOUT: float = 10.0
+    TELEGRAM_HTTP_TIMEOUT: float = 60.0
+    TELEGRAM_PROXY: str | None = None
+
+    # Режим получения апдейтов: long polling или вебхук (встроенный aiohttp-сервер)
+    BOT_MODE: Literal["polling", "webhook"] = "polling"
+    BASE_SITE: str | None = None  # публичный https-адрес, на который Telegram шлёт апдейты
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_SECRET: str | None = None  # X-Telegram-Bot-Api-Secret-Token: 1-256 символов A-Z a-z 0-9 _ -
+    WEBAPP_HOST: str = "0.0.0.0"
+    WEBAPP_PORT: int = 8080
+    # Снимать вебхук при остановке. За балансировщиком с несколькими репликами — false,
+    # иначе остановка одной реплики отключит доставку всем остальным
+    WEBHOOK_DELETE_ON_SHUTDOWN: bool = True
+
     model_config = SettingsConfigDict(
         env_file=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env")
     )
 
+    @model_validator(mode="after")
+    def _check_runtime(self) -> "Settings":
+        if self.BOT_MODE == "webhook":
+            if not self.BASE_SITE:
+                raise ValueError("BASE_SITE is required when BOT_MODE=webhook")
+            if not self.WEBHOOK_SECRET:
+                raise ValueError("WEBHOOK_SECRET is required when BOT_MODE=webhook")
+        if self.FSM_STORAGE == "redis" and not self.REDIS_URL:
+            raise ValueError("REDIS_URL is required when FSM_STORAGE=redis")
+        if not self.WEBHOOK_PATH.startswith("/"):
+            self.WEBHOOK_PATH = f"/{self.WEBHOOK_PATH}"
+        return self
+
     def get_webhook_url(self) -> str:
-        """Возвращает URL вебхука с кодированием специальных символов."""
-        return f"{self.BASE_SITE}/webhook"
+        """Полный URL вебхука: BASE_SITE + WEBHOOK_PATH."""
+        if not self.BASE_SITE:
+            raise ValueError("BASE_SITE is not set")
+        return f"{self.BASE_SITE.rstrip('/')}{self.WEBHOOK_PATH}"
 
 
 # Получаем параметры для загрузки переменных среды
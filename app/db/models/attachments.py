@@ -0,0 +1,72 @@
+from __future__ import annotations
+from datetime import datetime
+from typing import Optional, List, Any
+
+from sqlalchemy import String, Integer, Boolean, DateTime, Text, text, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import BaseDAO
+from app.db.database import Base
+from app.db.models.outbox import utc_now
+
+
+class AttachmentText(Base):
+    """
+    Кэш извлечённого текста вложения (PDF, DOCX, TXT) по file_unique_id: один и тот же
+    файл, пересланный повторно или другим пользователем, не скачивается и не разбирается снова.
+    """
+    __tablename__ = "attachment_texts"
+
+    file_unique_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    file_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    status: Mapped[str] = mapped_column(String(16), nullable=False)  # ok | failed | too_large
+    text: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    pages: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # прочитано страниц (PDF)
+    truncated: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)  # упёрлись в лимиты
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
+
+
+class AttachmentTextDAO(BaseDAO):
+    model = AttachmentText
+
+    @classmethod
+    async def get_many(cls, session: AsyncSession, file_unique_ids: List[str]) -> dict[str, Any]:
+        if not file_unique_ids:
+            return {}
+        sql = text("""
+            SELECT file_unique_id, file_name, status, text, pages, truncated, error
+            FROM attachment_texts
+            WHERE file_unique_id IN :ids
+        """).bindparams(bindparam("ids", expanding=True))
+        rows = (await session.execute(sql, {"ids": list(set(file_unique_ids))})).all()
+        return {row.file_unique_id: row for row in rows}
+
+    @classmethod
+    async def save(
+        cls,
+        session: AsyncSession,
+        *,
+        file_unique_id: str,
+        file_name: Optional[str],
+        status: str,
+        text_value: Optional[str] = None,
+        pages: Optional[int] = None,
+        truncated: bool = False,
+        error: Optional[str] = None,
+    ) -> None:
+        sql = text("""
+            INSERT INTO attachment_texts (file_unique_id, file_name, status, text, pages, truncated, error, created_at)
+            VALUES (:file_unique_id, :file_name, :status, :text, :pages, :truncated, :error, :now)
+            ON CONFLICT (file_unique_id) DO UPDATE
+            SET file_name = EXCLUDED.file_name, status = EXCLUDED.status, text = EXCLUDED.text,
+                pages = EXCLUDED.pages, truncated = EXCLUDED.truncated, error = EXCLUDED.error,
+                created_at = EXCLUDED.created_at
+        """)
+        await session.execute(sql, {
+            "file_unique_id": file_unique_id, "file_name": (file_name or "")[:255] or None, "status": status,
+            "text": text_value, "pages": pages, "truncated": bool(truncated),
+            "error": error[:2000] if error else None, "now": utc_now(),
+        })
+        await session.commit()
@@ -0,0 +1,136 @@
+from __future__ import annotations
+from datetime import datetime
+from typing import Optional, List, Any
+
+from sqlalchemy import Integer, BigInteger, String, DateTime, Text, Index, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import BaseDAO
+from app.db.database import Base
+from app.db.models.outbox import utc_now
+
+
+class DraftItem(Base):
+    """
+    Одно сообщение клиента в черновике проекта. Черновик только дописывается:
+    каждое сообщение — один INSERT, бриф собирается из строк при отправке.
+    """
+    __tablename__ = "draft_items"
+    __table_args__ = (
+        Index("ix_draft_items_user_id_id", "user_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)      # откуда копировать оригинал
+    message_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    text: Mapped[Optional[str]] = mapped_column(Text, nullable=True)        # текст или подпись
+    attachment: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # «Фото», «Документ: name», ...
+    # документ, из которого извлекается текст для брифа (PDF, DOCX, TXT), см. app.ingest
+    file_id: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    file_unique_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)             # символов, для лимита черновика
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
+
+
+class DraftHeader(Base):
+    """
+    Счётчики черновика пользователя: лимит проверяется и сдвигается одним UPDATE
+    этой строки, без подсчёта draft_items; строка же сериализует параллельные
+    вставки одного пользователя. updated_at — для удаления брошенных черновиков.
+    """
+    __tablename__ = "drafts"
+    __table_args__ = (
+        Index("ix_drafts_updated_at", "updated_at"),
+    )
+
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    items: Mapped[int] = mapped_column(Integer, nullable=False)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
+
+
+class DraftDAO(BaseDAO):
+    model = DraftItem
+
+    @classmethod
+    async def append(
+        cls,
+        session: AsyncSession,
+        *,
+        user_id: int,
+        chat_id: int,
+        message_id: int,
+        text_value: Optional[str],
+        attachment: Optional[str],
+        max_items: int,
+        max_size: int,
+        file_id: Optional[str] = None,
+        file_unique_id: Optional[str] = None,
+    ) -> Optional[dict[str, int]]:
+        """
+        Дописывает сообщение в черновик, если он не выйдет за лимиты.
+        Возвращает {"items": ..., "size": ...} черновика после вставки или None, если лимит превышен.
+        """
+        size = len(text_value or "") + len(attachment or "")
+        now = utc_now()
+        # счётчики сдвигаются только если лимит не превышен; строка заголовка заблокирована до commit
+        header_sql = text("""
+            INSERT INTO drafts (user_id, items, size, updated_at)
+            SELECT :user_id, 1, :size, :now
+            WHERE CAST(:size AS INTEGER) <= :max_size
+            ON CONFLICT (user_id) DO UPDATE
+            SET items = drafts.items + 1, size = drafts.size + EXCLUDED.size, updated_at = EXCLUDED.updated_at
+            WHERE drafts.items < :max_items AND drafts.size + EXCLUDED.size <= :max_size
+            RETURNING items, size
+        """)
+        row = (await session.execute(header_sql, {
+            "user_id": int(user_id), "size": size, "now": now,
+            "max_items": int(max_items), "max_size": int(max_size),
+        })).mappings().one_or_none()
+        if row is None:
+            await session.rollback()
+            return None
+        await session.execute(text("""
+            INSERT INTO draft_items (user_id, chat_id, message_id, text, attachment, file_id, file_unique_id,
+                                     size, created_at)
+            VALUES (:user_id, :chat_id, :message_id, :text, :attachment, :file_id, :file_unique_id, :size, :now)
+        """), {
+            "user_id": int(user_id), "chat_id": int(chat_id), "message_id": int(message_id),
+            "text": text_value, "attachment": attachment, "file_id": file_id, "file_unique_id": file_unique_id,
+            "size": size, "now": now,
+        })
+        await session.commit()
+        return dict(row)
+
+    @classmethod
+    async def items(cls, session: AsyncSession, user_id: int) -> List[Any]:
+        sql = text("""
+            SELECT chat_id, message_id, text, attachment, file_id, file_unique_id
+            FROM draft_items
+            WHERE user_id = :user_id
+            ORDER BY id
+        """)
+        return (await session.execute(sql, {"user_id": int(user_id)})).all()
+
+    @classmethod
+    async def clear(cls, session: AsyncSession, user_id: int) -> int:
+        await session.execute(text("DELETE FROM drafts WHERE user_id = :user_id"), {"user_id": int(user_id)})
+        res = await session.execute(text("DELETE FROM draft_items WHERE user_id = :user_id"), {"user_id": int(user_id)})
+        await session.commit()
+        return res.rowcount or 0
+
+    @classmethod
+    async def purge_abandoned(cls, session: AsyncSession, *, older_than: datetime) -> int:
+        """Черновики, которые не дописывали с older_than (FSM-состояние к этому времени тоже истекло)."""
+        sql = text("""
+            WITH gone AS (
+                DELETE FROM drafts WHERE updated_at < :older_than
+                RETURNING user_id
+            )
+            DELETE FROM draft_items WHERE user_id IN (SELECT user_id FROM gone)
+        """)
+        res = await session.execute(sql, {"older_than": older_than})
+        await session.commit()
+        return res.rowcount or 0
@@ -0,0 +1,102 @@
+from __future__ import annotations
+import json
+from datetime import datetime
+from typing import Optional, Any
+
+from sqlalchemy import String, DateTime, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import BaseDAO
+from app.db.database import Base
+from app.db.models.outbox import utc_now
+
+
+class FsmRecord(Base):
+    """
+    Состояние FSM aiogram (state + data) одного пользователя в одном чате.
+    Хранится в БД, поэтому черновики переживают рестарт и видны всем репликам бота.
+    """
+    __tablename__ = "fsm_state"
+    __table_args__ = (
+        Index("ix_fsm_state_expires_at", "expires_at"),
+    )
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)  # DefaultKeyBuilder: bot:chat:user:destiny
+    state: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    data: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class FsmStateDAO(BaseDAO):
+    model = FsmRecord
+
+    # Просроченная запись считается отсутствующей: при записи поверх неё старые
+    # state/data не подмешиваются.
+    _ALIVE = "fsm_state.expires_at > :now"
+
+    @classmethod
+    async def get_state(cls, session: AsyncSession, key: str) -> Optional[str]:
+        sql = text("SELECT state FROM fsm_state WHERE key = :key AND expires_at > :now")
+        return (await session.execute(sql, {"key": key, "now": utc_now()})).scalar_one_or_none()
+
+    @classmethod
+    async def get_data(cls, session: AsyncSession, key: str) -> dict[str, Any]:
+        sql = text("SELECT data FROM fsm_state WHERE key = :key AND expires_at > :now")
+        data = (await session.execute(sql, {"key": key, "now": utc_now()})).scalar_one_or_none()
+        return dict(data or {})
+
+    @classmethod
+    async def set_state(cls, session: AsyncSession, key: str, state: Optional[str], *, expires_at: datetime) -> None:
+        sql = text(f"""
+            INSERT INTO fsm_state (key, state, data, expires_at)
+            VALUES (:key, :state, '{{}}'::jsonb, :expires_at)
+            ON CONFLICT (key) DO UPDATE
+            SET state = EXCLUDED.state,
+                data = CASE WHEN {cls._ALIVE} THEN fsm_state.data ELSE '{{}}'::jsonb END,
+                expires_at = EXCLUDED.expires_at
+        """)
+        await session.execute(sql, {"key": key, "state": state, "expires_at": expires_at, "now": utc_now()})
+        await session.commit()
+
+    @classmethod
+    async def set_data(cls, session: AsyncSession, key: str, data: dict[str, Any], *, expires_at: datetime) -> None:
+        sql = text(f"""
+            INSERT INTO fsm_state (key, state, data, expires_at)
+            VALUES (:key, NULL, CAST(:data AS jsonb), :expires_at)
+            ON CONFLICT (key) DO UPDATE
+            SET state = CASE WHEN {cls._ALIVE} THEN fsm_state.state END,
+                data = EXCLUDED.data,
+                expires_at = EXCLUDED.expires_at
+        """)
+        params = {"key": key, "data": json.dumps(data, ensure_ascii=False), "expires_at": expires_at, "now": utc_now()}
+        await session.execute(sql, params)
+        await session.commit()
+
+    @classmethod
+    async def update_data(cls, session: AsyncSession, key: str, patch: dict[str, Any], *,
+                          expires_at: datetime) -> dict[str, Any]:
+        """
+        Атомарный dict.update: jsonb || patch одним UPSERT — параллельные обновления
+        разных ключей не затирают друг друга. Возвращает итоговые данные.
+        """
+        sql = text(f"""
+            INSERT INTO fsm_state (key, state, data, expires_at)
+            VALUES (:key, NULL, CAST(:patch AS jsonb), :expires_at)
+            ON CONFLICT (key) DO UPDATE
+            SET state = CASE WHEN {cls._ALIVE} THEN fsm_state.state END,
+                data = CASE WHEN {cls._ALIVE} THEN fsm_state.data ELSE '{{}}'::jsonb END || EXCLUDED.data,
+                expires_at = EXCLUDED.expires_at
+            RETURNING data
+        """)
+        params = {"key": key, "patch": json.dumps(patch, ensure_ascii=False), "expires_at": expires_at, "now": utc_now()}
+        data = (await session.execute(sql, params)).scalar_one()
+        await session.commit()
+        return dict(data)
+
+    @classmethod
+    async def purge_expired(cls, session: AsyncSession) -> int:
+        res = await session.execute(text("DELETE FROM fsm_state WHERE expires_at <= :now"), {"now": utc_now()})
+        await session.commit()
+        return res.rowcount or 0
@@ -0,0 +1,73 @@
+from __future__ import annotations
+from datetime import datetime
+from typing import Optional, Any
+
+from sqlalchemy import String, DateTime, Text, Index, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import BaseDAO
+from app.db.database import Base
+from app.db.models.outbox import utc_now
+
+
+class IdempotencyKey(Base):
+    """
+    Ключ идемпотентности действия (например, отправки проекта): пока действие
+    выполняется — короткая блокировка (pending), после — кэш результата (done).
+    В БД, чтобы повторы, пришедшие на другую реплику бота, тоже отсекались.
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    status: Mapped[str] = mapped_column(String(16), nullable=False)  # pending | done
+    result: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class IdempotencyDAO(BaseDAO):
+    model = IdempotencyKey
+
+    @classmethod
+    async def acquire(cls, session: AsyncSession, key: str, *, expires_at: datetime) -> bool:
+        """Берёт блокировку ключа. False — ключ уже занят (действие выполняется или выполнено)."""
+        sql = text("""
+            INSERT INTO idempotency_keys (key, status, result, expires_at)
+            VALUES (:key, 'pending', NULL, :expires_at)
+            ON CONFLICT (key) DO UPDATE
+            SET status = 'pending', result = NULL, expires_at = EXCLUDED.expires_at
+            WHERE idempotency_keys.expires_at <= :now
+            RETURNING key
+        """)
+        row = (await session.execute(sql, {"key": key, "expires_at": expires_at, "now": utc_now()})).first()
+        await session.commit()
+        return row is not None
+
+    @classmethod
+    async def get(cls, session: AsyncSession, key: str) -> Optional[Any]:
+        sql = text("SELECT status, result FROM idempotency_keys WHERE key = :key AND expires_at > :now")
+        return (await session.execute(sql, {"key": key, "now": utc_now()})).first()
+
+    @classmethod
+    async def complete(cls, session: AsyncSession, key: str, *, result: str, expires_at: datetime) -> None:
+        sql = text("""
+            UPDATE idempotency_keys SET status = 'done', result = :result, expires_at = :expires_at
+            WHERE key = :key
+        """)
+        await session.execute(sql, {"key": key, "result": result, "expires_at": expires_at})
+        await session.commit()
+
+    @classmethod
+    async def release(cls, session: AsyncSession, key: str) -> None:
+        await session.execute(text("DELETE FROM idempotency_keys WHERE key = :key AND status = 'pending'"),
+                              {"key": key})
+        await session.commit()
+
+    @classmethod
+    async def purge_expired(cls, session: AsyncSession) -> int:
+        res = await session.execute(text("DELETE FROM idempotency_keys WHERE expires_at <= :now"), {"now": utc_now()})
+        await session.commit()
+        return res.rowcount or 0
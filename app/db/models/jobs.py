@@ -0,0 +1,234 @@
+from __future__ import annotations
+from datetime import datetime
+import enum
+from typing import Optional, List, Any
+
+from sqlalchemy import String, Integer, DateTime, Text, Index, text, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import BaseDAO
+from app.db.database import Base
+from app.db.models.outbox import utc_now
+
+
+class JobStatus(str, enum.Enum):
+    queued = "queued"
+    running = "running"   # взята воркером, lease_until продлевается heartbeat'ом
+    done = "done"
+    failed = "failed"     # исчерпаны попытки
+
+
+class JobRecord(Base):
+    """Фоновая задача (генерация проекта и т.п.) в общей очереди для воркеров `python -m app.worker`."""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_kind_status_run_after", "kind", "status", "run_after"),
+        Index("ix_jobs_status_lease_until", "status", "lease_until"),
+        # одна активная задача на key (повторное «Продолжить» не запускает проект второй раз)
+        Index("uq_jobs_active_key", "key", unique=True,
+              postgresql_where=text("status IN ('queued', 'running')")),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(64), nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)  # JSON
+    key: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
+    status: Mapped[str] = mapped_column(String(16), default=JobStatus.queued.value, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=3, nullable=False)
+    run_after: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
+
+    locked_by: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)  # id воркера
+    lease_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    result: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class JobDAO(BaseDAO):
+    model = JobRecord
+
+    @classmethod
+    async def enqueue(cls, session: AsyncSession, *, kind: str, payload: str, max_attempts: int,
+                      key: Optional[str] = None) -> Optional[tuple[int, int]]:
+        """
+        Ставит задачу в очередь. Возвращает (id, сколько задач этого типа впереди);
+        None — задача с тем же key уже queued/running.
+        """
+        sql = text("""
+            INSERT INTO jobs (kind, key, payload, status, attempts, max_attempts, run_after, created_at)
+            VALUES (:kind, :key, :payload, 'queued', 0, :max_attempts, :now, :now)
+            ON CONFLICT (key) WHERE status IN ('queued', 'running') DO NOTHING
+            RETURNING id
+        """)
+        job_id = (await session.execute(sql, {
+            "kind": kind, "key": key, "payload": payload, "max_attempts": int(max_attempts), "now": utc_now(),
+        })).scalar_one_or_none()
+        if job_id is None:
+            await session.rollback()
+            return None
+        ahead_sql = text("""
+            SELECT COUNT(*) FROM jobs
+            WHERE kind = :kind AND status IN ('queued', 'running') AND id < :id
+        """)
+        ahead = (await session.execute(ahead_sql, {"kind": kind, "id": job_id})).scalar_one()
+        await session.commit()
+        return job_id, int(ahead)
+
+    @classmethod
+    async def count_queued(cls, session: AsyncSession) -> int:
+        return int((await session.execute(text("SELECT COUNT(*) FROM jobs WHERE status = 'queued'"))).scalar_one())
+
+    @classmethod
+    async def queued(cls, session: AsyncSession, *, kind: str, limit: int) -> List[Any]:
+        """Ожидающие задачи типа kind в порядке очереди — для мест в очереди."""
+        sql = text("""
+            SELECT id, payload FROM jobs
+            WHERE kind = :kind AND status = 'queued'
+            ORDER BY id
+            LIMIT :n
+        """)
+        return (await session.execute(sql, {"kind": kind, "n": int(limit)})).all()
+
+    @classmethod
+    async def average_duration(cls, session: AsyncSession, *, kind: str, sample: int = 50) -> Optional[float]:
+        """Средняя длительность последних sample выполненных задач типа kind, сек; None — статистики нет."""
+        sql = text("""
+            SELECT AVG(EXTRACT(EPOCH FROM (finished_at - started_at))) FROM (
+                SELECT started_at, finished_at FROM jobs
+                WHERE kind = :kind AND status = 'done' AND started_at IS NOT NULL
+                ORDER BY finished_at DESC
+                LIMIT :n
+            ) AS recent
+        """)
+        value = (await session.execute(sql, {"kind": kind, "n": int(sample)})).scalar_one_or_none()
+        return float(value) if value is not None else None
+
+    @classmethod
+    async def claim(
+        cls,
+        session: AsyncSession,
+        *,
+        kind: str,
+        worker_id: str,
+        limit: int,
+        cap: int,
+        lease_until: datetime,
+    ) -> List[Any]:
+        """
+        Берёт до limit готовых задач типа kind (status -> running), не превышая cap
+        одновременно выполняемых задач этого типа по всем воркерам.
+        Подсчёт running и захват идут под advisory-локом типа; сами строки —
+        FOR UPDATE SKIP LOCKED, так что воркеры не ждут друг друга.
+        """
+        await session.execute(text("SELECT pg_advisory_xact_lock(hashtext(:lock))"), {"lock": f"jobs:{kind}"})
+        running = (await session.execute(
+            text("SELECT COUNT(*) FROM jobs WHERE kind = :kind AND status = 'running'"), {"kind": kind},
+        )).scalar_one()
+        n = min(int(limit), int(cap) - int(running))
+        if n <= 0:
+            await session.commit()
+            return []
+        sql = text("""
+            UPDATE jobs
+            SET status = 'running', locked_by = :worker_id, lease_until = :lease_until,
+                attempts = attempts + 1, started_at = :now
+            WHERE id IN (
+                SELECT id FROM jobs
+                WHERE kind = :kind AND status = 'queued' AND run_after <= :now
+                ORDER BY id
+                LIMIT :n
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, kind, payload, attempts, max_attempts
+        """)
+        rows = (await session.execute(sql, {
+            "kind": kind, "worker_id": worker_id, "lease_until": lease_until, "now": utc_now(), "n": n,
+        })).all()
+        await session.commit()
+        return sorted(rows, key=lambda r: r.id)
+
+    @classmethod
+    async def heartbeat(cls, session: AsyncSession, job_ids: List[int], *, worker_id: str,
+                        lease_until: datetime) -> None:
+        if not job_ids:
+            return
+        sql = text("""
+            UPDATE jobs SET lease_until = :lease_until
+            WHERE id IN :ids AND locked_by = :worker_id AND status = 'running'
+        """).bindparams(bindparam("ids", expanding=True))
+        await session.execute(sql, {"ids": [int(i) for i in job_ids], "worker_id": worker_id,
+                                    "lease_until": lease_until})
+        await session.commit()
+
+    @classmethod
+    async def complete(cls, session: AsyncSession, job_id: int, *, worker_id: str, result: Optional[str]) -> bool:
+        """False — задачу уже забрали у этого воркера (lease истёк), результат не записан."""
+        sql = text("""
+            UPDATE jobs
+            SET status = 'done', result = :result, finished_at = :now, locked_by = NULL, lease_until = NULL
+            WHERE id = :id AND locked_by = :worker_id AND status = 'running'
+        """)
+        res = await session.execute(sql, {"id": int(job_id), "worker_id": worker_id, "result": result,
+                                          "now": utc_now()})
+        await session.commit()
+        return bool(res.rowcount)
+
+    @classmethod
+    async def fail(cls, session: AsyncSession, job_id: int, *, worker_id: str, error: str,
+                   retry_at: Optional[datetime]) -> None:
+        """retry_at=None — попытки кончились, задача failed."""
+        sql = text("""
+            UPDATE jobs
+            SET status = CASE WHEN CAST(:retry_at AS TIMESTAMPTZ) IS NULL THEN 'failed' ELSE 'queued' END,
+                run_after = COALESCE(CAST(:retry_at AS TIMESTAMPTZ), run_after),
+                finished_at = CASE WHEN CAST(:retry_at AS TIMESTAMPTZ) IS NULL THEN :now END,
+                last_error = :error, locked_by = NULL, lease_until = NULL
+            WHERE id = :id AND locked_by = :worker_id AND status = 'running'
+        """)
+        await session.execute(sql, {"id": int(job_id), "worker_id": worker_id, "error": error[:2000],
+                                    "retry_at": retry_at, "now": utc_now()})
+        await session.commit()
+
+    @classmethod
+    async def release(cls, session: AsyncSession, job_ids: List[int], *, worker_id: str) -> None:
+        """Воркер останавливается: вернуть задачи в очередь без траты попытки."""
+        if not job_ids:
+            return
+        sql = text("""
+            UPDATE jobs
+            SET status = 'queued', attempts = attempts - 1, locked_by = NULL, lease_until = NULL
+            WHERE id IN :ids AND locked_by = :worker_id AND status = 'running'
+        """).bindparams(bindparam("ids", expanding=True))
+        await session.execute(sql, {"ids": [int(i) for i in job_ids], "worker_id": worker_id})
+        await session.commit()
+
+    @classmethod
+    async def requeue_expired(cls, session: AsyncSession) -> List[Any]:
+        """Задачи упавших воркеров (lease истёк): снова в очередь или failed, если попытки кончились."""
+        sql = text("""
+            UPDATE jobs
+            SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                finished_at = CASE WHEN attempts >= max_attempts THEN :now END,
+                last_error = 'lease expired (worker ' || COALESCE(locked_by, '?') || ')',
+                locked_by = NULL, lease_until = NULL
+            WHERE status = 'running' AND lease_until < :now
+            RETURNING id, kind, status
+        """)
+        rows = (await session.execute(sql, {"now": utc_now()})).all()
+        await session.commit()
+        return rows
+
+    @classmethod
+    async def purge_finished(cls, session: AsyncSession, *, older_than: datetime) -> int:
+        res = await session.execute(
+            text("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < :older_than"),
+            {"older_than": older_than},
+        )
+        await session.commit()
+        return res.rowcount or 0
@@ -0,0 +1,212 @@
+from __future__ import annotations
+from datetime import datetime, timezone
+import enum
+from typing import Optional, List, Any
+
+from sqlalchemy import String, Integer, DateTime, BigInteger, Text, LargeBinary, Index, text, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import BaseDAO
+from app.db.database import Base
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class OutboxStatus(str, enum.Enum):
+    pending = "pending"   # ждёт отправки (в т.ч. повторной после ошибки)
+    sending = "sending"   # взято воркером (locked_by) до lease_until
+    sent = "sent"
+    dead = "dead"         # постоянная ошибка или исчерпаны попытки
+
+
+class OutboxMessage(Base):
+    """
+    Исходящее сообщение бота. Пишется в БД до отправки, поэтому переживает
+    429/сетевые ошибки и рестарт процесса.
+    """
+    __tablename__ = "outbox"
+    __table_args__ = (
+        Index("ix_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+        Index("ix_outbox_chat_id", "chat_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    idempotency_key: Mapped[str] = mapped_column(String(128), unique=True, nullable=False)
+    chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    method: Mapped[str] = mapped_column(String(16), nullable=False)  # "message" | "document" | "copy"
+    payload: Mapped[str] = mapped_column(Text, nullable=False)       # JSON с аргументами метода Bot API
+    document: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)  # содержимое файла до отправки
+
+    status: Mapped[str] = mapped_column(String(16), default=OutboxStatus.pending.value, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    locked_by: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)  # id воркера (реплики бота)
+    lease_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
+    sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class OutboxDAO(BaseDAO):
+    model = OutboxMessage
+
+    @classmethod
+    async def enqueue_many(cls, session: AsyncSession, items: List[dict[str, Any]]) -> int:
+        """
+        Кладёт сообщения в очередь одной транзакцией.
+        Дубли по idempotency_key молча пропускаются. Возвращает число реально добавленных.
+        """
+        sql = text("""
+            INSERT INTO outbox (idempotency_key, chat_id, method, payload, document,
+                                status, attempts, next_attempt_at, created_at)
+            VALUES (:idempotency_key, :chat_id, :method, :payload, :document,
+                    'pending', 0, :now, :now)
+            ON CONFLICT (idempotency_key) DO NOTHING
+        """)
+        now = utc_now()
+        added = 0
+        for item in items:
+            res = await session.execute(sql, {**item, "now": now})
+            added += res.rowcount or 0
+        await session.commit()
+        return added
+
+    @classmethod
+    async def claim_due(cls, session: AsyncSession, *, worker_id: str, limit: int,
+                        lease_until: datetime) -> List[Any]:
+        """
+        Забирает готовые к отправке сообщения (status -> sending, locked_by = worker_id), по порядку id.
+        Чат пропускается целиком, пока в нём что-то в отправке или более раннее
+        сообщение ждёт повтора — так порядок внутри чата не ломается.
+        Захват идёт под общим advisory-локом: NOT EXISTS видит то, что только что
+        взяли другие реплики, и один чат не отправляется двумя репликами сразу.
+        """
+        await session.execute(text("SELECT pg_advisory_xact_lock(hashtext('outbox:claim'))"))
+        sql = text("""
+            UPDATE outbox
+            SET status = 'sending', locked_by = :worker_id, lease_until = :lease_until
+            WHERE id IN (
+                SELECT o.id
+                FROM outbox o
+                WHERE o.status = 'pending'
+                  AND o.next_attempt_at <= :now
+                  AND NOT EXISTS (
+                      SELECT 1 FROM outbox p
+                      WHERE p.chat_id = o.chat_id
+                        AND (p.status = 'sending'
+                             OR (p.status = 'pending' AND p.id < o.id AND p.next_attempt_at > :now))
+                  )
+                ORDER BY o.id
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, chat_id, method, payload, document, attempts, created_at
+        """).columns(created_at=DateTime(timezone=True))
+        rows = (await session.execute(sql, {
+            "worker_id": worker_id, "lease_until": lease_until, "now": utc_now(), "limit": int(limit),
+        })).all()
+        await session.commit()
+        return sorted(rows, key=lambda r: r.id)
+
+    @classmethod
+    async def mark_sent(cls, session: AsyncSession, message_id: int, *, worker_id: str) -> None:
+        sql = text("""
+            UPDATE outbox
+            SET status = 'sent', sent_at = :now, attempts = attempts + 1, document = NULL, last_error = NULL,
+                locked_by = NULL, lease_until = NULL
+            WHERE id = :id AND locked_by = :worker_id
+        """)
+        await session.execute(sql, {"id": int(message_id), "worker_id": worker_id, "now": utc_now()})
+        await session.commit()
+
+    @classmethod
+    async def reschedule(cls, session: AsyncSession, message_id: int, *, worker_id: str,
+                         next_attempt_at: datetime, error: str) -> None:
+        sql = text("""
+            UPDATE outbox
+            SET status = 'pending', attempts = attempts + 1, next_attempt_at = :next_attempt_at, last_error = :error,
+                locked_by = NULL, lease_until = NULL
+            WHERE id = :id AND locked_by = :worker_id
+        """)
+        await session.execute(sql, {"id": int(message_id), "worker_id": worker_id,
+                                    "next_attempt_at": next_attempt_at, "error": error[:2000]})
+        await session.commit()
+
+    @classmethod
+    async def release(cls, session: AsyncSession, message_ids: List[int], *, worker_id: str) -> None:
+        """Вернуть взятые, но не отправленные сообщения в очередь без траты попытки."""
+        if not message_ids:
+            return
+        sql = text("""
+            UPDATE outbox SET status = 'pending', locked_by = NULL, lease_until = NULL
+            WHERE id IN :ids AND locked_by = :worker_id AND status = 'sending'
+        """).bindparams(bindparam("ids", expanding=True))
+        await session.execute(sql, {"ids": [int(i) for i in message_ids], "worker_id": worker_id})
+        await session.commit()
+
+    @classmethod
+    async def release_worker(cls, session: AsyncSession, *, worker_id: str) -> int:
+        """Воркер останавливается: всё, что он взял и не отправил, — снова в очередь."""
+        res = await session.execute(text("""
+            UPDATE outbox SET status = 'pending', locked_by = NULL, lease_until = NULL
+            WHERE locked_by = :worker_id AND status = 'sending'
+        """), {"worker_id": worker_id})
+        await session.commit()
+        return res.rowcount or 0
+
+    @classmethod
+    async def mark_dead(cls, session: AsyncSession, message_id: int, *, worker_id: str, error: str) -> None:
+        sql = text("""
+            UPDATE outbox
+            SET status = 'dead', attempts = attempts + 1, last_error = :error, locked_by = NULL, lease_until = NULL
+            WHERE id = :id AND locked_by = :worker_id
+        """)
+        await session.execute(sql, {"id": int(message_id), "worker_id": worker_id, "error": error[:2000]})
+        await session.commit()
+
+    @classmethod
+    async def heartbeat(cls, session: AsyncSession, *, worker_id: str, lease_until: datetime) -> None:
+        await session.execute(text("""
+            UPDATE outbox SET lease_until = :lease_until
+            WHERE locked_by = :worker_id AND status = 'sending'
+        """), {"worker_id": worker_id, "lease_until": lease_until})
+        await session.commit()
+
+    @classmethod
+    async def requeue_expired(cls, session: AsyncSession) -> int:
+        """Сообщения упавших реплик (lease истёк или не задан — взяты до появления lease) — снова в очередь."""
+        res = await session.execute(text("""
+            UPDATE outbox SET status = 'pending', locked_by = NULL, lease_until = NULL
+            WHERE status = 'sending' AND (lease_until IS NULL OR lease_until < :now)
+        """), {"now": utc_now()})
+        await session.commit()
+        return res.rowcount or 0
+
+    @classmethod
+    async def purge_sent(cls, session: AsyncSession, *, older_than: datetime) -> int:
+        res = await session.execute(
+            text("DELETE FROM outbox WHERE status = 'sent' AND sent_at < :older_than"),
+            {"older_than": older_than},
+        )
+        await session.commit()
+        return res.rowcount or 0
+
+    @classmethod
+    async def stats(cls, session: AsyncSession) -> dict[str, Any]:
+        """Глубина очереди по статусам и возраст самого старого неотправленного сообщения."""
+        sql = text("""
+            SELECT
+                COUNT(*) FILTER (WHERE status = 'pending') AS pending,
+                COUNT(*) FILTER (WHERE status = 'sending') AS sending,
+                COUNT(*) FILTER (WHERE status = 'dead') AS dead,
+                MIN(created_at) FILTER (WHERE status IN ('pending', 'sending')) AS oldest
+            FROM outbox
+        """).columns(oldest=DateTime(timezone=True))
+        row = (await session.execute(sql)).mappings().one()
+        return dict(row)
+
@@ -0,0 +1,74 @@
+from __future__ import annotations
+import enum
+from typing import Iterable, List, Any
+
+from sqlalchemy import BigInteger, String, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import BaseDAO
+from app.db.database import Base
+
+# канал Postgres NOTIFY: реплики бота перечитывают роли при изменении
+ROLES_CHANNEL = "user_roles_changed"
+
+
+class Role(str, enum.Enum):
+    admin = "admin"                        # доступ к боту, КП, выгрузкам
+    business_partner = "business_partner"  # одобряет/отменяет/перегенерирует пост
+    team_partner = "team_partner"
+
+
+class UserRole(Base):
+    """Роль пользователя (Telegram id). Пользователь может иметь несколько ролей."""
+    __tablename__ = "user_roles"
+
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    role: Mapped[str] = mapped_column(String(32), primary_key=True)
+
+
+class RoleDAO(BaseDAO):
+    model = UserRole
+
+    @classmethod
+    async def all(cls, session: AsyncSession) -> List[Any]:
+        return (await session.execute(text("SELECT user_id, role FROM user_roles"))).all()
+
+    @classmethod
+    async def _notify(cls, session: AsyncSession) -> None:
+        # уходит подписчикам при COMMIT
+        if session.bind.dialect.name == "postgresql":
+            await session.execute(text("SELECT pg_notify(:channel, '')"), {"channel": ROLES_CHANNEL})
+
+    @classmethod
+    async def grant(cls, session: AsyncSession, user_id: int, role: Role) -> bool:
+        sql = text("""
+            INSERT INTO user_roles (user_id, role) VALUES (:user_id, :role)
+            ON CONFLICT (user_id, role) DO NOTHING
+        """)
+        res = await session.execute(sql, {"user_id": int(user_id), "role": role.value})
+        await cls._notify(session)
+        await session.commit()
+        return bool(res.rowcount)
+
+    @classmethod
+    async def revoke(cls, session: AsyncSession, user_id: int, role: Role) -> bool:
+        res = await session.execute(text("DELETE FROM user_roles WHERE user_id = :user_id AND role = :role"),
+                                    {"user_id": int(user_id), "role": role.value})
+        await cls._notify(session)
+        await session.commit()
+        return bool(res.rowcount)
+
+    @classmethod
+    async def seed_if_empty(cls, session: AsyncSession, pairs: Iterable[tuple[int, Role]]) -> int:
+        """Первый запуск: переносит роли из настроек (ADMIN_IDS, *_PARTNER_ID). Потом таблица — источник истины."""
+        if (await session.execute(text("SELECT 1 FROM user_roles LIMIT 1"))).first():
+            return 0
+        rows = [{"user_id": int(user_id), "role": role.value} for user_id, role in set(pairs)]
+        if rows:
+            await session.execute(text("""
+                INSERT INTO user_roles (user_id, role) VALUES (:user_id, :role)
+                ON CONFLICT (user_id, role) DO NOTHING
+            """), rows)
+        await session.commit()
+        return len(rows)
@@ -1,13 +1,16 @@
 from __future__ import annotations
 from datetime import datetime, timezone
 import enum
-from typing import Optional, List
+import os
+from typing import Optional, List, AsyncIterator
 
-from select import select
-from sqlalchemy import String, Integer, DateTime, Enum as SAEnum, func, desc, literal_column, text, BigInteger, Text
+from sqlalchemy import select, String, Integer, DateTime, Enum as SAEnum, func, desc, literal_column, text, BigInteger, Text, \
+    LargeBinary
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column
 
+from app.chat_gpt import kp_document
+from app.chat_gpt.kp_document import KPDocument
 from app.chat_gpt.prompts import ProjectType
 from app.db.database import Base
 from app.db.base import BaseDAO
@@ -58,6 +61,22 @@ class Task(Base):
 
     project_type: Mapped[ProjectType] = mapped_column(String(50), default=ProjectType.MINI_APP.value)
 
+    # КП в промежуточном формате (app.chat_gpt.kp_document.dumps) — для повторной выгрузки без GPT
+    kp_doc: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+
+    # Чекпоинты генерации (app.jobs.project): артефакт каждого этапа сохраняется сразу,
+    # «Продолжить» начинает с первого незавершённого без повторных вызовов GPT
+    source_messages: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON [[chat_id, message_id]]
+    # документы черновика, чей текст ещё не дописан в brief_text: JSON [[file_id, file_unique_id, подпись]];
+    # None — этап «документы» пройден (или документов нет)
+    attachments: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    tg_post: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    kp_file: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)  # отрендеренный DOCX
+    kp_filename: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    # материалы без КП уже разосланы (КП не готово) — «Продолжить» дошлёт только КП
+    materials_sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    dispatched_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=moscow_now, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=moscow_now,
                                                  onupdate=moscow_now, nullable=False)
@@ -115,4 +134,51 @@ class TaskDAO(BaseDAO):
                WHERE id = :id
            """)
         row = (await session.execute(sql, {"id": int(task_id)})).mappings().first()
-        return TaskOut.from_mapping(row) if row else None
\ No newline at end of file
+        return TaskOut.from_mapping(row) if row else None
+
+    # --- КП в промежуточном формате ---
+    @classmethod
+    async def save_kp_document(cls, session: AsyncSession, task_id: int, kp_doc: KPDocument) -> None:
+        await cls.update(session, {"id": task_id}, kp_doc=kp_document.dumps(kp_doc))
+
+    @classmethod
+    async def get_kp_document(cls, session: AsyncSession, task_id: int) -> Optional[KPDocument]:
+        sql = text("SELECT kp_doc FROM tasks WHERE id = :id")
+        raw = (await session.execute(sql, {"id": int(task_id)})).scalar_one_or_none()
+        return kp_document.loads(raw) if raw else None
+
+    @classmethod
+    async def save_kp_file(cls, session: AsyncSession, task_id: int, kp_filepath: str) -> None:
+        """Отрендеренный файл КП — чекпоинт этапа рендера: рассылка берёт его отсюда."""
+        with open(kp_filepath, "rb") as f:
+            content = f.read()
+        await cls.update(session, {"id": task_id}, kp_file=content, kp_filename=os.path.basename(kp_filepath))
+
+    # --- Выгрузка: серверный курсор, строки идут пачками по yield_per ---
+    @classmethod
+    async def stream_for_export(
+        cls,
+        session: AsyncSession,
+        *,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        status: Optional[str] = None,
+        project_type: Optional[str] = None,
+        yield_per: int = 100,
+    ) -> AsyncIterator:
+        query = select(
+            Task.id, Task.title, Task.status, Task.project_type, Task.created_by,
+            Task.created_at, Task.brief_text, Task.kp_doc,
+        ).order_by(Task.created_at, Task.id)
+        if date_from is not None:
+            query = query.where(Task.created_at >= date_from)
+        if date_to is not None:
+            query = query.where(Task.created_at < date_to)
+        if status is not None:
+            query = query.where(Task.status == status)
+        if project_type is not None:
+            query = query.where(Task.project_type == project_type)
+
+        result = await session.stream(query.execution_options(yield_per=yield_per))
+        async for row in result:
+            yield row
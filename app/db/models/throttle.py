@@ -0,0 +1,68 @@
+from __future__ import annotations
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import BigInteger, DateTime, Float, Integer, String, Index, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import BaseDAO
+from app.db.database import Base
+from app.db.models.outbox import utc_now
+
+
+class ThrottleBucket(Base):
+    """
+    Ведро токенов ThrottlingMiddleware (пользователь, действие) — общее для всех
+    реплик бота, иначе за N репликами пользователь получает N-кратный лимит.
+    """
+    __tablename__ = "throttle_buckets"
+    __table_args__ = (
+        Index("ix_throttle_buckets_updated_at", "updated_at"),
+    )
+
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    action: Mapped[str] = mapped_column(String(64), primary_key=True)
+    tokens: Mapped[float] = mapped_column(Float, nullable=False)
+    rejected: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # отказов подряд
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
+
+
+class Take(NamedTuple):
+    tokens: float   # остаток после попытки
+    rejected: int   # 0 — токен взят, иначе номер отказа в серии
+
+
+# запас на момент now() — по часам БД, одинаковым для всех реплик
+_REFILL = ("LEAST(CAST(:capacity AS DOUBLE PRECISION), b.tokens + "
+           "CAST(EXTRACT(EPOCH FROM (now() - b.updated_at)) AS DOUBLE PRECISION) * CAST(:rate AS DOUBLE PRECISION))")
+
+
+class ThrottleBucketDAO(BaseDAO):
+    model = ThrottleBucket
+
+    @classmethod
+    async def take(cls, session: AsyncSession, *, user_id: int, action: str, capacity: int, rate: float) -> Take:
+        """Пополняет ведро и берёт токен одним UPDATE — параллельные реплики не обгоняют друг друга."""
+        sql = text(f"""
+            INSERT INTO throttle_buckets AS b (user_id, action, tokens, rejected, updated_at)
+            VALUES (:user_id, :action, CAST(:capacity AS DOUBLE PRECISION) - 1, 0, now())
+            ON CONFLICT (user_id, action) DO UPDATE
+            SET tokens = CASE WHEN {_REFILL} >= 1 THEN {_REFILL} - 1 ELSE {_REFILL} END,
+                rejected = CASE WHEN {_REFILL} >= 1 THEN 0 ELSE b.rejected + 1 END,
+                updated_at = now()
+            RETURNING tokens, rejected
+        """)
+        row = (await session.execute(sql, {
+            "user_id": int(user_id), "action": action, "capacity": int(capacity), "rate": float(rate),
+        })).one()
+        await session.commit()
+        return Take(float(row.tokens), int(row.rejected))
+
+    @classmethod
+    async def purge_full(cls, session: AsyncSession, *, older_than: datetime) -> int:
+        """Вёдра, которые не трогали дольше самого длинного периода, уже полны — они не нужны."""
+        res = await session.execute(text("DELETE FROM throttle_buckets WHERE updated_at < :older_than"),
+                                    {"older_than": older_than})
+        await session.commit()
+        return res.rowcount or 0
@@ -0,0 +1,164 @@
+# app/export/zip_export.py
+"""
+Выгрузка КП и брифов за период одним ZIP-архивом.
+
+- задачи читаются серверным курсором (TaskDAO.stream_for_export) пачками;
+- КП рендерится из сохранённого KPDocument (tasks.kp_doc) — GPT не вызывается;
+- рендер идёт в пуле процессов, но в работе одновременно не больше `window` задач,
+  поэтому память ограничена независимо от числа проектов;
+- архив пишется на диск по мере готовности записей, manifest.csv — в конце.
+"""
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from loguru import logger
+
+from app.chat_gpt import kp_document
+from app.chat_gpt.kp_render import render_kp
+from app.db.database import async_session_maker
+from app.db.models.tasks import TaskDAO
+
+MANIFEST_FIELDS = ("id", "title", "status", "project_type", "created_by", "created_at", "brief_file", "kp_file")
+
+
+@dataclass(slots=True)
+class ExportFilter:
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    status: Optional[str] = None
+    project_type: Optional[str] = None
+    fmt: str = "docx"
+
+
+@dataclass(slots=True)
+class ExportResult:
+    path: str
+    projects: int
+    kp_files: int
+    size_bytes: int
+
+
+def render_kp_bytes(kp_raw: bytes, fmt: str) -> bytes:
+    """Воркер пула процессов: сжатый KPDocument -> байты файла нужного формата."""
+    fd, tmp_path = tempfile.mkstemp(suffix=f".{fmt}")
+    os.close(fd)
+    try:
+        render_kp(kp_document.loads(kp_raw), fmt, tmp_path)
+        with open(tmp_path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(tmp_path)
+
+
+def _slug(title: str, limit: int = 40) -> str:
+    slug = re.sub(r"[^\w\-]+", "_", title or "", flags=re.UNICODE).strip("_")
+    return slug[:limit] or "project"
+
+
+async def export_projects_zip(
+        flt: ExportFilter,
+        *,
+        workers: Optional[int] = None,
+        window: Optional[int] = None,
+        directory: Optional[str] = None,
+        prefix: str = "kp_export_",
+) -> ExportResult:
+    """directory/prefix — где и с каким именем создать архив (например, на томе локального Bot API)."""
+    workers = workers or os.cpu_count() or 1
+    window = window or workers * 2
+
+    fd, zip_path = tempfile.mkstemp(prefix=prefix, suffix=".zip", dir=directory)
+    os.close(fd)
+    # манифест копится во временном файле, а не в памяти
+    manifest_raw = tempfile.TemporaryFile()
+    manifest = io.TextIOWrapper(manifest_raw, encoding="utf-8-sig", newline="")
+    writer = csv.DictWriter(manifest, fieldnames=MANIFEST_FIELDS)
+    writer.writeheader()
+
+    projects = kp_files = 0
+    loop = asyncio.get_running_loop()
+    pending: dict[asyncio.Future, tuple[str, dict]] = {}
+
+    async def write_entry(zf: zipfile.ZipFile, name: str, data: bytes | str) -> None:
+        await asyncio.to_thread(zf.writestr, name, data)
+
+    async def flush_one(zf: zipfile.ZipFile) -> None:
+        nonlocal kp_files
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for fut in done:
+            name, row = pending.pop(fut)
+            try:
+                await write_entry(zf, name, fut.result())
+                kp_files += 1
+            except Exception as e:
+                logger.exception("Export: KP render failed for task {}: {}", row["id"], e)
+                row["kp_file"] = ""
+            writer.writerow(row)
+
+    try:
+        # spawn: к этому моменту в процессе уже есть потоки (драйвер БД, to_thread), fork с ними небезопасен
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool, \
+                zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            async with async_session_maker() as session:
+                async for task in TaskDAO.stream_for_export(
+                    session,
+                    date_from=flt.date_from,
+                    date_to=flt.date_to,
+                    status=flt.status,
+                    project_type=flt.project_type,
+                ):
+                    projects += 1
+                    folder = f"{task.id:05d}_{_slug(task.title)}"
+                    row = {
+                        "id": task.id,
+                        "title": task.title,
+                        "status": task.status,
+                        "project_type": task.project_type,
+                        "created_by": task.created_by or "",
+                        "created_at": task.created_at.isoformat() if task.created_at else "",
+                        "brief_file": "",
+                        "kp_file": "",
+                    }
+                    if task.brief_text:
+                        row["brief_file"] = f"{folder}/brief.txt"
+                        await write_entry(zf, row["brief_file"], task.brief_text)
+
+                    if not task.kp_doc:
+                        writer.writerow(row)
+                        continue
+
+                    row["kp_file"] = f"{folder}/kp.{flt.fmt}"
+                    fut = loop.run_in_executor(pool, render_kp_bytes, task.kp_doc, flt.fmt)
+                    pending[fut] = (row["kp_file"], row)
+                    while len(pending) >= window:
+                        await flush_one(zf)
+
+            while pending:
+                await flush_one(zf)
+
+            manifest.flush()
+            manifest_raw.seek(0)
+            with zf.open("manifest.csv", "w") as dst:
+                await asyncio.to_thread(shutil.copyfileobj, manifest_raw, dst)
+    except BaseException:
+        os.remove(zip_path)
+        raise
+    finally:
+        manifest.close()
+
+    size = os.path.getsize(zip_path)
+    logger.info("Export done: {} projects, {} KP files, {} bytes -> {}", projects, kp_files, size, zip_path)
+    return ExportResult(path=zip_path, projects=projects, kp_files=kp_files, size_bytes=size)
@@ -0,0 +1,198 @@
+# app/ingest/attachments.py
+"""
+Текст документов клиента (PDF, DOCX, TXT) для брифа.
+
+Разбор начинается, как только документ попал в черновик (submit), — к нажатию
+«Отправить проект» текст обычно уже в кэше, и collect только дожидается
+оставшегося (не дольше INGEST_WAIT_SECONDS).
+
+- файл скачивается потоком во временный файл (в local-режиме Bot API читается
+  прямо с общего тома), в память целиком не загружается;
+- разбор — в отдельном пуле потоков (INGEST_WORKERS), цикл событий не блокируется;
+- результат кэшируется в attachment_texts по file_unique_id, включая «не читается»;
+  сетевые ошибки не кэшируются — при отправке проекта файл скачается снова.
+
+Ждёт collect задача generate_project (этап «документы»), а не хендлер
+«Отправить проект»: хендлер отвечает сразу.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Iterable, NamedTuple, Optional
+
+from aiogram import Bot
+from aiogram.types import Message
+from loguru import logger
+
+from app.bot.telegram_api import local_file_path
+from app.config import settings
+from app.db.database import async_session_maker
+from app.db.models.attachments import AttachmentTextDAO
+from app.ingest.extract import ExtractionError, detect_kind, extract_text
+
+DOWNLOAD_TIMEOUT_SECONDS = 120
+
+
+class AttachmentRef(NamedTuple):
+    file_id: str
+    file_unique_id: str
+    file_name: Optional[str]  # None — тип файла определится по File.file_path
+
+    @property
+    def label(self) -> str:
+        return self.file_name or self.file_unique_id
+
+
+def document_ref(msg: Message) -> Optional[AttachmentRef]:
+    """Документ, из которого можно извлечь текст; None — нет документа или формат не поддерживается."""
+    doc = msg.document
+    if doc is None or detect_kind(doc.file_name, doc.mime_type) is None:
+        return None
+    return AttachmentRef(doc.file_id, doc.file_unique_id, doc.file_name)
+
+
+def attachments_brief(attachments: Iterable[tuple[AttachmentRef, str]], documents: dict[str, Any], *,
+                      max_chars: int) -> str:
+    """
+    «Содержимое вложений» для брифа: attachments — (ref, подпись вложения в черновике),
+    documents — результат collect; всего не больше max_chars. Пусто — читать нечего.
+    """
+    contents: list[str] = []
+    budget = max_chars
+    seen: set[str] = set()
+    for ref, label in attachments:
+        doc = documents.get(ref.file_unique_id)
+        if doc is None or doc.status != "ok" or not doc.text or ref.file_unique_id in seen or budget <= 0:
+            continue
+        seen.add(ref.file_unique_id)
+        body = doc.text[:budget]
+        budget -= len(body)
+        cut = doc.truncated or len(body) < len(doc.text)
+        contents.append(f"[{label}]\n{body}" + ("\n(… документ прочитан не полностью)" if cut else ""))
+    return "Содержимое вложений:\n\n" + "\n\n".join(contents) if contents else ""
+
+
+class AttachmentIngestor:
+    def __init__(self, *, workers: int, max_bytes: int, max_pages: int, max_chars: int):
+        self._workers = workers
+        self._max_bytes = max_bytes
+        self._max_pages = max_pages
+        self._max_chars = max_chars
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+    def submit(self, bot: Bot, ref: AttachmentRef) -> asyncio.Task:
+        """Запускает разбор в фоне; повторный submit того же файла возвращает уже идущую задачу."""
+        task = self._in_flight.get(ref.file_unique_id)
+        if task is None:
+            task = asyncio.create_task(self._ingest(bot, ref), name=f"ingest:{ref.file_unique_id}")
+            self._in_flight[ref.file_unique_id] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(ref.file_unique_id, None))
+        return task
+
+    async def collect(self, bot: Bot, refs: Iterable[AttachmentRef], *, timeout: float) -> dict[str, Any]:
+        """
+        Результаты разбора по file_unique_id (строки attachment_texts). Недостающее
+        запускается заново (например, после рестарта бота) и ждётся не дольше timeout —
+        что не успело, в бриф не попадёт.
+        """
+        refs = {ref.file_unique_id: ref for ref in refs}
+        if not refs:
+            return {}
+        async with async_session_maker() as session:
+            found = await AttachmentTextDAO.get_many(session, list(refs))
+        missing = [ref for key, ref in refs.items() if key not in found]
+        if not missing:
+            return found
+
+        started = time.monotonic()
+        pending = [self.submit(bot, ref) for ref in missing]
+        _, late = await asyncio.wait(pending, timeout=timeout)
+        if late:
+            logger.warning("Ingest: {} of {} attachments not ready in {:.0f}s, brief goes without them",
+                           len(late), len(refs), timeout)
+        async with async_session_maker() as session:
+            found.update(await AttachmentTextDAO.get_many(session, [ref.file_unique_id for ref in missing]))
+        logger.debug("Ingest: waited {:.1f}s for {} attachments", time.monotonic() - started, len(missing))
+        return found
+
+    async def stop(self) -> None:
+        for task in list(self._in_flight.values()):
+            task.cancel()
+        await asyncio.gather(*self._in_flight.values(), return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def _ingest(self, bot: Bot, ref: AttachmentRef) -> None:
+        try:
+            async with async_session_maker() as session:
+                if await AttachmentTextDAO.get_many(session, [ref.file_unique_id]):
+                    return
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self._workers)
+            async with self._semaphore:
+                await self._download_and_extract(bot, ref)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # сеть/Bot API/БД — не кэшируем, collect попробует ещё раз
+            logger.warning("Ingest: {} failed: {}", ref.label, e)
+
+    async def _download_and_extract(self, bot: Bot, ref: AttachmentRef) -> None:
+        file = await bot.get_file(ref.file_id)
+        if file.file_size and file.file_size > self._max_bytes:
+            logger.info("Ingest: {} skipped, {} bytes > {}", ref.label, file.file_size, self._max_bytes)
+            await self._save(ref, status="too_large", error=f"{file.file_size} bytes")
+            return
+        kind = detect_kind(ref.file_name, None) or detect_kind(file.file_path, None)
+        if kind is None:
+            await self._save(ref, status="failed", error=f"unsupported file: {file.file_path}")
+            return
+
+        started = time.monotonic()
+        path = local_file_path(file.file_path)
+        tmp_path: Optional[str] = None
+        try:
+            if path is None or not path.exists():
+                fd, tmp_path = tempfile.mkstemp(prefix="ingest-")
+                os.close(fd)
+                await bot.download_file(file.file_path, destination=tmp_path, timeout=DOWNLOAD_TIMEOUT_SECONDS)
+                path = Path(tmp_path)
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="ingest")
+            loop = asyncio.get_running_loop()
+            extracted = await loop.run_in_executor(self._pool, lambda: extract_text(
+                path, kind, max_pages=self._max_pages, max_chars=self._max_chars,
+            ))
+        except ExtractionError as e:
+            logger.info("Ingest: {} is not readable: {}", ref.label, e)
+            await self._save(ref, status="failed", error=str(e))
+            return
+        finally:
+            if tmp_path:
+                os.unlink(tmp_path)
+
+        await self._save(ref, status="ok", text_value=extracted.text, pages=extracted.pages,
+                         truncated=extracted.truncated)
+        logger.info("Ingest: {} -> {} chars{} in {:.1f}s", ref.label, len(extracted.text),
+                    " (truncated)" if extracted.truncated else "", time.monotonic() - started)
+
+    async def _save(self, ref: AttachmentRef, **fields: Any) -> None:
+        async with async_session_maker() as session:
+            await AttachmentTextDAO.save(session, file_unique_id=ref.file_unique_id, file_name=ref.file_name,
+                                         **fields)
+
+
+ingestor = AttachmentIngestor(
+    workers=settings.INGEST_WORKERS,
+    max_bytes=settings.INGEST_MAX_FILE_MB * 1024 * 1024,
+    max_pages=settings.INGEST_MAX_PAGES,
+    max_chars=settings.INGEST_MAX_CHARS,
+)
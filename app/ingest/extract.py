@@ -0,0 +1,127 @@
+# app/ingest/extract.py
+"""
+Извлечение текста из документов клиента (синхронно — вызывается в пуле потоков).
+
+Читается не больше max_pages страниц PDF и max_chars символов: текст нужен
+для брифа GPT, а не для архива, и большой документ не должен занимать воркер
+и память надолго.
+"""
+from __future__ import annotations
+
+import codecs
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+
+from docx import Document
+from pypdf import PdfReader
+
+PDF = "pdf"
+DOCX = "docx"
+TXT = "txt"
+
+_EXTENSIONS = {
+    ".pdf": PDF,
+    ".docx": DOCX,
+    ".txt": TXT, ".md": TXT, ".csv": TXT,
+}
+_MIME_TYPES = {
+    "application/pdf": PDF,
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": DOCX,
+    "text/plain": TXT, "text/markdown": TXT, "text/csv": TXT,
+}
+_FALLBACK_ENCODING = "cp1251"  # не UTF-8 — почти наверняка «Блокнот» Windows
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+@dataclass(frozen=True)
+class Extracted:
+    text: str
+    pages: Optional[int] = None  # прочитано страниц (только PDF)
+    truncated: bool = False      # документ длиннее лимитов
+
+
+class ExtractionError(Exception):
+    """Документ не читается (повреждён, зашифрован и т.п.) — повторять бессмысленно."""
+
+
+def detect_kind(file_name: Optional[str], mime_type: Optional[str]) -> Optional[str]:
+    """pdf | docx | txt по расширению или MIME; None — формат не поддерживается (doc, xlsx, архивы...)."""
+    if file_name:
+        kind = _EXTENSIONS.get(Path(file_name).suffix.lower())
+        if kind:
+            return kind
+    return _MIME_TYPES.get((mime_type or "").lower())
+
+
+def extract_text(path: Path, kind: str, *, max_pages: int, max_chars: int) -> Extracted:
+    try:
+        if kind == PDF:
+            return _extract_pdf(path, max_pages=max_pages, max_chars=max_chars)
+        if kind == DOCX:
+            return _collect(_docx_blocks(path), max_chars=max_chars)
+        if kind == TXT:
+            return _extract_txt(path, max_chars=max_chars)
+    except ExtractionError:
+        raise
+    except Exception as e:
+        raise ExtractionError(f"{type(e).__name__}: {e}") from e
+    raise ValueError(f"Unsupported document kind: {kind}")
+
+
+def _collect(blocks: Iterable[str], *, max_chars: int, pages: Optional[int] = None) -> Extracted:
+    """Склеивает блоки текста, пока не наберётся max_chars; дальше документ не читается."""
+    parts: list[str] = []
+    size = 0
+    for block in blocks:
+        block = block.strip()
+        if not block:
+            continue
+        if size + len(block) > max_chars:
+            parts.append(block[:max(0, max_chars - size)])
+            return Extracted(_normalize("\n\n".join(parts)), pages=pages, truncated=True)
+        parts.append(block)
+        size += len(block) + 2
+    return Extracted(_normalize("\n\n".join(parts)), pages=pages)
+
+
+def _normalize(value: str) -> str:
+    return _BLANK_LINES.sub("\n\n", value.replace("\r\n", "\n").replace("\x00", "")).strip()
+
+
+def _extract_pdf(path: Path, *, max_pages: int, max_chars: int) -> Extracted:
+    reader = PdfReader(path)
+    if reader.is_encrypted and not reader.decrypt(""):
+        raise ExtractionError("PDF is password protected")
+    total = len(reader.pages)
+    read = min(total, max_pages)
+    result = _collect((reader.pages[i].extract_text() or "" for i in range(read)), max_chars=max_chars, pages=read)
+    if read < total and not result.truncated:
+        return Extracted(result.text, pages=read, truncated=True)
+    return result
+
+
+def _docx_blocks(path: Path) -> Iterable[str]:
+    doc = Document(str(path))
+    for paragraph in doc.paragraphs:
+        yield paragraph.text
+    for table in doc.tables:
+        for row in table.rows:
+            yield " | ".join(cell.text.strip() for cell in row.cells)
+
+
+def _extract_txt(path: Path, *, max_chars: int) -> Extracted:
+    # символ — не больше 4 байт: читаем ровно столько, сколько может понадобиться
+    with open(path, "rb") as f:
+        raw = f.read(max_chars * 4 + 1)
+        more = bool(f.read(1))
+    try:
+        # инкрементальный декодер не считает ошибкой символ, разрезанный границей чтения
+        decoded = codecs.getincrementaldecoder("utf-8-sig")().decode(raw, final=not more)
+    except UnicodeDecodeError:
+        decoded = raw.decode(_FALLBACK_ENCODING, errors="replace")
+    result = _collect([decoded], max_chars=max_chars)
+    if more and not result.truncated:
+        return Extracted(result.text, truncated=True)
+    return result
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from app.config import settings
+from app.jobs.pg_queue import PgJobQueue
+from app.jobs.runner import JobRunner
+
+
+def build_job_queue() -> JobRunner | PgJobQueue:
+    """Очередь фоновых задач по JOBS_BACKEND: в памяти бота или в Postgres для `python -m app.worker`."""
+    if settings.JOBS_BACKEND == "postgres":
+        return PgJobQueue(queue_size=settings.JOBS_QUEUE_SIZE, max_attempts=settings.JOBS_MAX_ATTEMPTS,
+                          slots=settings.JOBS_WORKERS, kind_caps=settings.JOBS_KIND_CONCURRENCY,
+                          default_duration=settings.JOBS_DEFAULT_DURATION_SECONDS)
+    return JobRunner(workers=settings.JOBS_WORKERS, queue_size=settings.JOBS_QUEUE_SIZE,
+                     default_duration=settings.JOBS_DEFAULT_DURATION_SECONDS)
+
+
+job_runner = build_job_queue()
@@ -0,0 +1,263 @@
+# app/jobs/pg_queue.py
+"""
+Очередь задач в Postgres (таблица jobs) для нескольких машин-воркеров.
+
+Бот только ставит задачи (PgJobQueue.submit), выполняют их процессы
+`python -m app.worker` (PgJobWorker):
+- захват — SELECT … FOR UPDATE SKIP LOCKED, воркеры не блокируют друг друга;
+- lease: взятая задача принадлежит воркеру до lease_until, heartbeat продлевает
+  его каждые JOBS_LEASE_SECONDS/3; задачи упавшего воркера по истечении lease
+  возвращаются в очередь (или failed после max_attempts);
+- Job.key уникален среди queued/running (частичный уникальный индекс), так что
+  вторая задача по тому же проекту не встанет в очередь ни с одной реплики бота;
+- JOBS_KIND_CONCURRENCY — сколько задач каждого типа выполняется одновременно
+  во всём кластере (например, чтобы не упереться в лимиты LLM);
+- ошибка обработчика — повтор с экспоненциальной задержкой;
+- место в очереди и оценка ожидания — по средней длительности последних задач
+  типа; взяв задачи, воркер сообщает ожидающим их новые места (QUEUE_HOOKS).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import socket
+import time
+from datetime import timedelta
+from typing import Any, Optional
+from uuid import uuid4
+
+from aiogram import Bot
+from loguru import logger
+
+from app.db.database import async_session_maker
+from app.db.models.jobs import JobDAO
+from app.db.models.outbox import utc_now
+from app.jobs.runner import HANDLERS, QUEUE_HOOKS, Admission, Attempt, Job, JobAlreadyQueued, JobQueueFull, \
+    current_attempt, estimate_wait
+
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 1800
+FINISHED_RETENTION = timedelta(days=14)
+MAINTENANCE_INTERVAL_SECONDS = 3600
+
+
+async def _average_duration(kind: str, default: float) -> float:
+    async with async_session_maker() as session:
+        duration = await JobDAO.average_duration(session, kind=kind)
+    return duration if duration is not None else default
+
+
+class PgJobQueue:
+    """Сторона бота: задачи пишутся в таблицу jobs, выполнение — в app.worker."""
+
+    def __init__(self, *, queue_size: int, max_attempts: int, slots: int, kind_caps: dict[str, int],
+                 default_duration: float):
+        """slots/kind_caps — как у воркеров: сколько задач типа выполняется одновременно (для оценки ожидания)."""
+        self._queue_size = queue_size
+        self._max_attempts = max_attempts
+        self._slots = slots
+        self._kind_caps = kind_caps
+        self._default_duration = default_duration
+
+    def _cap(self, kind: str) -> int:
+        return self._kind_caps.get(kind, self._slots)
+
+    async def is_full(self) -> bool:
+        async with async_session_maker() as session:
+            return await JobDAO.count_queued(session) >= self._queue_size
+
+    async def retry_after(self, kind: str) -> float:
+        duration = await _average_duration(kind, self._default_duration)
+        return estimate_wait(1, slots=self._cap(kind), duration=duration)
+
+    async def submit(self, job: Job) -> Admission:
+        if job.kind not in HANDLERS:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        if await self.is_full():
+            raise JobQueueFull(f"Job queue is full ({self._queue_size})")
+        async with async_session_maker() as session:
+            queued = await JobDAO.enqueue(
+                session, kind=job.kind, payload=json.dumps(job.payload, ensure_ascii=False),
+                max_attempts=self._max_attempts, key=job.key,
+            )
+        if queued is None:
+            raise JobAlreadyQueued(f"Job {job.key} is already queued or running")
+        job_id, ahead = queued
+        # впереди и ожидающие, и выполняющиеся; пока их меньше cap, задача не ждёт
+        position = max(0, ahead - self._cap(job.kind) + 1)
+        duration = await _average_duration(job.kind, self._default_duration)
+        admission = Admission(position, estimate_wait(position, slots=self._cap(job.kind), duration=duration))
+        logger.info("Job {} #{} queued in postgres, {} ahead, position {}, eta {:.0f}s", job.kind, job_id, ahead,
+                    admission.position, admission.eta_seconds)
+        return admission
+
+    async def start(self, bot: Bot) -> None:
+        logger.info("Jobs are stored in postgres and executed by `python -m app.worker`")
+
+    async def stop(self) -> None:
+        pass
+
+
+class PgJobWorker:
+    def __init__(
+        self,
+        *,
+        slots: int,
+        kind_caps: dict[str, int],
+        lease_seconds: int,
+        poll_seconds: float,
+        queue_size: int,
+        default_duration: float,
+        worker_id: Optional[str] = None,
+    ):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+        self._slots = slots
+        self._kind_caps = kind_caps
+        self._lease = timedelta(seconds=lease_seconds)
+        self._poll_seconds = poll_seconds
+        self._queue_size = queue_size
+        self._default_duration = default_duration
+        self._running: dict[int, asyncio.Task] = {}
+        self._hook_tasks: set[asyncio.Task] = set()
+        self._bot: Optional[Bot] = None
+
+    def _cap(self, kind: str) -> int:
+        return self._kind_caps.get(kind, self._slots)
+
+    async def run(self, bot: Bot, stop_event: asyncio.Event) -> None:
+        self._bot = bot
+        kinds = sorted(HANDLERS)
+        logger.info("Worker {} started: slots={} kinds={} caps={}", self.worker_id, self._slots, kinds,
+                    {kind: self._cap(kind) for kind in kinds})
+        heartbeat = asyncio.create_task(self._heartbeat(), name="jobs:heartbeat")
+        last_maintenance = 0.0
+        try:
+            while not stop_event.is_set():
+                if time.monotonic() - last_maintenance >= MAINTENANCE_INTERVAL_SECONDS:
+                    last_maintenance = time.monotonic()
+                    await self._maintenance()
+                try:
+                    await self._requeue_expired()
+                    await self._claim(kinds)
+                except Exception as e:
+                    logger.exception("Worker {}: claim failed: {}", self.worker_id, e)
+
+                # ждём: новую задачу (опрос), освободившийся слот или остановку
+                waiters = [asyncio.create_task(stop_event.wait()), *self._running.values()]
+                done, _ = await asyncio.wait(waiters, timeout=self._poll_seconds,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                waiters[0].cancel()
+        finally:
+            heartbeat.cancel()
+            for task in list(self._hook_tasks):
+                task.cancel()
+            await self._shutdown()
+
+    async def _claim(self, kinds: list[str]) -> None:
+        for kind in kinds:
+            free = self._slots - len(self._running)
+            if free <= 0:
+                return
+            async with async_session_maker() as session:
+                rows = await JobDAO.claim(session, kind=kind, worker_id=self.worker_id, limit=free,
+                                          cap=self._cap(kind), lease_until=utc_now() + self._lease)
+            for row in rows:
+                task = asyncio.create_task(self._execute(row), name=f"job:{row.id}")
+                self._running[row.id] = task
+            if rows and kind in QUEUE_HOOKS:
+                task = asyncio.create_task(self._notify_queue(kind), name=f"jobs:queue:{kind}")
+                self._hook_tasks.add(task)
+                task.add_done_callback(self._hook_tasks.discard)
+
+    async def _notify_queue(self, kind: str) -> None:
+        """Очередь сдвинулась: ожидающим задачам типа — новое место и оценку."""
+        try:
+            async with async_session_maker() as session:
+                rows = await JobDAO.queued(session, kind=kind, limit=self._queue_size)
+            duration = await _average_duration(kind, self._default_duration)
+        except Exception as e:
+            logger.warning("Worker {}: queue positions for {} unavailable: {}", self.worker_id, kind, e)
+            return
+        for position, row in enumerate(rows, start=1):
+            admission = Admission(position, estimate_wait(position, slots=self._cap(kind), duration=duration))
+            try:
+                await QUEUE_HOOKS[kind](self._bot, json.loads(row.payload), admission)
+            except Exception as e:
+                logger.warning("Job {} #{}: queue hook failed: {}", kind, row.id, e)
+
+    async def _execute(self, row: Any) -> None:
+        started = time.monotonic()
+        try:
+            logger.info("Job {} #{} started (attempt {}/{})", row.kind, row.id, row.attempts, row.max_attempts)
+            current_attempt.set(Attempt(row.attempts, row.max_attempts))  # контекст своей asyncio-задачи
+            result = await HANDLERS[row.kind](self._bot, json.loads(row.payload))
+            async with async_session_maker() as session:
+                written = await JobDAO.complete(
+                    session, row.id, worker_id=self.worker_id,
+                    result=json.dumps(result, ensure_ascii=False) if result is not None else None,
+                )
+            if written:
+                logger.info("Job {} #{} done in {:.1f}s", row.kind, row.id, time.monotonic() - started)
+            else:
+                logger.warning("Job {} #{} finished after its lease was lost", row.kind, row.id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            retry_at = None
+            if row.attempts < row.max_attempts:
+                delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (row.attempts - 1))
+                retry_at = utc_now() + timedelta(seconds=delay)
+            logger.exception("Job {} #{} failed (attempt {}/{}), {}: {}", row.kind, row.id, row.attempts,
+                             row.max_attempts, f"retry at {retry_at:%H:%M:%S}" if retry_at else "giving up", e)
+            try:
+                async with async_session_maker() as session:
+                    await JobDAO.fail(session, row.id, worker_id=self.worker_id, error=repr(e), retry_at=retry_at)
+            except Exception as db_error:
+                logger.exception("Job #{}: failed to record error, lease will expire: {}", row.id, db_error)
+        finally:
+            self._running.pop(row.id, None)
+
+    async def _heartbeat(self) -> None:
+        interval = self._lease.total_seconds() / 3
+        while True:
+            await asyncio.sleep(interval)
+            if not self._running:
+                continue
+            try:
+                async with async_session_maker() as session:
+                    await JobDAO.heartbeat(session, list(self._running), worker_id=self.worker_id,
+                                           lease_until=utc_now() + self._lease)
+            except Exception as e:
+                logger.exception("Worker {}: heartbeat failed: {}", self.worker_id, e)
+
+    async def _requeue_expired(self) -> None:
+        async with async_session_maker() as session:
+            rows = await JobDAO.requeue_expired(session)
+        for row in rows:
+            logger.warning("Job {} #{} lease expired -> {}", row.kind, row.id, row.status)
+
+    async def _maintenance(self) -> None:
+        try:
+            async with async_session_maker() as session:
+                purged = await JobDAO.purge_finished(session, older_than=utc_now() - FINISHED_RETENTION)
+            if purged:
+                logger.info("Worker {}: {} finished jobs purged", self.worker_id, purged)
+        except Exception as e:
+            logger.exception("Worker {}: purge failed: {}", self.worker_id, e)
+
+    async def _shutdown(self) -> None:
+        """Незавершённые задачи прерываются и сразу возвращаются в очередь — не ждём истечения lease."""
+        if not self._running:
+            logger.info("Worker {} stopped", self.worker_id)
+            return
+        job_ids = list(self._running)
+        for task in list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._running.values(), return_exceptions=True)
+        try:
+            async with async_session_maker() as session:
+                await JobDAO.release(session, job_ids, worker_id=self.worker_id)
+        except Exception as e:
+            logger.exception("Worker {}: release failed, jobs return after lease expiry: {}", self.worker_id, e)
+        logger.warning("Worker {} stopped, {} jobs returned to queue", self.worker_id, len(job_ids))
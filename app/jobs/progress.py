@@ -0,0 +1,64 @@
+# app/jobs/progress.py
+"""
+Прогресс фоновой задачи в одном сообщении, которое редактируется по ходу:
+
+    Проект #42: пост ✅ · КП ⏳ · рассылка ▫️
+"""
+from __future__ import annotations
+
+from functools import partial
+from typing import Iterable, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup
+from loguru import logger
+
+from app.bot.outbound import outbound
+
+PENDING = "▫️"
+RUNNING = "⏳"
+DONE = "✅"
+FAILED = "❌"
+SKIPPED = "➖"
+
+
+class ProgressMessage:
+    def __init__(self, bot: Bot, chat_id: int, message_id: int, *, title: str, stages: list[tuple[str, str]],
+                 done: Iterable[str] = ()):
+        """stages — [(ключ, подпись)] в порядке выполнения; done — этапы, уже выполненные раньше."""
+        self._bot = bot
+        self._chat_id = chat_id
+        self._message_id = message_id
+        self._title = title
+        self._labels = dict(stages)
+        self._marks = {key: PENDING for key, _ in stages}
+        self._marks.update((key, DONE) for key in done)
+        self._note: Optional[str] = None
+        self._reply_markup: Optional[InlineKeyboardMarkup] = None
+
+    def render(self) -> str:
+        stages = " · ".join(f"{label} {self._marks[key]}" for key, label in self._labels.items())
+        text = f"{self._title}: {stages}"
+        return f"{text}\n\n{self._note}" if self._note else text
+
+    async def set(self, stage: str, mark: str, *, note: Optional[str] = None,
+                  reply_markup: Optional[InlineKeyboardMarkup] = None) -> None:
+        """reply_markup — кнопки под прогрессом (например, «Продолжить»); без него кнопки убираются."""
+        self._marks[stage] = mark
+        if note is not None:
+            self._note = note
+        self._reply_markup = reply_markup
+        await self._publish()
+
+    async def _publish(self) -> None:
+        # прогресс — не критичная информация: ошибки только логируем
+        try:
+            await outbound.submit(self._chat_id, partial(
+                self._bot.edit_message_text, text=self.render(), chat_id=self._chat_id,
+                message_id=self._message_id, parse_mode=None, reply_markup=self._reply_markup,
+            ))
+        except TelegramBadRequest as e:
+            logger.debug("Progress edit in chat {} skipped: {}", self._chat_id, e)
+        except Exception as e:
+            logger.warning("Progress edit in chat {} failed: {}", self._chat_id, e)
@@ -0,0 +1,318 @@
+# app/jobs/project.py
+"""
+Задача generate_project: документы (текст вложений в бриф) -> пост (GPT) ->
+КП (GPT + рендер файла) -> рассылка через outbox.
+
+Запускается из send_project после того, как черновик сохранён в tasks, и из
+«Продолжить» (project:resume) после сбоя; ход работы виден в одном
+сообщении-прогрессе в чате отправителя.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import os
+from functools import partial
+from itertools import chain
+from typing import Any, Iterable, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup
+from loguru import logger
+
+from app.bot import outbox
+from app.bot.keyboards.kbs import kp_actions_kb, resume_project_kb, review_actions_kb
+from app.bot.materials import kp_caption, raw_outgoing, text_outgoing
+from app.bot.outbound import outbound
+from app.chat_gpt.kp_service import KPService
+from app.chat_gpt.prompts import ProjectType
+from app.chat_gpt.service import generate_tg_post
+from app.config import settings
+from app.db.database import async_session_maker
+from app.db.models.outbox import utc_now
+from app.db.models.tasks import TaskDAO
+from app.ingest.attachments import AttachmentRef, attachments_brief, ingestor
+from app.jobs.progress import DONE, FAILED, RUNNING, SKIPPED, ProgressMessage
+from app.jobs.runner import Admission, current_attempt, register
+
+GENERATE_PROJECT = "generate_project"
+
+STAGES = [("docs", "документы"), ("post", "пост"), ("kp", "КП"), ("send", "рассылка")]
+
+
+def project_outgoing(
+        *,
+        task_id: int,
+        user_id: int,
+        title: str,
+        brief: str,
+        tg_post: str,
+        sources: list[tuple[int, int]],
+        kp_file: Optional[tuple[str, bytes]],
+        final: bool = True,
+        materials: bool = True,
+) -> Iterable[outbox.Outgoing]:
+    """
+    Все сообщения рассылки проекта, в порядке доставки внутри каждого чата (лениво).
+    kp_file — (имя, содержимое) отрендеренного КП; final=False — рассылка неполная
+    (КП не готово), итоговое «Проект обработан» придёт после «Продолжить».
+    materials=False — сырые материалы, пост и уведомление уже разосланы раньше
+    (tasks.materials_sent_at), остаются КП и итоговое сообщение.
+    Ключи стабильны: повторная рассылка ставит в очередь только то, чего там ещё нет
+    (пока отправленное хранится в outbox — SENT_RETENTION).
+    """
+    key = f"project:{task_id}"
+    raw_text = f"{title}\n\n{brief}"
+    raw_header = f"📎 Сырые материалы клиента (ID: {task_id}): {title}"
+    post_header = "📝 Сгенерированный пост"
+    partner_message = f"🆕 Новый проект: {title}. Задача взята в работу."
+
+    # ВСЕГДА отправляем полные материалы и пост с кнопками перегенерации ОТПРАВИТЕЛЮ.
+    # Сообщения генерируются лениво и уходят в очередь пачками — доставка первых
+    # частей начинается, пока длинный бриф ещё режется на куски
+    streams: list[Iterable[outbox.Outgoing]] = [
+        raw_outgoing(user_id, f"{key}:raw:{user_id}", header=raw_header, sources=sources,
+                     fallback_text=raw_text),
+        text_outgoing(user_id, f"{key}:post:{user_id}", tg_post, header=post_header,
+                      reply_markup=review_actions_kb(task_id)),
+    ]
+
+    team_id = settings.TEAM_PARTNER_ID
+    team_materials = [
+        raw_outgoing(team_id, f"{key}:raw:{team_id}", header=raw_header, sources=sources,
+                     fallback_text=raw_text),
+        text_outgoing(team_id, f"{key}:post:{team_id}", tg_post, header=post_header,
+                      reply_markup=review_actions_kb(task_id)),
+    ]
+    partner_notify = [outbox.message(settings.BUSINESS_PARTNER_ID,
+                                     f"{key}:notify:{settings.BUSINESS_PARTNER_ID}", partner_message)]
+
+    # Определяем кому какие материалы отправлять
+    if not materials:
+        streams = []
+
+    elif user_id == settings.TEAM_PARTNER_ID:
+        # Если отправил TEAM_PARTNER - BUSINESS_PARTNER получает только уведомление
+        streams.append(partner_notify)
+
+    elif user_id == settings.BUSINESS_PARTNER_ID:
+        # Если отправил BUSINESS_PARTNER - TEAM_PARTNER получает ВСЕ материалы
+        streams += team_materials
+
+    else:
+        # Если отправил кто-то другой
+        # TEAM_PARTNER получает ВСЕ материалы, BUSINESS_PARTNER — только уведомление
+        streams += team_materials
+        streams.append(partner_notify)
+
+    # ВСЕМ отправляем КП файл если он сгенерировался
+    if kp_file is not None:
+        kp_filename, kp_content = kp_file
+        # Определяем список получателей КП
+        kp_recipients = [user_id, settings.TEAM_PARTNER_ID, settings.BUSINESS_PARTNER_ID]
+
+        for recipient_id in set(kp_recipients):  # убираем дубликаты
+            streams.append([
+                outbox.document(
+                    recipient_id, f"{key}:kp:{recipient_id}", kp_filename,
+                    caption=kp_caption(kp_filename, task_id), content=kp_content,
+                ),
+                # Клавиатура действий с КП
+                outbox.message(
+                    recipient_id, f"{key}:kp_actions:{recipient_id}",
+                    f"📄 КП для проекта #{task_id} готово. Что делаем дальше?",
+                    reply_markup=kp_actions_kb(task_id)
+                ),
+            ])
+
+    # Финальное уведомление для отправителя (в его чате придёт после всех материалов)
+    if final:
+        streams.append([outbox.message(
+            user_id, f"{key}:done:{user_id}",
+            f"✅ Проект #{task_id} обработан. Материалы отправляются участникам"
+        )])
+    return chain.from_iterable(streams)
+
+
+def completed_stages(task: Any) -> list[str]:
+    """Этапы прогресса, чьи чекпоинты уже сохранены в задаче."""
+    done = []
+    if task.attachments is None:
+        done.append("docs")
+    if task.tg_post:
+        done.append("post")
+    if task.kp_file is not None:
+        done.append("kp")
+    if task.dispatched_at is not None:
+        done.append("send")
+    return done
+
+
+async def generate_project(bot: Bot, payload: dict[str, Any]) -> Optional[dict[str, Any]]:
+    """
+    payload: task_id, user_id, chat_id, message_id (сообщение-прогресс).
+
+    Каждый этап сохраняет артефакт в задачу (tasks.brief_text, tg_post, kp_doc, kp_file, dispatched_at)
+    и при повторном запуске пропускается — «Продолжить» после сбоя, повтор задачи
+    воркером и перезапуск после потери lease не тратят GPT на готовые этапы.
+    Результат (сводка для jobs.result): title, kp, queued, complete.
+    Сбой GPT или рассылки пробрасывается — очередь повторит задачу; «Продолжить»
+    появляется, только когда попытки кончились.
+    """
+    task_id = payload["task_id"]
+    user_id = payload["user_id"]
+
+    async with async_session_maker() as session:
+        task = await TaskDAO.find_one_or_none_by_id(session, task_id)
+    if task is None:
+        logger.warning("Job: task {} not found", task_id)
+        return None
+    brief = task.brief_text or ""
+    try:
+        project_type = ProjectType(task.project_type)
+    except ValueError:
+        project_type = ProjectType.MINI_APP
+    sources = [tuple(source) for source in json.loads(task.source_messages or "[]")]
+    done = completed_stages(task)
+    progress = ProgressMessage(bot, payload["chat_id"], payload["message_id"],
+                               title=f"Проект #{task_id}", stages=STAGES, done=done)
+    resume_kb = resume_project_kb(task_id)
+    last_attempt = current_attempt.get().last
+    if done:
+        logger.info("Project {} resumed, completed stages: {}", task_id, done)
+
+    # 0) Текст документов клиента: разбор начался ещё в черновике, здесь дожидаемся
+    # оставшегося (не дольше INGEST_WAIT_SECONDS) — не успевшее в бриф не попадёт
+    if task.attachments is not None:
+        await progress.set("docs", RUNNING)
+        attachments = [(AttachmentRef(file_id, file_unique_id, None), label)
+                       for file_id, file_unique_id, label in json.loads(task.attachments)]
+        documents = await ingestor.collect(bot, [ref for ref, _ in attachments],
+                                           timeout=settings.INGEST_WAIT_SECONDS)
+        contents = attachments_brief(attachments, documents, max_chars=settings.INGEST_BRIEF_MAX_CHARS)
+        if contents:
+            brief = f"{brief}\n\n{contents}".strip()
+        async with async_session_maker() as session:
+            await TaskDAO.update(session, {"id": task_id}, brief_text=brief, attachments=None)
+        await progress.set("docs", DONE)
+
+    # 1) GPT - генерация поста
+    title, tg_post = task.title, task.tg_post
+    if not tg_post:
+        await progress.set("post", RUNNING)
+        try:
+            gpt_resp = await generate_tg_post(brief)
+            title = (gpt_resp.get("title") or "").strip()[:255] or "Без названия"
+            tg_post = (gpt_resp.get("tg_post") or "").strip()
+            logger.info("GPT ok for task {}: title='{}' post_len={}", task_id, title, len(tg_post))
+        except Exception as e:
+            logger.warning("GPT generation failed for task {}: {}", task_id, e)
+            await progress.set("post", FAILED, **_failure("❌ Не удалось сгенерировать пост.", resume_kb, last_attempt))
+            raise
+
+        # Обновим title у задачи и сохраним пост
+        async with async_session_maker() as session:
+            await TaskDAO.update(session, {"id": task_id}, title=title, tg_post=tg_post)
+        await progress.set("post", DONE)
+
+    # 2) Генерация КП с учетом типа проекта и рендер файла — два чекпоинта: kp_doc и kp_file
+    kp_file = (task.kp_filename, task.kp_file) if task.kp_file is not None else None
+    if kp_file is None:
+        await progress.set("kp", RUNNING)
+        kp_filepath = None
+        try:
+            kp_service = KPService()
+            async with async_session_maker() as session:
+                kp_doc = await TaskDAO.get_kp_document(session, task_id)
+            if kp_doc is None:
+                logger.info("Generating KP for task {} type={}...", task_id, project_type.value)
+                kp_doc = await kp_service.create_kp(brief, title, project_type)
+                async with async_session_maker() as session:
+                    await TaskDAO.save_kp_document(session, task_id, kp_doc)
+            # рендер DOCX — CPU, не держим event loop
+            kp_filepath = await asyncio.to_thread(kp_service.export_kp, kp_doc, title)
+            async with async_session_maker() as session:
+                await TaskDAO.save_kp_file(session, task_id, kp_filepath)
+            with open(kp_filepath, "rb") as f:
+                kp_file = (os.path.basename(kp_filepath), f.read())
+            logger.info("KP generated successfully: {}", kp_filepath)
+            await progress.set("kp", DONE)
+        except Exception as e:
+            logger.exception("KP generation failed for task {}: {}", task_id, e)
+            # Продолжаем работу даже если КП не сгенерировалось — КП дошлёт «Продолжить»
+            await progress.set("kp", SKIPPED)
+        finally:
+            # Содержимое КП уже в задаче — временный файл больше не нужен
+            if kp_filepath and os.path.exists(kp_filepath):
+                try:
+                    os.remove(kp_filepath)
+                except Exception as e:
+                    logger.exception("Failed to clean up KP files: {}", e)
+
+    # 3) Рассылка: всё в очередь outbox, доставка — воркером с повторами.
+    # Ключи outbox — чекпоинты по получателям: уже поставленное не дублируется;
+    # materials_sent_at — на случай «Продолжить» позже, когда outbox уже очищен
+    complete = kp_file is not None
+    queued = 0
+    if task.dispatched_at is None:
+        await progress.set("send", RUNNING)
+        try:
+            queued = await outbox.enqueue_stream(project_outgoing(
+                task_id=task_id, user_id=user_id, title=title, brief=brief, tg_post=tg_post,
+                sources=sources, kp_file=kp_file, final=complete, materials=task.materials_sent_at is None,
+            ))
+            logger.info("Project {} dispatch queued: {} messages", task_id, queued)
+        except Exception as e:
+            logger.warning("Dispatch failed for task {}: {}", task_id, e)
+            await progress.set("send", FAILED, **_failure("❌ Не удалось разослать материалы.", resume_kb, last_attempt))
+            raise
+        if complete:
+            async with async_session_maker() as session:
+                await TaskDAO.update(session, {"id": task_id}, dispatched_at=utc_now())
+            await progress.set("send", DONE)
+        else:
+            async with async_session_maker() as session:
+                await TaskDAO.update(session, {"id": task_id}, materials_sent_at=utc_now())
+            await progress.set("send", DONE, note="⚠️ КП не готово — материалы без него уже отправлены.",
+                               reply_markup=resume_kb)
+
+    return {"title": title, "kp": kp_file is not None, "queued": queued, "complete": complete}
+
+
+def _failure(note: str, resume_kb: InlineKeyboardMarkup, last_attempt: bool) -> dict[str, Any]:
+    """Подпись и кнопки прогресса при сбое: «Продолжить» — только когда очередь больше не повторит."""
+    if last_attempt:
+        return {"note": note, "reply_markup": resume_kb}
+    return {"note": f"{note} Повторю автоматически.", "reply_markup": None}
+
+
+def format_eta(seconds: float) -> str:
+    minutes = math.ceil(seconds / 60)
+    return "через минуту" if minutes <= 1 else f"примерно через {minutes} мин"
+
+
+def queue_note(admission: Admission) -> str:
+    """Хвост сообщения «Принял…»: место в очереди, если задача не запустилась сразу."""
+    if not admission.position:
+        return ""
+    return f" В очереди: {admission.position}-й, начну {format_eta(admission.eta_seconds)}."
+
+
+async def show_queue_position(bot: Bot, payload: dict[str, Any], admission: Admission) -> None:
+    """on_queue_move: пока проект ждёт, сообщение-прогресс показывает место в очереди и оценку."""
+    if not admission.position:
+        return  # вот-вот начнётся — дальше сообщение ведёт ProgressMessage
+    chat_id = payload["chat_id"]
+    text = (f"Проект #{payload['task_id']} ждёт в очереди: {admission.position}-й, "
+            f"начну {format_eta(admission.eta_seconds)}.")
+    try:
+        await outbound.submit(chat_id, partial(
+            bot.edit_message_text, text=text, chat_id=chat_id, message_id=payload["message_id"], parse_mode=None,
+        ))
+    except TelegramBadRequest as e:
+        logger.debug("Queue position edit in chat {} skipped: {}", chat_id, e)
+
+
+register(GENERATE_PROJECT, generate_project, on_queue_move=show_queue_position)
@@ -0,0 +1,209 @@
+# app/jobs/runner.py
+"""
+Фоновые задачи вне хендлеров апдейтов.
+
+Хендлер кладёт задачу в очередь и сразу отвечает пользователю; задачу выполняет
+обработчик, зарегистрированный для её типа:
+
+    register("generate_project", generate_project, on_queue_move=show_queue_position)
+    admission = await job_runner.submit(Job("generate_project", {"task_id": 42}))
+
+Допуск: одновременно выполняется не больше JOBS_WORKERS задач, ждут не больше
+JOBS_QUEUE_SIZE (is_full — быстрый отказ до начала работы, при гонке submit бросает
+JobQueueFull). submit возвращает место в очереди и оценку ожидания (Admission)
+по средней длительности задач этого типа; когда очередь сдвигается, для
+ожидающих вызывается on_queue_move — например, обновить сообщение со статусом.
+
+Исключение обработчика — неудача попытки: очередь в Postgres повторит задачу,
+пока не кончатся попытки (current_attempt — какая идёт сейчас).
+
+Job.key — не больше одной задачи с этим ключом в очереди или в работе: повторный
+submit (двойное «Продолжить» по одному проекту) бросает JobAlreadyQueued.
+
+JobRunner — пул корутин в процессе бота, при рестарте задачи теряются. Общая очередь в Postgres для отдельных воркеров — app.jobs.pg_queue;
+какая используется, решает JOBS_BACKEND (см. app.jobs).
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+from uuid import uuid4
+
+from aiogram import Bot
+from loguru import logger
+
+# Обработчик может вернуть JSON-результат — в очереди Postgres он сохраняется в jobs.result
+JobHandler = Callable[[Bot, dict[str, Any]], Awaitable[Optional[dict[str, Any]]]]
+
+HANDLERS: dict[str, JobHandler] = {}
+
+# вес последней задачи в скользящей средней длительности
+DURATION_SMOOTHING = 0.3
+
+
+class Admission(NamedTuple):
+    position: int       # место среди ожидающих, 0 — задача запускается сразу
+    eta_seconds: float  # через сколько примерно начнётся
+
+
+QueueHook = Callable[[Bot, dict[str, Any], Admission], Awaitable[None]]
+
+QUEUE_HOOKS: dict[str, QueueHook] = {}
+
+
+def register(kind: str, handler: JobHandler, *, on_queue_move: Optional[QueueHook] = None) -> None:
+    HANDLERS[kind] = handler
+    if on_queue_move is not None:
+        QUEUE_HOOKS[kind] = on_queue_move
+
+
+def estimate_wait(position: int, *, slots: int, duration: float) -> float:
+    """Ожидание position-й задачи в очереди: слоты освобождаются в среднем раз в duration/slots секунд."""
+    return position * duration / max(1, slots)
+
+
+class Attempt(NamedTuple):
+    number: int
+    max_attempts: int
+
+    @property
+    def last(self) -> bool:
+        """После неудачи этой попытки повтора не будет."""
+        return self.number >= self.max_attempts
+
+
+# попытка выполняемой задачи — для обработчика; JobRunner не повторяет задачи, поэтому по умолчанию 1 из 1
+current_attempt: ContextVar[Attempt] = ContextVar("current_attempt", default=Attempt(1, 1))
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobAlreadyQueued(Exception):
+    """Задача с тем же key уже ждёт в очереди или выполняется."""
+
+
+@dataclass(slots=True)
+class Job:
+    kind: str
+    payload: dict[str, Any]  # только JSON-значения
+    key: Optional[str] = None  # например "project:42" — не больше одной активной задачи на ключ
+    id: str = field(default_factory=lambda: uuid4().hex[:12])
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+class JobRunner:
+    def __init__(self, *, workers: int, queue_size: int, default_duration: float):
+        """default_duration — оценка длительности задачи, пока нет своей статистики."""
+        self._workers = workers
+        self._queue: asyncio.Queue[Job] = asyncio.Queue(maxsize=queue_size)
+        self._waiting: deque[Job] = deque()  # те же задачи, что в _queue, — для мест в очереди
+        self._tasks: list[asyncio.Task] = []
+        self._hook_tasks: set[asyncio.Task] = set()
+        self._active_keys: set[str] = set()  # key задач в очереди и в работе
+        self._running = 0
+        self._durations: dict[str, float] = {}
+        self._default_duration = default_duration
+        self._bot: Optional[Bot] = None
+
+    async def is_full(self) -> bool:
+        return self._queue.full()
+
+    async def retry_after(self, kind: str) -> float:
+        """Когда при полной очереди стоит попробовать снова: освободится одно место."""
+        return estimate_wait(1, slots=self._workers, duration=self._duration(kind))
+
+    async def submit(self, job: Job) -> Admission:
+        """Ставит задачу в очередь. Возвращает её место среди ожидающих и оценку ожидания."""
+        if job.kind not in HANDLERS:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        if job.key is not None and job.key in self._active_keys:
+            raise JobAlreadyQueued(f"Job {job.key} is already queued or running")
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"Job queue is full ({self._queue.maxsize})") from None
+        if job.key is not None:
+            self._active_keys.add(job.key)
+        self._waiting.append(job)
+        admission = self._admission(job.kind, len(self._waiting))
+        logger.info("Job {} {} queued, position {}, eta {:.0f}s", job.kind, job.id, admission.position,
+                    admission.eta_seconds)
+        return admission
+
+    def _duration(self, kind: str) -> float:
+        return self._durations.get(kind, self._default_duration)
+
+    def _admission(self, kind: str, index: int) -> Admission:
+        """index — номер задачи среди ожидающих (с 1); пока есть свободный воркер, задача не ждёт."""
+        position = max(0, index - max(0, self._workers - self._running))
+        return Admission(position, estimate_wait(position, slots=self._workers, duration=self._duration(kind)))
+
+    def _record_duration(self, kind: str, seconds: float) -> None:
+        previous = self._durations.get(kind)
+        self._durations[kind] = seconds if previous is None else \
+            previous + DURATION_SMOOTHING * (seconds - previous)
+
+    def _notify_queue(self) -> None:
+        """Очередь сдвинулась: ожидающим — новое место и оценку (в фоне, воркер не ждёт)."""
+        for index, job in enumerate(self._waiting, start=1):
+            hook = QUEUE_HOOKS.get(job.kind)
+            if hook is None:
+                continue
+            task = asyncio.create_task(self._call_hook(hook, job, self._admission(job.kind, index)))
+            self._hook_tasks.add(task)
+            task.add_done_callback(self._hook_tasks.discard)
+
+    async def _call_hook(self, hook: QueueHook, job: Job, admission: Admission) -> None:
+        try:
+            await hook(self._bot, job.payload, admission)
+        except Exception as e:
+            logger.warning("Job {} {}: queue hook failed: {}", job.kind, job.id, e)
+
+    async def start(self, bot: Bot) -> None:
+        if self._tasks:
+            return
+        self._bot = bot
+        self._tasks = [asyncio.create_task(self._work(i), name=f"jobs:{i}") for i in range(self._workers)]
+        logger.info("Job runner started: {} workers, queue size {}", self._workers, self._queue.maxsize)
+
+    async def stop(self) -> None:
+        if not self._tasks:
+            return
+        lost = self._queue.qsize() + self._running
+        for task in [*self._tasks, *self._hook_tasks]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._hook_tasks, return_exceptions=True)
+        self._tasks = []
+        self._active_keys.clear()
+        if lost:
+            logger.warning("Job runner stopped, {} unfinished jobs dropped", lost)
+        else:
+            logger.info("Job runner stopped")
+
+    async def _work(self, worker: int) -> None:
+        while True:
+            job = await self._queue.get()
+            self._waiting.remove(job)
+            self._running += 1
+            self._notify_queue()
+            started = time.monotonic()
+            try:
+                logger.info("Job {} {} started on worker {} after {:.1f}s in queue",
+                            job.kind, job.id, worker, started - job.queued_at)
+                await HANDLERS[job.kind](self._bot, job.payload)
+                elapsed = time.monotonic() - started
+                self._record_duration(job.kind, elapsed)
+                logger.info("Job {} {} done in {:.1f}s", job.kind, job.id, elapsed)
+            except Exception as e:
+                logger.exception("Job {} {} failed: {}", job.kind, job.id, e)
+            finally:
+                self._running -= 1
+                self._active_keys.discard(job.key)
+                self._queue.task_done()
+
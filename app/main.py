@@ -2,39 +2,133 @@ import asyncio
 import signal
 
 from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
 from loguru import logger
 
+from app.bot.fsm_storage import build_storage
+from app.bot.handlers.export_router import router as export_router
 from app.bot.handlers.projects_router import router as projects_router
+from app.bot.handlers.roles_router import router as roles_router
 from app.bot.handlers.router import router as gpt_router
 from app.bot.middleware.auth import build_auth_middleware
+from app.bot.middleware.idempotency import IdempotencyMiddleware
+from app.bot.middleware.ordering import ChatOrderMiddleware, DetachedMiddleware
+from app.bot.middleware.throttling import ThrottlingMiddleware, build_buckets
+from app.bot.outbox import outbox_worker
+from app.bot.roles import roles
+from app.bot.telegram_api import build_session
 from app.config import settings
+from app.ingest.attachments import ingestor
+from app.jobs import job_runner
 from app.logging_setup import setup_logging
 
 # планировщик напоминаний
 from app.scheduler.reminders import start_scheduler, set_bot as reminders_set_bot
 
-bot = Bot(token=settings.BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-dp = Dispatcher(storage=MemoryStorage())
+bot = Bot(token=settings.BOT_TOKEN, session=build_session(),
+          default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+dp = Dispatcher(storage=build_storage())
+
+
+async def run_polling(stop_event: asyncio.Event) -> None:
+    # getUpdates не работает, пока установлен вебхук (например, после смены режима)
+    await bot.delete_webhook()
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False))
+    await stop_event.wait()
+    polling.cancel()
+    try:
+        await polling
+    except asyncio.CancelledError:
+        pass
+
+
+async def _healthz(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+
+async def run_webhook(stop_event: asyncio.Event) -> None:
+    """
+    Встроенный aiohttp-сервер: Telegram шлёт апдейты на BASE_SITE + WEBHOOK_PATH,
+    запросы без верного X-Telegram-Bot-Api-Secret-Token отклоняются (401).
+    Ответ Telegram уходит сразу, апдейт обрабатывается в фоне.
+    """
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=settings.WEBHOOK_SECRET).register(
+        app, path=settings.WEBHOOK_PATH
+    )
+    app.router.add_get("/healthz", _healthz)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=settings.WEBAPP_HOST, port=settings.WEBAPP_PORT)
+    await site.start()
+    logger.info("Webhook server listening on {}:{}{}", settings.WEBAPP_HOST, settings.WEBAPP_PORT,
+                settings.WEBHOOK_PATH)
+    try:
+        # сервер уже слушает — апдейты, пришедшие сразу после setWebhook, не потеряются
+        await bot.set_webhook(
+            settings.get_webhook_url(),
+            secret_token=settings.WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        logger.info("Webhook set: {}", settings.get_webhook_url())
+        await stop_event.wait()
+    finally:
+        if settings.WEBHOOK_DELETE_ON_SHUTDOWN:
+            try:
+                await bot.delete_webhook()
+                logger.info("Webhook deleted")
+            except Exception as e:
+                logger.exception("Failed to delete webhook: {}", e)
+        # дожидается апдейтов, которые ещё обрабатываются в фоне
+        await runner.cleanup()
+        await bot.session.close()
 
 async def main():
     setup_logging()
 
     # middleware
+    # порядок апдейтов: чаты параллельно, внутри чата — последовательно
+    update_order = ChatOrderMiddleware(max_parallel=settings.UPDATES_MAX_PARALLEL,
+                                       depth_warning=settings.UPDATES_CHAT_DEPTH_WARNING)
+    dp.update.outer_middleware(update_order)
     auth = build_auth_middleware()
     dp.message.middleware(auth)
     dp.callback_query.middleware(auth)
+    # частота действий пользователя (flags={THROTTLE: ...}) — до GPT; вёдра общие для реплик (FSM_STORAGE)
+    throttling = ThrottlingMiddleware(settings.THROTTLE_LIMITS, buckets=build_buckets(settings.THROTTLE_LIMITS))
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
+    # повторы действий с flags={IDEMPOTENT: ...} не доходят до хендлера
+    dp.callback_query.middleware(IdempotencyMiddleware(lock_seconds=settings.IDEMPOTENCY_LOCK_SECONDS,
+                                                       result_seconds=settings.IDEMPOTENCY_RESULT_SECONDS))
+    # тяжёлые хендлеры (flags={DETACHED: True}) не держат очередь своего чата
+    detached = DetachedMiddleware(update_order)
+    dp.message.middleware(detached)
+    dp.callback_query.middleware(detached)
 
     # роутеры
     dp.include_router(projects_router)
+    dp.include_router(export_router)
+    dp.include_router(roles_router)
     dp.include_router(gpt_router)
 
+    # роли из БД в память — до первого апдейта
+    await roles.start()
+
     # ❗️ запуск планировщика ДОЛЖЕН быть внутри работающего loop
     reminders_set_bot(bot)
     start_scheduler()
 
+    # очередь исходящих: досылает недоставленное после рестарта
+    await outbox_worker.start(bot)
+    # генерация проектов — вне хендлеров апдейтов
+    await job_runner.start(bot)
+
     # аккуратное завершение
     loop = asyncio.get_running_loop()
     stop_event = asyncio.Event()
@@ -44,14 +138,19 @@ async def main():
         except NotImplementedError:
             pass
 
-    logger.info("Bot started")
-    polling = asyncio.create_task(dp.start_polling(bot))
-    await stop_event.wait()
-    polling.cancel()
+    logger.info("Bot started in {} mode", settings.BOT_MODE)
     try:
-        await polling
-    except asyncio.CancelledError:
-        pass
+        if settings.BOT_MODE == "webhook":
+            await run_webhook(stop_event)
+        else:
+            await run_polling(stop_event)
+    finally:
+        await job_runner.stop()
+        await ingestor.stop()
+        await outbox_worker.stop()
+        await roles.stop()
+        await dp.storage.close()
+        await throttling.buckets.close()
 
 
 if __name__ == "__main__":
@@ -13,6 +13,14 @@ from app.config import database_url
 from app.db.database import Base
 from app.db.models.users import User
 from app.db.models.tasks import Task
+from app.db.models.outbox import OutboxMessage
+from app.db.models.fsm import FsmRecord
+from app.db.models.drafts import DraftItem, DraftHeader
+from app.db.models.jobs import JobRecord
+from app.db.models.throttle import ThrottleBucket
+from app.db.models.idempotency import IdempotencyKey
+from app.db.models.roles import UserRole
+from app.db.models.attachments import AttachmentText
 
 
 config = context.config
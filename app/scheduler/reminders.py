@@ -3,14 +3,14 @@ from __future__ import annotations
 
 from typing import Dict, Optional
 from datetime import datetime, timedelta, timezone
-import re
 
 from aiogram import Bot
-from aiogram.enums import ParseMode
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.date import DateTrigger
 from loguru import logger
 
+from app.bot import outbox
+from app.bot.rendering import TextBuilder
 from app.config import settings
 from app.db.database import async_session_maker
 from app.db.models.tasks import TaskDAO, ProjectStatus
@@ -38,11 +38,6 @@ def start_scheduler() -> None:
         logger.info("Reminder scheduler started (Moscow timezone)")
 
 
-def _escape_md_v2(text: str) -> str:
-    specials = r'[_*[\]()~`>#+\-=|{}.!]'
-    return re.sub(rf'({specials})', r'\\\1', text or "")
-
-
 async def _notify_new_task(task_id: int) -> None:
     """
     Если задача всё ещё 'новый' — отправляем пинг ОБОИМ партнёрам
@@ -74,28 +69,28 @@ async def _notify_new_task(task_id: int) -> None:
             else:
                 created_str = "-"
 
-            header = _escape_md_v2("⏰ Напоминание по проекту")
             body = (
-                f"{header}\n\n"
-                f"*{_escape_md_v2(title)}*\n"
-                f"Статус: {_escape_md_v2(ProjectStatus.new.value)}\n"
-                f"Создан: {_escape_md_v2(created_str)}\n\n"
-                f"{_escape_md_v2('Нужно обработать проект и продвинуть статус.')}"
+                TextBuilder()
+                .text("⏰ Напоминание по проекту\n\n")
+                .bold(title)
+                .text(f"\nСтатус: {ProjectStatus.new.value}\nСоздан: {created_str}\n\n")
+                .text("Нужно обработать проект и продвинуть статус.")
+                .build()
             )
 
-            # Отправляем ОБОИМ партнерам из settings
+            # Отправляем ОБОИМ партнерам из settings (через очередь outbox — с повторами)
             partners = [settings.BUSINESS_PARTNER_ID, settings.TEAM_PARTNER_ID]
-
-            for partner_id in partners:
-                try:
-                    await _bot.send_message(
-                        chat_id=partner_id,
-                        text=body,
-                        parse_mode=ParseMode.MARKDOWN_V2
-                    )
-                    logger.info("Reminder sent to partner %s for task %s", partner_id, task_id)
-                except Exception as e:
-                    logger.exception("Failed to send reminder to partner %s: {}", partner_id, e)
+            # ключ привязан к моменту запуска: повторный запуск той же джобы не задублирует пинг
+            run_key = f"reminder:{task_id}:{datetime.now(timezone.utc):%Y%m%d%H%M}"
+
+            try:
+                await outbox.enqueue(*(
+                    outbox.message(partner_id, f"{run_key}:{partner_id}", body.text, entities=body.entities)
+                    for partner_id in partners
+                ))
+                logger.info("Reminder queued for partners {} for task {}", partners, task_id)
+            except Exception as e:
+                logger.exception("Failed to queue reminder for task {}: {}", task_id, e)
 
             # 🔁 задача всё ещё «новая» — ставим следующее напоминание
             schedule_new_task_reminder(task_id)
@@ -0,0 +1,57 @@
+# app/worker.py
+"""
+Воркер фоновых задач из общей очереди в Postgres (JOBS_BACKEND=postgres):
+
+    python -m app.worker
+
+Можно запускать сколько угодно экземпляров на разных машинах — задачи
+распределяются через SELECT … FOR UPDATE SKIP LOCKED (app.jobs.pg_queue).
+Сообщения пользователям воркер ставит в outbox, доставляет их процесс бота.
+"""
+import asyncio
+import signal
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.enums import ParseMode
+from loguru import logger
+
+import app.jobs.project  # noqa: F401  регистрирует обработчик generate_project
+from app.bot.telegram_api import build_session
+from app.config import settings
+from app.jobs.pg_queue import PgJobWorker
+from app.logging_setup import setup_logging
+
+
+async def main():
+    setup_logging()
+    bot = Bot(token=settings.BOT_TOKEN, session=build_session(),
+              default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    worker = PgJobWorker(
+        slots=settings.JOBS_WORKERS,
+        kind_caps=settings.JOBS_KIND_CONCURRENCY,
+        lease_seconds=settings.JOBS_LEASE_SECONDS,
+        poll_seconds=settings.JOBS_POLL_SECONDS,
+        queue_size=settings.JOBS_QUEUE_SIZE,
+        default_duration=settings.JOBS_DEFAULT_DURATION_SECONDS,
+    )
+
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+
+    if settings.JOBS_BACKEND != "postgres":
+        logger.warning("JOBS_BACKEND={}: the bot runs jobs itself, this worker will only drain the jobs table",
+                       settings.JOBS_BACKEND)
+    try:
+        await worker.run(bot, stop_event)
+    finally:
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,191 @@
+# benchmarks/bench_kp_render.py
+"""
+Бенчмарк конвейера рендеринга КП.
+
+Для каждого ProjectType и размера (small / typical / pathological) меряем:
+- parse        — Markdown -> KPDocument;
+- md_to_docx   — convert_markdown_to_word (как в боте: файл .md -> .docx);
+- docx_to_pdf  — convert_docx_to_pdf (LibreOffice/docx2pdf; пропускается, если их нет);
+- kp_to_pdf    — нативный PDF-бэкенд (render_kp(doc, "pdf")).
+
+Метрики: медиана wall time (мс), пиковая память Python-аллокаций (tracemalloc, КиБ),
+размер результата (байт; для parse — размер исходного .md).
+Базовые значения лежат в benchmarks/baselines.json.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_kp_render               # сравнить с baselines.json
+    python -m benchmarks.bench_kp_render --save        # перезаписать baselines.json
+    python -m benchmarks.bench_kp_render -k bot -r 5   # только кейсы с "bot", 5 повторов
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Optional
+
+from loguru import logger
+
+from app.chat_gpt.docx_to_pdf_converter import convert_docx_to_pdf
+from app.chat_gpt.kp_document import parse_kp_markdown
+from app.chat_gpt.kp_render import render_kp
+from app.chat_gpt.prompts import ProjectType
+from app.chat_gpt.utils.konvert_md_docx import convert_markdown_to_word
+from benchmarks.synthetic import SIZES, make_kp_markdown
+
+BASELINES_PATH = Path(__file__).with_name("baselines.json")
+METRICS = ("time_ms", "peak_kib", "size_bytes")
+
+
+def _has_docx_pdf_backend() -> bool:
+    if shutil.which("soffice") or shutil.which("libreoffice"):
+        return True
+    try:
+        import docx2pdf  # noqa: F401
+    except ImportError:
+        return False
+    # docx2pdf работает только через установленный MS Word
+    return sys.platform in ("win32", "darwin")
+
+
+def _measure(func: Callable[[], Optional[str]], repeat: int) -> dict[str, float]:
+    """Медиана времени по repeat прогонам + отдельный прогон под tracemalloc для пика памяти."""
+    times = []
+    out_path = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out_path = func()
+        times.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "time_ms": round(statistics.median(times), 2),
+        "peak_kib": round(peak / 1024, 1),
+        "size_bytes": os.path.getsize(out_path) if out_path and os.path.exists(out_path) else 0,
+    }
+
+
+def run_case(project_type: ProjectType, size: str, workdir: Path, repeat: int, with_docx_pdf: bool) -> dict:
+    md = make_kp_markdown(project_type, size)
+    md_path = workdir / f"{project_type.value}_{size}.md"
+    md_path.write_text(md, encoding="utf-8")
+    docx_path = workdir / f"{project_type.value}_{size}.docx"
+    pdf_path = workdir / f"{project_type.value}_{size}.pdf"
+    native_pdf_path = workdir / f"{project_type.value}_{size}_native.pdf"
+
+    def parse():
+        parse_kp_markdown(md)
+        return str(md_path)
+
+    def md_to_docx():
+        ok, message = convert_markdown_to_word(str(md_path), str(docx_path))
+        if not ok:
+            raise RuntimeError(message)
+        return str(docx_path)
+
+    def docx_to_pdf():
+        if not convert_docx_to_pdf(str(docx_path), str(pdf_path)):
+            raise RuntimeError("DOCX -> PDF conversion failed")
+        return str(pdf_path)
+
+    kp_doc = parse_kp_markdown(md)
+    if size == "pathological":
+        # десятки секунд на прогон — медиана тут ничего не добавляет
+        repeat = 1
+
+    def kp_to_pdf():
+        return render_kp(kp_doc, "pdf", str(native_pdf_path))
+
+    results = {
+        "parse": _measure(parse, repeat),
+        "md_to_docx": _measure(md_to_docx, repeat),
+        "kp_to_pdf": _measure(kp_to_pdf, repeat),
+    }
+    if with_docx_pdf:
+        # LibreOffice — отдельный процесс, один прогон достаточно показателен
+        results["docx_to_pdf"] = _measure(docx_to_pdf, 1)
+    return results
+
+
+def compare(current: dict, baselines: dict, threshold: float) -> list[str]:
+    regressions = []
+    for case, stages in current.items():
+        for stage, metrics in stages.items():
+            base = baselines.get(case, {}).get(stage)
+            if not base:
+                continue
+            for metric in METRICS:
+                old, new = base.get(metric), metrics.get(metric)
+                if old and new and new > old * (1 + threshold):
+                    regressions.append(f"{case}/{stage}: {metric} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def _print_case(case: str, stages: dict, baselines: dict) -> None:
+    for stage, m in stages.items():
+        base = baselines.get(case, {}).get(stage, {})
+        delta = ""
+        if base.get("time_ms"):
+            delta = f"{(m['time_ms'] / base['time_ms'] - 1) * 100:+.0f}%"
+        print(f"{case:<28} {stage:<12} {m['time_ms']:>10.2f} {delta:>6} {m['peak_kib']:>10.1f} {m['size_bytes']:>10}",
+              flush=True)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк рендеринга КП")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="прогонов на замер (медиана)")
+    parser.add_argument("-k", "--filter", default="", help="подстрока в имени кейса (тип_размер)")
+    parser.add_argument("--save", action="store_true", help="сохранить результаты как новые baselines")
+    parser.add_argument("--threshold", type=float, default=0.25, help="допустимый рост метрики (0.25 = +25%%)")
+    args = parser.parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    baselines = json.loads(BASELINES_PATH.read_text(encoding="utf-8")) if BASELINES_PATH.exists() else {}
+    with_docx_pdf = _has_docx_pdf_backend()
+    if not with_docx_pdf:
+        print("docx_to_pdf: LibreOffice/docx2pdf не найдены — этап пропущен", file=sys.stderr)
+
+    current: dict[str, dict] = {}
+    print(f"{'case':<28} {'stage':<12} {'time, ms':>10} {'Δ':>6} {'peak, KiB':>10} {'size, B':>10}", flush=True)
+    with tempfile.TemporaryDirectory() as td:
+        for project_type in ProjectType:
+            for size in SIZES:
+                case = f"{project_type.value}_{size}"
+                if args.filter and args.filter not in case:
+                    continue
+                current[case] = run_case(project_type, size, Path(td), args.repeat, with_docx_pdf)
+                _print_case(case, current[case], baselines)
+
+    if args.save:
+        baselines.update(current)
+        BASELINES_PATH.write_text(json.dumps(baselines, ensure_ascii=False, indent=2, sort_keys=True) + "\n",
+                                  encoding="utf-8")
+        print(f"Baselines saved: {BASELINES_PATH}")
+        return 0
+
+    regressions = compare(current, baselines, args.threshold)
+    if regressions:
+        print("\nРегрессии:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# benchmarks/bench_tg_text.py
+"""
+Бенчмарк подготовки длинных текстов к отправке в Telegram (сырые материалы клиента).
+
+Этапы:
+- legacy       — прежняя схема: re.sub-экранирование MarkdownV2 + _split_text по len();
+- render_split — app.bot.rendering: plain text + entities, разбиение по UTF-16 (весь список);
+- stream       — iter_chunks: куски потребляются по одному и не копятся (как enqueue_stream);
+- first_chunk  — время до первого куска из iter_chunks, т.е. до начала отправки.
+
+Метрики: медиана wall time (мс), пик tracemalloc (КиБ), число сообщений и
+invalid — сколько сообщений Telegram отклонит: длиннее 4096 UTF-16 единиц или
+(для MarkdownV2) разрезанных посреди escape-последовательности.
+Базовые значения — в benchmarks/baselines.json (кейсы tg_text_*).
+
+    python -m benchmarks.bench_tg_text            # сравнить с baselines.json
+    python -m benchmarks.bench_tg_text --save
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional
+
+from app.bot.rendering import TELEGRAM_MAX_UTF16, iter_chunks, plain, split_rendered, utf16_len
+from benchmarks.bench_kp_render import BASELINES_PATH, compare
+from benchmarks.synthetic import make_raw_brief
+
+SIZES = {"64k": 64 * 1024, "1m": 1024 * 1024, "4m": 4 * 1024 * 1024, "16m": 16 * 1024 * 1024}
+
+# --- прежняя реализация (router.py до перехода на entities), для сравнения ---
+_MDV2_SPECIALS = r'[_*[\]()~`>#+\-=|{}.!]'
+
+
+def _legacy_escape(text: str) -> str:
+    return re.sub(rf'({_MDV2_SPECIALS})', r'\\\1', text)
+
+
+def _legacy_split(text: str, max_len: int = 3500) -> list[str]:
+    parts, cur = [], ""
+    for line in text.split("\n"):
+        while len(line) > max_len:
+            parts.append(line[:max_len])
+            line = line[max_len:]
+        if not cur:
+            cur = line
+        elif len(cur) + 1 + len(line) <= max_len:
+            cur = f"{cur}\n{line}"
+        else:
+            parts.append(cur)
+            cur = line
+    if cur:
+        parts.append(cur)
+    return [p for p in parts if p]
+
+
+def _legacy_invalid(message: str) -> bool:
+    dangling = len(message) - len(message.rstrip("\\"))
+    return utf16_len(message) > TELEGRAM_MAX_UTF16 or dangling % 2 == 1
+
+
+def _render_invalid(message: str) -> bool:
+    return utf16_len(message) > TELEGRAM_MAX_UTF16
+
+
+def _consume(messages: Iterable[str], invalid: Callable[[str], bool]) -> tuple[int, int]:
+    count = bad = 0
+    for message in messages:
+        count += 1
+        bad += invalid(message)
+    return count, bad
+
+
+def _measure(func: Callable[[], Iterable[str]], invalid: Callable[[str], bool], repeat: int) -> dict[str, float]:
+    """func возвращает список (всё нарезано заранее) или генератор (нарезка идёт при потреблении)."""
+    times = []
+    count = bad = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count, bad = _consume(func(), invalid)
+        times.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        _consume(func(), invalid)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "time_ms": round(statistics.median(times), 2),
+        "peak_kib": round(peak / 1024, 1),
+        "messages": count,
+        "invalid": bad,
+    }
+
+
+def run_case(size_bytes: int, repeat: int) -> dict:
+    text = make_raw_brief(size_bytes)
+
+    def stream() -> Iterator[str]:
+        return (chunk.text for chunk in iter_chunks(plain(text)))
+
+    return {
+        "legacy": _measure(lambda: _legacy_split(_legacy_escape(text)), _legacy_invalid, repeat),
+        "render_split": _measure(lambda: [chunk.text for chunk in split_rendered(plain(text))], _render_invalid, repeat),
+        "stream": _measure(stream, _render_invalid, repeat),
+        "first_chunk": _measure(lambda: islice(stream(), 1), _render_invalid, repeat),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк разбиения длинных сообщений")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="прогонов на замер (медиана)")
+    parser.add_argument("--save", action="store_true", help="сохранить результаты как новые baselines")
+    parser.add_argument("--threshold", type=float, default=0.25, help="допустимый рост метрики (0.25 = +25%%)")
+    args = parser.parse_args(argv)
+
+    baselines = json.loads(BASELINES_PATH.read_text(encoding="utf-8")) if BASELINES_PATH.exists() else {}
+    current: dict[str, dict] = {}
+    print(f"{'case':<16} {'stage':<14} {'time, ms':>10} {'peak, KiB':>10} {'msgs':>6} {'invalid':>8}", flush=True)
+    for name, size_bytes in SIZES.items():
+        case = f"tg_text_{name}"
+        current[case] = run_case(size_bytes, args.repeat)
+        for stage, m in current[case].items():
+            print(f"{case:<16} {stage:<14} {m['time_ms']:>10.2f} {m['peak_kib']:>10.1f} "
+                  f"{m['messages']:>6} {m['invalid']:>8}", flush=True)
+
+    if args.save:
+        baselines.update(current)
+        BASELINES_PATH.write_text(json.dumps(baselines, ensure_ascii=False, indent=2, sort_keys=True) + "\n",
+                                  encoding="utf-8")
+        print(f"Baselines saved: {BASELINES_PATH}")
+        return 0
+
+    regressions = compare(current, baselines, args.threshold)
+    if regressions:
+        print("\nРегрессии:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# benchmarks/synthetic.py
+"""
+Синтетические КП в том же Markdown, что возвращает GPT (см. app/chat_gpt/prompts.py
+и app/chat_gpt/generated_kp/gg.md).
+
+Размеры:
+- small        — одно описание, один этап, короткая таблица цен;
+- typical      — как gg.md: 4 этапа по 4–7 строк;
+- pathological — таблицы по 200 строк и глубоко вложенное inline-форматирование.
+
+make_raw_brief — «сырые материалы» клиента: пачка пересланных сообщений с эмодзи,
+ссылками и спецсимволами MarkdownV2, как их склеивает _compose_brief_text.
+"""
+from __future__ import annotations
+
+import random
+
+from app.chat_gpt.prompts import ProjectType
+
+SIZES = ("small", "typical", "pathological")
+
+STAGES: dict[ProjectType, list[str]] = {
+    ProjectType.MINI_APP: ["Frontend (React/vite)", "Backend (FastAPI)", "Дизайн", "Деплой и тестирование"],
+    ProjectType.BOT: ["Логика бота (aiogram)", "Админ-панель", "Интеграции", "Деплой и тестирование"],
+    ProjectType.DESIGN: ["Исследование и мудборд", "Логотип и айдентика", "Брендбук", "Передача исходников"],
+    ProjectType.TILDA_SITE: ["Прототип", "Дизайн страниц", "Вёрстка на Tilda", "Подключение домена и форм"],
+    ProjectType.SCRIPT: ["Анализ источников", "Скрипт сбора данных", "Экспорт и отчёты", "Документация"],
+    ProjectType.OTHER: ["Аналитика", "Реализация", "Тестирование", "Передача проекта"],
+}
+
+_WORDS = (
+    "интеграция настройка модуль авторизация платёжный шлюз личный кабинет каталог корзина "
+    "уведомления аналитика админка экспорт импорт роли фильтры поиск карточка профиль отчёт"
+).split()
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _deep_inline(rng: random.Random, depth: int) -> str:
+    """Много коротких жирных/курсивных фрагментов подряд — худший случай для inline-парсера."""
+    parts = []
+    for i in range(depth):
+        word = rng.choice(_WORDS)
+        parts.append(("**{}**", "*{}*", "***{}***", "__{}__", "_{}_")[i % 5].format(word))
+        parts.append(rng.choice(_WORDS))
+    return " ".join(parts)
+
+
+def _rub(amount: int) -> str:
+    return f"{amount:,} ₽".replace(",", " ")
+
+
+def make_kp_markdown(project_type: ProjectType, size: str, seed: int = 0) -> str:
+    if size not in SIZES:
+        raise ValueError(f"Неизвестный размер {size!r}, доступны: {', '.join(SIZES)}")
+    rng = random.Random(f"{project_type.value}:{size}:{seed}")
+
+    stages = STAGES[project_type]
+    if size == "small":
+        stages, rows_per_stage, desc_words, inline_depth = stages[:1], 3, 25, 0
+    elif size == "typical":
+        rows_per_stage, desc_words, inline_depth = rng.randint(4, 7), 60, 2
+    else:
+        rows_per_stage, desc_words, inline_depth = 200, 400, 40
+
+    lines = [
+        f"# **Проект: Синтетический {project_type.value} ({size})**",
+        "",
+        "## **План работы**",
+        "",
+        "### **Краткое описание проекта:**",
+        _sentence(rng, desc_words),
+        "",
+    ]
+    if inline_depth:
+        lines += [_deep_inline(rng, inline_depth), ""]
+
+    for n, stage in enumerate(stages, 1):
+        lines += [f"### **Этап {n}: {stage}**", "| **Задача** | **Детализация** |", "|------------|-----------------|"]
+        for _ in range(rows_per_stage):
+            detail = _sentence(rng, 18)
+            if inline_depth:
+                detail = f"{detail} {_deep_inline(rng, inline_depth // 4 or 1)}"
+            lines.append(f"| {_sentence(rng, 3)} | {detail} |")
+        lines.append("")
+
+    lines += ["## **Цена/Сроки/Этапы**", "| **Этапы** | **Сроки** | **Цена** |", "|-----------|-----------|----------|"]
+    price_rows = len(stages) if size != "pathological" else 200
+    total = 0
+    for n in range(price_rows):
+        price = rng.randrange(50, 2000) * 1000
+        total += price
+        stage = stages[n % len(stages)]
+        lines.append(f"| Этап {n + 1}. {stage} | {rng.randint(1, 8)} недель | {_rub(price)} |")
+    lines.append(f"| **Итог:** | **примерно {price_rows * 3} недель** | **{_rub(total)}** |")
+    return "\n".join(lines)
+
+
+_EMOJI = ("🚀", "✅", "🔥", "👍", "📎", "💰", "🤝", "⚡️")
+_SPECIALS = ("(v2.1)", "1_000 ₽!", "#ТЗ", "[черновик]", "a*b", "~30%", "key=value", "`code`", "{json}", "> цитата")
+
+
+def make_raw_brief(size_bytes: int, seed: int = 0) -> str:
+    """Текст примерно size_bytes байт UTF-8: абзацы-сообщения, пустые строки между ними."""
+    rng = random.Random(f"raw:{size_bytes}:{seed}")
+    parts: list[str] = []
+    total = 0
+    n = 0
+    while total < size_bytes:
+        n += 1
+        lines = [f"Клиент, [{rng.randint(1, 28):02d}.10.2025 {rng.randint(9, 22):02d}:{rng.randint(0, 59):02d}]"]
+        for _ in range(rng.randint(1, 6)):
+            words = [rng.choice(_WORDS) for _ in range(rng.randint(5, 40))]
+            for _ in range(rng.randint(0, 3)):
+                words.insert(rng.randrange(len(words) + 1), rng.choice(_EMOJI + _SPECIALS))
+            if rng.random() < 0.2:
+                words.append(f"https://example.com/brief/{n}?ref=tg_{rng.randint(1, 999)}")
+            lines.append(" ".join(words).capitalize() + rng.choice((".", "!", "?", "...")))
+        if rng.random() < 0.05:
+            # одна длинная строка без переводов — худший случай для разбиения по строкам
+            lines.append(" ".join(rng.choice((*_WORDS, *_EMOJI)) for _ in range(2000)))
+        block = "\n".join(lines)
+        parts.append(block)
+        total += len(block.encode("utf-8")) + 2
+    return "\n\n".join(parts)